@@ -0,0 +1,158 @@
+"""
+Raporty PDF hurtem (kohorty, np. dział HR): lista SimInput -> strumień ZIP z jednym PDF-em na rekord.
+
+Rekordy idą paczkami: symulacja w puli wątków, render w puli procesów (cpu_pool), najwyżej `window`
+paczek w locie — pamięć zależy od rozmiaru paczki, nie od liczby rekordów. Pliki trafiają do ZIP-a
+w kolejności wejścia (bez kompresji — PDF-y są już skompresowane), a na końcu `manifest.csv`
+ze statusem każdego rekordu. Bez logowania użycia.
+
+CLI: `python -m api.app.bulk_report payloads.json|payloads.jsonl -o raporty.zip` (postęp na stderr).
+"""
+import argparse
+import asyncio
+import csv
+import datetime as dt
+import io
+import json
+import sys
+import zipfile
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Sequence
+
+from starlette.concurrency import run_in_threadpool
+
+@dataclass
+class BulkRecord:
+    """Wynik dla jednego rekordu wejścia: PDF albo błąd (walidacja, symulacja lub render)."""
+    index: int
+    pdf: Optional[bytes] = None
+    error: Any = None
+
+    @property
+    def name(self) -> str:
+        return f"raport_{self.index:05d}.pdf"
+
+async def render_bulk(payloads: Sequence, prepare: Callable[[list], list],
+                      render: Callable[[list], Awaitable[list]], chunk: int, window: int) -> AsyncIterator[BulkRecord]:
+    """
+    prepare([(index, surowy rekord)]) -> [(index, wejście renderu | None, błąd)] (synchronicznie, w wątku),
+    render([wejście renderu]) -> [bytes | komunikat błędu] (asynchronicznie, np. pula procesów).
+    Zwraca rekordy w kolejności wejścia; błąd renderu paczki oznacza błąd jej rekordów.
+    """
+    async def process(part: list) -> List[BulkRecord]:
+        prepared = await run_in_threadpool(prepare, part)
+        ok = [(i, item) for i, item, _ in prepared if item is not None]
+        try:
+            rendered = await render([item for _, item in ok]) if ok else []
+        except Exception as e:
+            rendered = [f"{type(e).__name__}: {e}"] * len(ok)
+        pdfs = {i: out for (i, _), out in zip(ok, rendered)}
+        records = []
+        for i, item, error in prepared:
+            out = pdfs.get(i)
+            if isinstance(out, bytes):
+                records.append(BulkRecord(i, pdf=out))
+            else:
+                records.append(BulkRecord(i, error=error if item is None else out))
+        return records
+
+    pending: deque = deque()
+    try:
+        for start in range(0, len(payloads), chunk):
+            part = list(enumerate(payloads[start:start + chunk], start))
+            pending.append(asyncio.ensure_future(process(part)))
+            if len(pending) >= window:
+                for record in await pending.popleft():
+                    yield record
+        while pending:
+            for record in await pending.popleft():
+                yield record
+    finally:
+        for task in pending:
+            task.cancel()
+
+class _Sink:
+    """Nieprzewijalny cel dla zipfile — zebrane bajty oddaje `drain()` (ZIP z deskryptorami danych)."""
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+async def zip_stream(records: AsyncIterator[BulkRecord], today: dt.date,
+                     on_record: Optional[Callable[[BulkRecord], None]] = None) -> AsyncIterator[bytes]:
+    """Strumień ZIP: PDF-y rekordów w miarę ich powstawania + manifest.csv (index, plik, status, błąd)."""
+    sink = _Sink()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(["index", "file", "status", "error"])
+    stamp = (today.year, today.month, today.day, 0, 0, 0)
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        async for record in records:
+            if record.pdf is not None:
+                zf.writestr(zipfile.ZipInfo(record.name, date_time=stamp), record.pdf)
+                writer.writerow([record.index, record.name, "ok", ""])
+            else:
+                error = record.error if isinstance(record.error, str) else json.dumps(record.error, ensure_ascii=False)
+                writer.writerow([record.index, "", "error", error])
+            if on_record is not None:
+                on_record(record)
+            data = sink.drain()
+            if data:
+                yield data
+        zf.writestr(zipfile.ZipInfo("manifest.csv", date_time=stamp), manifest.getvalue().encode("utf-8"))
+    yield sink.drain()
+
+def read_payloads(path: str) -> List[Any]:
+    """Tablica JSON albo JSON Lines (jeden rekord na linię); '-' = stdin."""
+    text = sys.stdin.read() if path == "-" else Path(path).read_text(encoding="utf-8")
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        return json.loads(stripped)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m api.app.bulk_report", description=__doc__.strip().splitlines()[0])
+    ap.add_argument("input", help="plik z listą SimInput (JSON albo JSONL), '-' = stdin")
+    ap.add_argument("-o", "--out", type=Path, default=Path("raporty.zip"))
+    args = ap.parse_args(argv)
+
+    payloads = read_payloads(args.input)
+    # Import aplikacji dopiero tutaj: wczytuje tabele i konfigurację z ENV jak serwer.
+    from . import main as app
+    today = dt.date.today()
+    done, failed = 0, 0
+
+    def progress(record: BulkRecord):
+        nonlocal done, failed
+        done += 1
+        failed += record.pdf is None
+        if done % 100 == 0 or done == len(payloads):
+            print(f"\r{done}/{len(payloads)} (błędy: {failed})", end="", file=sys.stderr, flush=True)
+
+    async def run():
+        with open(args.out, "wb") as f:
+            async for data in zip_stream(app.bulk_report_records(payloads, today), today, progress):
+                f.write(data)
+
+    try:
+        asyncio.run(run())
+    finally:
+        app.shutdown_pool()
+        app.USAGE_LOG.close()
+    print(f"\n-> {args.out}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
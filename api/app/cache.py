@@ -0,0 +1,92 @@
+"""
+Cache'e w pamięci procesu: LRU z limitem liczby wpisów i bajtów (opcjonalnie TTL)
+oraz klucze adresowane treścią (kanoniczny payload + wersja danych + data „na dzień”).
+"""
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def data_version(*tables: Any) -> str:
+    """Skrót treści wczytanych tabel (PARAMS, AVG_TABLE, ASSUMPTIONS) — zmienia się przy każdej zmianie danych."""
+    h = hashlib.sha256()
+    for t in tables:
+        h.update(_canonical(t).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:16]
+
+def cache_key(*parts: Any) -> str:
+    """Klucz z dowolnych części (dict/list/str/data) — kolejność kluczy w słownikach nie ma znaczenia."""
+    return hashlib.sha256(_canonical(parts).encode("utf-8")).hexdigest()
+
+def _default_sizeof(value: Any) -> int:
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    return sys.getsizeof(value)
+
+class LRUCache:
+    def __init__(self, max_entries: int = 256, max_bytes: int = 0, ttl: Optional[float] = None,
+                 sizeof: Callable[[Any], int] = _default_sizeof):
+        """`max_bytes` = 0 wyłącza limit pamięci, `ttl` = None — wpisy bez wygasania."""
+        self.max_entries = max(0, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.sizeof = sizeof
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[2] > self.ttl:
+                self._data.pop(key)
+                self._bytes -= item[1]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: str, value: Any):
+        if self.max_entries == 0:
+            return
+        size = self.sizeof(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or
+                                  (self.max_bytes and self._bytes > self.max_bytes)):
+                _, (_, s, _) = self._data.popitem(last=False)
+                self._bytes -= s
+                self.evictions += 1
+
+    def clear(self):
+        """Atomowe wyczyszczenie: nowy słownik podmieniany pod blokadą."""
+        with self._lock:
+            self._data = OrderedDict()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data), "bytes": self._bytes,
+                "max_entries": self.max_entries, "max_bytes": self.max_bytes, "ttl_s": self.ttl,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            }
@@ -0,0 +1,125 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .engine import SKLADKA_RATE, efekt_absencji_factor
+from .projection import closest_year
+from .waloryzacja import indeks_roczny
+
+try:
+    import numpy as np
+except Exception:  # numpy jest opcjonalny — bez niego batch liczy rekord po rekordzie
+    np = None
+
+def numpy_available() -> bool:
+    return np is not None
+
+@dataclass
+class GroupProjection:
+    """
+    Wynik projekcji dla grupy rekordów o wspólnych (start_year, retire_year, sex) — tablice po rekordach:
+    - capital / capital_no_l4: suma po waloryzacji rocznej (z L4 / bez L4)
+    - l4_mean:                średni czynnik L4 w latach do przejścia
+    - used_params_path:       czy płace skalowane do avg_wage z arkusza mentorów
+    - running:                kapitał narastająco dla lat retire_year-1 .. retire_year-1+extra (kolumny)
+    """
+    retire_year: int
+    capital: "np.ndarray"
+    capital_no_l4: "np.ndarray"
+    l4_mean: "np.ndarray"
+    used_params_path: "np.ndarray"
+    running: "np.ndarray"
+
+def _unit_wage_row(start_year: int, retire_year: int, end_year: int, params: Dict[int, dict],
+                   current_year: int, wage_growth: float, auto_backcast: bool) -> tuple["np.ndarray", bool]:
+    """Ścieżka płac dla pensji = 1.0 (ta sama dla całej grupy bez custom_wage_timeline); jak projection.wage_path."""
+    years = range(start_year, retire_year)
+    extra = range(retire_year, end_year)
+    if params:
+        ref_y = closest_year(params, current_year)
+        ref_avg = params.get(ref_y, {}).get("avg_wage") if ref_y else None
+        if ref_avg and all(params.get(y, {}).get("avg_wage") for y in years):
+            row = [params[y]["avg_wage"] / ref_avg for y in years]
+            last = row[-1] if row else 1.0
+            for y in extra:
+                avg = params.get(y, {}).get("avg_wage")
+                last = avg / ref_avg if avg else last
+                row.append(last)
+            return np.asarray(row, dtype=float), True
+    if auto_backcast:
+        return np.asarray([1.0 / ((1.0 + wage_growth) ** max(0, current_year - y)) for y in (*years, *extra)]), False
+    return np.ones(len(years) + len(extra)), False
+
+def project_group(payloads: List, start_year: int, retire_year: int, params: Dict[int, dict], current_year: int,
+                  wage_growth: float, absencja_dni: Optional[float] = None, auto_backcast: bool = True,
+                  extra_years: int = 0) -> GroupProjection:
+    """
+    Wektorowa wersja build_projection dla wielu rekordów naraz: macierz (rekordy × lata) płac,
+    limity 250%/30×, L4, składki i waloryzacja roczna jako operacje na tablicach.
+    `extra_years` wydłuża projekcję o lata po przejściu (goal-seek).
+    """
+    end_year = retire_year + max(0, extra_years)
+    years = np.arange(start_year, end_year)
+    n_planned = retire_year - start_year
+
+    gross = np.asarray([float(p.gross_salary) for p in payloads], dtype=float)
+    avg = np.asarray([params.get(int(y), {}).get("avg_wage") or 0.0 for y in years], dtype=float)
+    cap_monthly = np.where(avg > 0, 2.5 * avg, np.inf)
+    cap_annual = np.where(avg > 0, 30.0 * avg, np.inf)
+
+    def annual_base(unit_row: "np.ndarray") -> "np.ndarray":
+        wages = gross[:, None] * unit_row[None, :]
+        for i, p in enumerate(payloads):
+            if p.custom_wage_timeline:
+                custom = p.custom_wage_timeline
+                wages[i, :] = [float(custom.get(int(y), gross[i])) for y in years]
+        return np.minimum(12.0 * np.minimum(wages, cap_monthly), cap_annual)
+
+    unit_row, params_path = _unit_wage_row(start_year, retire_year, end_year, params, current_year,
+                                           wage_growth, auto_backcast)
+    annual = annual_base(unit_row)
+    used_params = np.asarray([params_path and not p.custom_wage_timeline for p in payloads], dtype=bool)
+
+    default_l4 = efekt_absencji_factor(absencja_dni)
+    l4 = np.asarray([default_l4 if p.include_sick_leave else 1.0 for p in payloads], dtype=float)[:, None]
+    l4 = np.repeat(l4, len(years), axis=1)
+    for i, p in enumerate(payloads):
+        if p.custom_sick_days:
+            for y, dni in p.custom_sick_days.items():
+                col = int(y) - start_year
+                if 0 <= col < len(years):
+                    l4[i, col] = efekt_absencji_factor(dni)
+
+    contribution = annual * SKLADKA_RATE * l4
+    index_factor = np.asarray([indeks_roczny(int(y), retire_year - 1) for y in years[:n_planned]], dtype=float)
+    capital = contribution[:, :n_planned] @ index_factor
+    capital_no_l4 = (annual[:, :n_planned] * SKLADKA_RATE) @ index_factor
+
+    # Kapitał narastająco po latach wydłużenia: jedno mnożenie i dodawanie na rok (jak running_capital).
+    running = np.empty((len(payloads), max(0, extra_years) + 1))
+    running[:, 0] = capital
+    for k in range(1, running.shape[1]):
+        y = retire_year - 1 + k
+        running[:, k] = running[:, k - 1] * indeks_roczny(y - 1, y) + contribution[:, n_planned + k - 1]
+
+    # Jak Projection.beyond: przejście po roku wydłużenia bez avg_wage liczy się ścieżką, którą wybrałaby
+    # osobna projekcja na taki rok — kapitał tych rekordów od nowa, od pierwszego roku składki.
+    gap = next((y for y in range(retire_year, end_year) if not params.get(y, {}).get("avg_wage")), None)
+    if gap is not None and used_params.any():
+        alt_row, _ = _unit_wage_row(start_year, gap + 1, end_year, params, current_year, wage_growth, auto_backcast)
+        alt = annual_base(alt_row)[used_params] * SKLADKA_RATE * l4[used_params]
+        cap = np.zeros(alt.shape[0])
+        for t, y in enumerate(years):
+            if t:
+                cap *= indeks_roczny(int(y) - 1, int(y))
+            cap += alt[:, t]
+            if y >= gap:
+                running[used_params, int(y) + 1 - retire_year] = cap
+
+    return GroupProjection(
+        retire_year=retire_year,
+        capital=capital,
+        capital_no_l4=capital_no_l4,
+        l4_mean=l4[:, :n_planned].mean(axis=1),
+        used_params_path=used_params,
+        running=running,
+    )
@@ -1,5 +1,5 @@
 from typing import Dict
-from .waloryzacja import waloryzacja_roczna, waloryzacja_kwartalna, kwartal_map_na_waloryzacje
+from .waloryzacja import indeks_roczny, waloryzacja_kwartalna, kwartal_map_na_waloryzacje
 
 SKLADKA_RATE = 0.1952 
 
@@ -15,10 +15,7 @@ def waloryzuj_rocznie(skladki_po_latach: Dict[int, float]) -> float:
     end_year = max(skladki_po_latach.keys())
     total = 0.0
     for rok, kwota in skladki_po_latach.items():
-        val = float(kwota)
-        for r in range(rok + 1, end_year + 1):
-            val *= waloryzacja_roczna(r)
-        total += val
+        total += float(kwota) * indeks_roczny(rok, end_year)
     return total
 
 def waloryzuj_kwartalnie_po_31_stycznia(rok_przejscia: int, kwartal_przyznania: int, kwota_bazowa: float) -> float:
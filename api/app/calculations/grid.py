@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence
+
+from .engine import SKLADKA_RATE, efekt_absencji_factor, waloryzuj_kwartalnie_po_31_stycznia
+from .projection import closest_year
+from .waloryzacja import indeks_roczny
+
+try:
+    import numpy as np
+except Exception:  # numpy jest opcjonalny — bez niego /simulate/grid zwraca 503
+    np = None
+
+# Osie siatki: pola SimInput (+ sick_days = stała liczba dni L4 rocznie zamiast średniej absencji).
+GRID_AXES = ("gross_salary", "retire_year", "sick_days", "quarter_award")
+GRID_METRICS = ("benefit_nominal", "benefit_real", "replacement_rate_percent")
+
+@dataclass
+class Grid:
+    """Gęsta tablica wyników: values[..., m] dla osi `axes` (w kolejności żądania) i metryki GRID_METRICS[m]."""
+    axes: Dict[str, list]
+    values: "np.ndarray"
+
+def _wage_rows(start_year: int, end_year: int, params: Dict[int, dict], current_year: int,
+               wage_growth: float, auto_backcast: bool) -> tuple[Optional["np.ndarray"], "np.ndarray", int]:
+    """
+    Ścieżki płac dla pensji = 1.0 w latach start_year .. end_year-1, wspólne dla wszystkich komórek siatki:
+    (wiersz ze skalowaniem do avg_wage albo None, wiersz backcast/płaski, pierwszy rok bez avg_wage).
+    Jak projection.wage_path: wiersz avg_wage obowiązuje dla roku przejścia r, gdy lata < r mają avg_wage.
+    """
+    years = range(start_year, end_year)
+    fallback = np.asarray(
+        [1.0 / ((1.0 + wage_growth) ** max(0, current_year - y)) if auto_backcast else 1.0 for y in years]
+    )
+    ref_y = closest_year(params, current_year) if params else None
+    ref_avg = params.get(ref_y, {}).get("avg_wage") if ref_y else None
+    if not ref_avg:
+        return None, fallback, start_year
+    covered_until = start_year
+    while covered_until < end_year and params.get(covered_until, {}).get("avg_wage"):
+        covered_until += 1
+    row = np.asarray([params[y]["avg_wage"] / ref_avg if y < covered_until else 0.0 for y in years])
+    return row, fallback, covered_until
+
+def evaluate_grid(payload, axes: Dict[str, list], default_retire_year: int, params: Dict[int, dict],
+                  current_year: int, wage_growth: float, absencja_dni: Optional[float], cpi: float,
+                  months_for: Callable[[int], int], auto_backcast: bool = True) -> Grid:
+    """
+    Pełny iloczyn kartezjański osi jako operacje na tablicach (bez goal-seek, referencji bez L4 i logowania).
+    Ścieżka płac, limity 250%/30× i L4 liczone raz na wspólny zakres lat; kapitał niesiony narastająco
+    (jedno mnożenie i dodawanie na rok dla całej siatki), a wynik dla roku przejścia r to kapitał po roku r-1.
+    Komórka siatki daje to samo co /simulate dla odpowiedniego payloadu.
+    """
+    gross = np.asarray(axes.get("gross_salary", [payload.gross_salary]), dtype=float)
+    retire = [int(r) for r in axes.get("retire_year", [default_retire_year])]
+    quarters = [int(q) for q in axes.get("quarter_award", [payload.quarter_award])]
+    sick = axes.get("sick_days")
+
+    start_year = payload.start_year
+    end_year = max(retire)
+    years = list(range(start_year, end_year))
+
+    # Płace (wiersze wspólne dla siatki) -> macierz (wariant ścieżki, pensja, rok).
+    params_row, fallback_row, covered_until = _wage_rows(
+        start_year, end_year, params, current_year, wage_growth, auto_backcast
+    )
+    rows = [fallback_row] if params_row is None else [params_row, fallback_row]
+    wages = np.stack(rows)[:, None, :] * gross[None, :, None]
+    if payload.custom_wage_timeline:
+        custom = payload.custom_wage_timeline
+        for t, y in enumerate(years):
+            wages[:, :, t] = float(custom[y]) if y in custom else gross[None, :]
+    avg = np.asarray([params.get(y, {}).get("avg_wage") or 0.0 for y in years], dtype=float)
+    annual = np.minimum(
+        12.0 * np.minimum(wages, np.where(avg > 0, 2.5 * avg, np.inf)),
+        np.where(avg > 0, 30.0 * avg, np.inf),
+    )
+
+    # L4 (wariant dni, rok): custom_sick_days z payloadu ma pierwszeństwo jak w l4_factor_for_year.
+    if sick is None:
+        default = efekt_absencji_factor(absencja_dni) if payload.include_sick_leave else 1.0
+        l4_rows = [[default]]
+    else:
+        l4_rows = [[efekt_absencji_factor(float(d))] for d in sick]
+    l4 = np.repeat(np.asarray(l4_rows, dtype=float), len(years), axis=1)
+    for y, dni in (payload.custom_sick_days or {}).items():
+        if start_year <= int(y) < end_year:
+            l4[:, int(y) - start_year] = efekt_absencji_factor(dni)
+
+    # Kapitał narastająco: (wariant ścieżki, pensja, dni) — zapamiętany na końcu roku r-1 dla każdego r.
+    want = {r - 1 - start_year: r for r in set(retire)}
+    capital_at: Dict[int, "np.ndarray"] = {}
+    cap = np.zeros((wages.shape[0], len(gross), l4.shape[0]))
+    for t, y in enumerate(years):
+        if t:
+            cap *= indeks_roczny(y - 1, y)
+        cap += annual[:, :, t, None] * (SKLADKA_RATE * l4[None, None, :, t])
+        if t in want:
+            capital_at[want[t]] = cap.copy()
+
+    konto = (payload.zus_balance.konto if payload.zus_balance else 0.0) or 0.0
+    subkonto = (payload.zus_balance.subkonto if payload.zus_balance else 0.0) or 0.0
+    out = np.empty((len(gross), len(retire), len(l4_rows), len(quarters), len(GRID_METRICS)))
+    for j, r in enumerate(retire):
+        variant = 0 if params_row is not None and r <= covered_until else len(rows) - 1
+        capital = capital_at[r][variant]
+        discount = (1.0 + cpi) ** max(0, r - current_year)
+        months = max(1, int(months_for(r)))
+        for k, q in enumerate(quarters):
+            nominal = (waloryzuj_kwartalnie_po_31_stycznia(r, q, 1.0) * capital + konto + subkonto) / months
+            out[:, j, :, k, 0] = nominal
+            out[:, j, :, k, 1] = nominal / discount
+            out[:, j, :, k, 2] = np.where(gross[:, None] > 0, 100.0 * (nominal / discount) / gross[:, None], np.nan)
+
+    # Osie w kolejności żądania; osie bez wartości w żądaniu znikają z wyniku (wartość z payloadu).
+    order = [GRID_AXES.index(name) for name in axes]
+    dropped = [i for i in range(len(GRID_AXES)) if i not in order]
+    values = out.transpose(order + dropped + [len(GRID_AXES)])
+    values = values.reshape([out.shape[i] for i in order] + [len(GRID_METRICS)])
+    labels = {"gross_salary": list(gross), "retire_year": retire, "sick_days": sick, "quarter_award": quarters}
+    return Grid(axes={name: [float(v) if name in ("gross_salary", "sick_days") else v for v in labels[name]]
+                      for name in axes}, values=values)
+
+def grid_cells(axes: Dict[str, Sequence]) -> int:
+    n = 1
+    for values in axes.values():
+        n *= len(values)
+    return n
+
+def grid_to_json(grid: Grid) -> Dict:
+    """Osie z etykietami + gęste tablice (listy zagnieżdżone w kolejności osi) dla każdej metryki."""
+    rounded = np.round(grid.values, 2)
+    return {
+        "axes": [{"name": name, "values": values} for name, values in grid.axes.items()],
+        "shape": list(grid.values.shape[:-1]),
+        "metrics": {m: rounded[..., i].tolist() for i, m in enumerate(GRID_METRICS)},
+    }
+
+def grid_to_npz(grid: Grid, f) -> None:
+    """Postać binarna (.npz, bez kompresji): `values` (osie..., metryka) float64, `axes`, `metrics` i wartości osi."""
+    arrays = {"values": grid.values, "axes": np.asarray(list(grid.axes)), "metrics": np.asarray(GRID_METRICS)}
+    for name, values in grid.axes.items():
+        arrays[f"axis_{name}"] = np.asarray(values)
+    np.savez(f, **arrays)
@@ -0,0 +1,155 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from .engine import waloryzuj_kwartalnie_po_31_stycznia
+from .projection import Projection
+from .waloryzacja import indeks_roczny
+
+try:
+    import numpy as np
+except Exception:  # numpy jest opcjonalny — bez niego /simulate/montecarlo zwraca 503
+    np = None
+
+DISTRIBUTIONS = ("normal", "t")
+
+@dataclass(frozen=True)
+class MonteCarloSpec:
+    """
+    Rozkład szoków rocznych (wspólnych dla płac, CPI i waloryzacji rocznej) dla lat today .. retire_year-1:
+    - wage_growth_sd:   odchylenie rocznego wzrostu płac (wokół ścieżki deterministycznej)
+    - cpi_sd:           odchylenie rocznego CPI (wokół CPI z arkusza / ENV)
+    - waloryzacja_sd:   odchylenie rocznego wskaźnika waloryzacji (wokół tabeli założeń)
+    - corr_*:           korelacje szoków (macierz musi być dodatnio określona)
+    - distribution:     'normal' albo 't' (t-Studenta o `df` stopniach swobody, przeskalowany do wariancji 1)
+    """
+    distribution: str = "normal"
+    df: float = 5.0
+    wage_growth_sd: float = 0.015
+    cpi_sd: float = 0.01
+    waloryzacja_sd: float = 0.015
+    corr_wage_cpi: float = 0.5
+    corr_wage_waloryzacja: float = 0.7
+    corr_cpi_waloryzacja: float = 0.5
+
+    def cholesky(self) -> "np.ndarray":
+        c = np.array([
+            [1.0, self.corr_wage_cpi, self.corr_wage_waloryzacja],
+            [self.corr_wage_cpi, 1.0, self.corr_cpi_waloryzacja],
+            [self.corr_wage_waloryzacja, self.corr_cpi_waloryzacja, 1.0],
+        ])
+        try:
+            return np.linalg.cholesky(c)
+        except np.linalg.LinAlgError:
+            raise ValueError("Macierz korelacji szoków nie jest dodatnio określona")
+
+@dataclass(frozen=True)
+class MonteCarloInputs:
+    """
+    Deterministyczne wejście dla jednej osoby (z Projection), płaskie i piklowalne dla procesów roboczych:
+    składki po latach, wskaźnik waloryzacji rocznej stosowany w danym roku do kapitału z roku poprzedniego,
+    oraz stałe potrzebne od kapitału do świadczenia.
+    """
+    years: Sequence[int]
+    contribution: Sequence[float]
+    waloryzacja: Sequence[float]
+    retire_year: int
+    today_year: int
+    quarter_factor: float
+    balances: float
+    months: int
+    cpi: float
+    wage_growth: float
+    gross_salary: float
+
+def inputs_from_projection(proj: Projection, quarter_award: int, konto: float, subkonto: float, months: int,
+                           cpi: float, today_year: int, wage_growth: float, gross_salary: float) -> MonteCarloInputs:
+    n = proj.n_planned
+    years = list(proj.years[:n])
+    return MonteCarloInputs(
+        years=years,
+        contribution=list(proj.contribution[:n]),
+        waloryzacja=[indeks_roczny(y - 1, y) for y in years],
+        retire_year=proj.retire_year,
+        today_year=today_year,
+        quarter_factor=waloryzuj_kwartalnie_po_31_stycznia(proj.retire_year, quarter_award, 1.0),
+        balances=konto + subkonto,
+        months=max(1, int(months)),
+        cpi=cpi,
+        wage_growth=wage_growth,
+        gross_salary=gross_salary,
+    )
+
+def _shocks(rng: "np.random.Generator", spec: MonteCarloSpec, paths: int, horizon: int) -> "np.ndarray":
+    """Skorelowane szoki o wariancji 1, kształt (ścieżki, lata, 3): płace, CPI, waloryzacja."""
+    if spec.distribution == "t":
+        z = rng.standard_t(spec.df, size=(paths, horizon, 3)) * np.sqrt((spec.df - 2.0) / spec.df)
+    else:
+        z = rng.standard_normal(size=(paths, horizon, 3))
+    return z @ spec.cholesky().T
+
+def simulate_paths(inputs: MonteCarloInputs, spec: MonteCarloSpec, paths: int, seed) -> "np.ndarray":
+    """
+    Jedna paczka ścieżek, wektorowo po ścieżkach: zwraca tablicę (paths, 3) — świadczenie nominalne,
+    realne i stopa zastąpienia [%]. Lata przed bieżącym są historią (bez szoków); od bieżącego roku
+    każda ścieżka ma własny wzrost płac, CPI i waloryzację roczną. Przy zerowych odchyleniach
+    wynik jest identyczny z /simulate. `seed` — cokolwiek przyjmuje np.random.default_rng.
+    """
+    rng = np.random.default_rng(seed)
+    horizon = max(0, inputs.retire_year - inputs.today_year)
+    z = _shocks(rng, spec, paths, horizon)
+
+    # Płace: przyrosty względem ścieżki deterministycznej od roku today+1 (pensja z bieżącego roku jest znana).
+    g = (1.0 + inputs.wage_growth + spec.wage_growth_sd * z[:, :, 0]) / (1.0 + inputs.wage_growth)
+    g[:, :1] = 1.0
+    wage_factor = np.cumprod(g, axis=1)
+    cpi = inputs.cpi + spec.cpi_sd * z[:, :, 1]
+    wal_shock = spec.waloryzacja_sd * z[:, :, 2]
+
+    capital = np.zeros(paths)
+    for k, (y, contr, wal) in enumerate(zip(inputs.years, inputs.contribution, inputs.waloryzacja)):
+        h = y - inputs.today_year
+        if 0 <= h < horizon:
+            if k:
+                capital *= wal + wal_shock[:, h]
+            capital += contr * wage_factor[:, h]
+        else:
+            if k:
+                capital *= wal
+            capital += contr
+
+    nominal = (capital * inputs.quarter_factor + inputs.balances) / inputs.months
+    real = nominal / np.prod(1.0 + cpi, axis=1)
+    replacement = 100.0 * real / inputs.gross_salary if inputs.gross_salary > 0 else np.full(paths, np.nan)
+    return np.column_stack([nominal, real, replacement])
+
+def new_seed() -> int:
+    """Losowe ziarno (zwracane w odpowiedzi, żeby wynik dało się odtworzyć; 53 bity — bezpieczne w JSON/JS)."""
+    return int(np.random.SeedSequence().entropy) % (1 << 53)
+
+def chunk_seeds(seed: Optional[int], paths: int, chunk: int) -> List[tuple]:
+    """
+    Podział na paczki (rozmiar, ziarno). Ziarna z SeedSequence.spawn — wynik zależy tylko od `seed`
+    i rozmiaru paczki, nie od liczby procesów, które je liczą.
+    """
+    sizes = [min(chunk, paths - off) for off in range(0, paths, max(1, chunk))]
+    children = np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(sizes, children))
+
+def simulate_chunks(inputs: MonteCarloInputs, spec: MonteCarloSpec, chunks: List[tuple]) -> List["np.ndarray"]:
+    """Paczki z chunk_seeds liczone po kolei w bieżącym procesie."""
+    return [simulate_paths(inputs, spec, n, s) for n, s in chunks]
+
+def summarize(parts: List["np.ndarray"], percentiles: Sequence[float], expected: Optional[float] = None) -> Dict:
+    """Pasma percentyli (i średnia) dla świadczenia nominalnego, realnego i stopy zastąpienia — ze wszystkich paczek."""
+    results = np.concatenate(parts)
+    out: Dict = {}
+    for col, name in enumerate(("benefit_nominal", "benefit_real", "replacement_rate_percent")):
+        values = results[:, col]
+        bands = np.percentile(values, percentiles)
+        out[name] = {
+            "mean": round(float(values.mean()), 2),
+            "percentiles": {f"p{p:g}": round(float(v), 2) for p, v in zip(percentiles, bands)},
+        }
+    if expected:
+        out["probability_meets_expected"] = round(float((results[:, 1] >= expected).mean()), 4)
+    return out
@@ -0,0 +1,277 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from .engine import SKLADKA_RATE, efekt_absencji_factor, waloryzuj_kwartalnie_po_31_stycznia, annuitetyzuj, urealnij
+from .waloryzacja import indeks_roczny
+from .. import metrics
+
+def closest_year(d: Dict[int, dict], target: int) -> Optional[int]:
+    """Najbliższy rok <= target w tabeli; gdy brak — najwcześniejszy dostępny."""
+    if not d:
+        return None
+    le = [k for k in d.keys() if k <= target]
+    if le:
+        return max(le)
+    return min(d.keys())
+
+def cpi_rate(params: Dict[int, dict], year: int, fallback: float) -> float:
+    """CPI z arkusza mentorów dla danego roku (np. 1.0360 -> 0.036); gdy brak — fallback z ENV."""
+    idx = params.get(year, {}).get("cpi_index")
+    if idx:
+        return max(0.0, idx - 1.0)
+    return fallback
+
+def l4_factor_for_year(payload, year: int, absencja_dni: Optional[float]) -> float:
+    """Czynnik L4 dla roku: custom_sick_days[rok] albo średnia absencja (gdy include_sick_leave)."""
+    if payload.custom_sick_days and year in payload.custom_sick_days:
+        return efekt_absencji_factor(payload.custom_sick_days[year])
+    return efekt_absencji_factor(absencja_dni) if payload.include_sick_leave else 1.0
+
+@dataclass
+class Projection:
+    """
+    Płaskie, roczne serie dla jednej osoby (lata start_year .. retire_year-1, opcjonalnie wydłużone
+    o lata po planowanym przejściu — dla goal-seek i scenariuszy opóźnienia):
+    - wage:          wynagrodzenie miesięczne
+    - base_capped:   podstawa miesięczna po limicie 250%
+    - annual_base:   podstawa roczna (12×) po limicie 30×
+    - l4:            czynnik absencji
+    - contribution:  składka roczna (po L4)
+    - index_factor:  waloryzacja roczna od roku składki do retire_year-1 (1.0 dla lat wydłużenia)
+    - indexed:       składka po waloryzacji rocznej
+    Gdy ścieżka z avg_wage nie obejmuje wszystkich lat wydłużenia, przejścia po `path_until` liczy
+    `beyond` — projekcja ze ścieżką, którą wybrałaby osobna projekcja na taki rok (jak wariant w grid).
+    """
+    retire_year: int = 0
+    years: List[int] = field(default_factory=list)
+    wage: List[float] = field(default_factory=list)
+    base_capped: List[float] = field(default_factory=list)
+    annual_base: List[float] = field(default_factory=list)
+    l4: List[float] = field(default_factory=list)
+    contribution: List[float] = field(default_factory=list)
+    index_factor: List[float] = field(default_factory=list)
+    indexed: List[float] = field(default_factory=list)
+    used_params_path: bool = False
+    path_until: Optional[int] = None
+    beyond: Optional["Projection"] = None
+
+    @property
+    def n_planned(self) -> int:
+        """Liczba lat składkowych do planowanego roku przejścia (bez wydłużenia)."""
+        return sum(1 for y in self.years if y < self.retire_year)
+
+    def capital(self, l4_override: Optional[float] = None, retire_year: Optional[int] = None) -> float:
+        """
+        Suma po waloryzacji rocznej dla przejścia w `retire_year` (domyślnie planowany rok);
+        `l4_override` liczy wariant ze stałym czynnikiem L4 (np. 1.0 = bez L4).
+        """
+        if self.beyond is not None and retire_year is not None and retire_year > self.path_until:
+            return self.beyond.capital(l4_override, retire_year)
+        if retire_year is None or retire_year == self.retire_year:
+            if l4_override is None:
+                return sum(self.indexed[:self.n_planned])
+            rate = SKLADKA_RATE * l4_override
+            return sum(b * rate * f for b, f in zip(self.annual_base[:self.n_planned], self.index_factor))
+        end_year = retire_year - 1
+        total = 0.0
+        for y, b, l4 in zip(self.years, self.annual_base, self.l4):
+            if y >= retire_year:
+                break
+            total += b * SKLADKA_RATE * (l4 if l4_override is None else l4_override) * indeks_roczny(y, end_year)
+        return total
+
+def wage_path(payload, retire_year: int, params: Dict[int, dict], current_year: int,
+              wage_growth: float, auto_backcast: bool = True, extend_to: Optional[int] = None) -> tuple[List[float], bool]:
+    """
+    Ścieżka płac dla lat start_year .. retire_year-1 (oraz dalej do extend_to-1):
+    - custom_wage_timeline (brakujące lata = gross_salary),
+    - skalowanie do avg_wage z arkusza mentorów (gdy pełne pokrycie lat do retire_year),
+    - w przeciwnym razie backcast wg `wage_growth` (lub płaska pensja).
+    Wybór ścieżki zależy tylko od lat do planowanego przejścia, więc wydłużenie nie zmienia wyniku bazowego.
+    Lata wydłużenia bez avg_wage dostają ostatnią płacę — build_projection liczy przejścia po nich osobno.
+    """
+    years = range(payload.start_year, retire_year)
+    extra = range(retire_year, max(retire_year, extend_to or retire_year))
+    gross = float(payload.gross_salary)
+
+    if payload.custom_wage_timeline:
+        custom = payload.custom_wage_timeline
+        return [float(custom.get(y, gross)) for y in (*years, *extra)], False
+
+    if params:
+        ref_y = closest_year(params, current_year)
+        ref_avg = params.get(ref_y, {}).get("avg_wage") if ref_y else None
+        if ref_avg and all(params.get(y, {}).get("avg_wage") for y in years):
+            wages = [gross * (params[y]["avg_wage"] / ref_avg) for y in years]
+            last = wages[-1] if wages else gross
+            for y in extra:
+                avg = params.get(y, {}).get("avg_wage")
+                last = gross * (avg / ref_avg) if avg else last
+                wages.append(last)
+            return wages, True
+
+    if auto_backcast:
+        return [gross / ((1.0 + wage_growth) ** max(0, current_year - y)) for y in (*years, *extra)], False
+    return [gross for _ in (*years, *extra)], False
+
+def build_projection(payload, retire_year: int, params: Dict[int, dict], current_year: int,
+                     wage_growth: float, absencja_dni: Optional[float] = None,
+                     auto_backcast: bool = True, extend_to: Optional[int] = None) -> Projection:
+    """
+    Jeden przebieg: płace -> limity 250%/30× -> L4 -> składka -> waloryzacja roczna.
+    Wspólne jądro dla /simulate, /simulate/timeline, /simulate/what-if i /simulate/explain.
+    `extend_to` dopisuje lata składek po planowanym przejściu (do extend_to-1). Gdy któryś z tych lat
+    nie ma avg_wage, przejścia po nim liczy druga projekcja (`beyond`) — wynik jak dla osobnej projekcji.
+    """
+    with metrics.stage("wage_path"):
+        wages, used_params = wage_path(payload, retire_year, params, current_year, wage_growth, auto_backcast, extend_to)
+    years = list(range(payload.start_year, payload.start_year + len(wages)))
+    proj = Projection(retire_year=retire_year, years=years, wage=wages, used_params_path=used_params)
+
+    t0 = metrics.clock()
+    for y, wage in zip(proj.years, wages):
+        avg = params.get(y, {}).get("avg_wage")
+        monthly = min(wage, 2.5 * avg) if avg else wage
+        annual = min(12.0 * monthly, 30.0 * avg) if avg else 12.0 * monthly
+        l4 = l4_factor_for_year(payload, y, absencja_dni)
+
+        proj.base_capped.append(monthly)
+        proj.annual_base.append(annual)
+        proj.l4.append(l4)
+        proj.contribution.append(annual * SKLADKA_RATE * l4)
+    metrics.add("contributions", t0)
+
+    # Waloryzacja roczna: czynnik dla roku y = iloczyn wskaźników y+1 .. retire_year-1 (jedno dzielenie).
+    t0 = metrics.clock()
+    end_year = retire_year - 1
+    proj.index_factor = [indeks_roczny(y, end_year) for y in proj.years]
+    proj.indexed = [c * f for c, f in zip(proj.contribution, proj.index_factor)]
+    metrics.add("annual_indexation", t0)
+
+    if used_params and extend_to:
+        gap = next((y for y in range(retire_year, extend_to) if not params.get(y, {}).get("avg_wage")), None)
+        if gap is not None:
+            proj.path_until = gap
+            proj.beyond = build_projection(payload, gap + 1, params, current_year, wage_growth, absencja_dni,
+                                           auto_backcast, extend_to)
+    return proj
+
+def _running_rows(proj: Projection, l4_override: Optional[float] = None) -> Iterator[tuple[int, float, float]]:
+    """(rok, składka, kapitał narastająco) — po `path_until` z projekcji `beyond`."""
+    if l4_override is None:
+        contributions = proj.contribution
+    else:
+        contributions = [b * SKLADKA_RATE * l4_override for b in proj.annual_base]
+    cap = 0.0
+    last: Optional[int] = None
+    for y, contr in zip(proj.years, contributions):
+        if proj.beyond is not None and y >= proj.path_until:
+            break
+        if last is not None:
+            cap *= indeks_roczny(last, y)
+        cap += contr
+        last = y
+        yield y, contr, cap
+    if proj.beyond is not None:
+        for y, contr, cap in _running_rows(proj.beyond, l4_override):
+            if y >= proj.path_until:
+                yield y, contr, cap
+
+def running_capital(proj: Projection, l4_override: Optional[float] = None) -> Iterator[tuple[int, float]]:
+    """
+    Kapitał po waloryzacji rocznej narastająco: dla każdego roku składki zwraca (rok, kapitał zwaloryzowany
+    do tego roku). Jedno mnożenie i dodawanie na rok. `l4_override` jak w Projection.capital.
+    """
+    for y, _contr, cap in _running_rows(proj, l4_override):
+        yield y, cap
+
+def first_retire_year_meeting(running: Iterable[tuple[int, float]], from_year: int, to_year: int, target: float,
+                              evaluate: Callable[[float, int], float]) -> tuple[Optional[int], int]:
+    """
+    Goal-seek: pierwszy rok przejścia z zakresu from_year..to_year, dla którego evaluate(kapitał, rok) >= target.
+    `running` to kapitał narastająco (rok składki, kapitał) — np. running_capital(proj) — co najmniej do to_year-1.
+    Zwraca (znaleziony rok lub None, ostatni sprawdzony rok).
+    """
+    checked = from_year
+    for y, cap in running:
+        retire_y = y + 1
+        if retire_y < from_year:
+            continue
+        if retire_y > to_year:
+            break
+        checked = retire_y
+        if evaluate(cap, retire_y) >= target:
+            return retire_y, checked
+    return None, checked
+
+def benefit_from_capital(capital: float, retire_year: int, quarter_award: int, konto: float, subkonto: float,
+                         months: int, cpi: float, today_year: int) -> tuple[float, float, float]:
+    """Waloryzacja kwartalna + konto/subkonto -> annuitetyzacja -> urealnienie. Zwraca (podstawa, nominal, real)."""
+    t0 = metrics.clock()
+    podstawa = waloryzuj_kwartalnie_po_31_stycznia(retire_year, quarter_award, capital) + konto + subkonto
+    metrics.add("quarterly_indexation", t0)
+    nominal, real = benefit_from_podstawa(podstawa, retire_year, months, cpi, today_year)
+    return podstawa, nominal, real
+
+def benefit_from_podstawa(podstawa: float, retire_year: int, months: int, cpi: float,
+                          today_year: int) -> tuple[float, float]:
+    """Annuitetyzacja podstawy (po waloryzacji kwartalnej + konto/subkonto) i urealnienie -> (nominal, real)."""
+    t0 = metrics.clock()
+    nominal = annuitetyzuj(podstawa, months)
+    real = urealnij(nominal, cpi, max(0, retire_year - today_year))
+    metrics.add("annuitization", t0)
+    return nominal, real
+
+@dataclass
+class CapitalCurve:
+    """
+    Kolumnowe serie dla kolejnych lat przejścia (retire_year[i] = rok ostatniej składki + 1):
+    - contribution:  składka z roku poprzedzającego przejście
+    - capital:       kapitał po waloryzacji rocznej (wszystkie wcześniejsze składki przeindeksowane)
+    - podstawa:      po waloryzacji kwartalnej + konto + subkonto
+    - nominal, real: świadczenie miesięczne przy przejściu w danym roku
+    """
+    retire_year: List[int] = field(default_factory=list)
+    contribution: List[float] = field(default_factory=list)
+    capital: List[float] = field(default_factory=list)
+    podstawa: List[float] = field(default_factory=list)
+    nominal: List[float] = field(default_factory=list)
+    real: List[float] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.retire_year)
+
+def iter_capital_curve(proj: Projection, quarter_award: int, konto: float, subkonto: float,
+                       months_for: Callable[[int], int], cpi: float, today_year: int,
+                       until: Optional[int] = None) -> Iterator[tuple[int, float, float, float, float, float]]:
+    """
+    Świadczenie dla każdego możliwego roku przejścia start_year+1 .. `until` (domyślnie planowany rok)
+    w jednym przebiegu O(n): kapitał niesiony narastająco (running_capital), bez ponownego sumowania.
+    Generator (rok przejścia, składka, kapitał, podstawa, nominal, real) — wiersz liczony dopiero
+    przy pobraniu, więc odpowiedź strumieniowa może wysłać pierwsze lata przed policzeniem ostatnich.
+    Projekcja musi obejmować lata składek do until-1 (extend_to w build_projection).
+    """
+    until = proj.retire_year if until is None else until
+    for y, contr, cap in _running_rows(proj):
+        retire_y = y + 1
+        if retire_y > until:
+            break
+        podstawa, nominal, real = benefit_from_capital(
+            cap, retire_y, quarter_award, konto, subkonto, months_for(retire_y), cpi, today_year
+        )
+        yield retire_y, contr, cap, podstawa, nominal, real
+
+def capital_curve(proj: Projection, quarter_award: int, konto: float, subkonto: float,
+                  months_for: Callable[[int], int], cpi: float, today_year: int,
+                  until: Optional[int] = None) -> CapitalCurve:
+    """Serie kolumnowe z iter_capital_curve (te same argumenty)."""
+    curve = CapitalCurve()
+    rows = iter_capital_curve(proj, quarter_award, konto, subkonto, months_for, cpi, today_year, until)
+    for retire_y, contr, cap, podstawa, nominal, real in rows:
+        curve.retire_year.append(retire_y)
+        curve.contribution.append(contr)
+        curve.capital.append(cap)
+        curve.podstawa.append(podstawa)
+        curve.nominal.append(nominal)
+        curve.real.append(real)
+    return curve
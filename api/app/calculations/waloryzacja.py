@@ -1,16 +1,91 @@
 import json
+from contextvars import ContextVar
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import Iterator, Mapping, Optional, Tuple
 
 BASE = Path(__file__).resolve().parents[2]
 A_PATH = BASE / "data" / "assumptions_from_parametry.json"
 
-with open(A_PATH, "r", encoding="utf-8") as f:
-    A: Dict = json.load(f)
+@dataclass(frozen=True)
+class Assumptions:
+    """
+    Niezmienny zestaw założeń z JSON wraz z indeksem pochodnym:
+    cum[i] = iloczyn wskaźników waloryzacji rocznej za lata cum_start .. cum_start+i.
+    """
+    data: Mapping
+    cum_start: int = 0
+    cum: Tuple[float, ...] = ()
+
+def build_assumptions(data: dict) -> Assumptions:
+    table = {int(k): float(v) for k, v in data.get("waloryzacja_roczna", {}).items()}
+    if not table:
+        return Assumptions(data=data)
+    start, end = min(table), max(table)
+    cum = []
+    running = 1.0
+    for rok in range(start, end + 1):
+        running *= table.get(rok, 1.0)
+        cum.append(running)
+    return Assumptions(data=data, cum_start=start, cum=tuple(cum))
+
+def read_assumptions(path: Path = A_PATH) -> Assumptions:
+    """Wczytuje założenia z JSON (bez instalowania jako bieżące)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return build_assumptions(json.load(f))
+
+# Bieżące założenia: globalne (podmieniane jednym przypisaniem) albo przypięte w kontekście requestu.
+_GLOBAL: Assumptions = Assumptions(data={})
+_PINNED: ContextVar[Optional[Assumptions]] = ContextVar("assumptions", default=None)
+
+def current() -> Assumptions:
+    return _PINNED.get() or _GLOBAL
+
+def install(a: Assumptions):
+    global _GLOBAL
+    _GLOBAL = a
+
+def pin(a: Assumptions):
+    """Przypina założenia w bieżącym kontekście (np. na czas requestu); zwraca token do reset()."""
+    return _PINNED.set(a)
+
+def unpin(token):
+    _PINNED.reset(token)
+
+def load_assumptions():
+    """Wczytuje (lub przeładowuje) założenia z JSON i instaluje je jako bieżące."""
+    install(read_assumptions())
+
+class _AssumptionsView(Mapping):
+    """Słownik tylko do odczytu wskazujący na bieżące (przypięte) założenia."""
+    def __getitem__(self, key):
+        return current().data[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(current().data)
+
+    def __len__(self) -> int:
+        return len(current().data)
+
+A: Mapping = _AssumptionsView()
+
+load_assumptions()
+
+def _cum_do(a: Assumptions, rok: int) -> float:
+    if not a.cum or rok < a.cum_start:
+        return 1.0
+    return a.cum[min(rok - a.cum_start, len(a.cum) - 1)]
 
 def waloryzacja_roczna(rok: int) -> float:
     return float(A.get("waloryzacja_roczna", {}).get(str(rok), 1.0))
 
+def indeks_roczny(od_roku: int, do_roku: int) -> float:
+    """Łączny wskaźnik waloryzacji rocznej za lata od_roku+1 .. do_roku (O(1))."""
+    if do_roku <= od_roku:
+        return 1.0
+    a = current()
+    return _cum_do(a, do_roku) / _cum_do(a, od_roku)
+
 def waloryzacja_kwartalna(rok: int, kwartal: int) -> float:
     return float(A.get("waloryzacja_kwartalna", {}).get(f"{rok}Q{kwartal}", 1.0))
 
@@ -0,0 +1,136 @@
+"""
+Pula procesów dla zadań obciążających CPU (render PDF, budowa XLSX, paczki Monte Carlo).
+
+Ciężka praca nie zajmuje wspólnej puli wątków Starlette ani GIL-a procesu API, więc seria
+pobrań PDF nie blokuje tanich wywołań /simulate. Procesy robocze startują z załadowanym
+reportlab + czcionkami i openpyxl. Zadania dostają w argumentach wszystko, czego potrzebują
+(wynik symulacji liczony na snapshocie danych przypiętym do requestu), więc worker nigdy
+nie liczy na nieaktualnych tabelach.
+
+ENV: CPU_POOL_SIZE (0 = bez puli, zadania w wątku), CPU_TASK_TIMEOUT_S.
+"""
+import asyncio
+import importlib
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+class CpuTaskTimeout(Exception):
+    pass
+
+def _default_pool_size() -> int:
+    return min(4, os.cpu_count() or 1)
+
+def pool_size() -> int:
+    try:
+        return max(0, int(os.getenv("CPU_POOL_SIZE", str(_default_pool_size()))))
+    except Exception:
+        return _default_pool_size()
+
+def task_timeout() -> float:
+    try:
+        return max(1.0, float(os.getenv("CPU_TASK_TIMEOUT_S", "30")))
+    except Exception:
+        return 30.0
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+def _init_worker():
+    """Preload w procesie roboczym: reportlab + rejestracja czcionek, openpyxl."""
+    from . import pdf_report
+    pdf_report.ensure_fonts()
+    importlib.import_module("openpyxl")  # tylko rozgrzanie importu — pierwszy eksport XLSX nie płaci za ładowanie
+
+def _noop() -> int:
+    return os.getpid()
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """Pula tworzona przy pierwszym użyciu (spawn — bez dziedziczenia wątków loggera i połączeń SQLite)."""
+    global _POOL
+    if pool_size() == 0:
+        return None
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(
+                max_workers=pool_size(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _POOL
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is broken:
+            _POOL = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def warm_pool():
+    """Uruchamia wszystkie procesy robocze z góry (faza warm-up)."""
+    pool = get_pool()
+    if pool is not None:
+        for f in [pool.submit(_noop) for _ in range(pool_size())]:
+            f.result()
+
+def shutdown_pool():
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def run_cpu(fn: Callable, *args: Any) -> Any:
+    """
+    Wykonuje fn(*args) w puli procesów z limitem czasu (CpuTaskTimeout po przekroczeniu).
+    Bez puli (CPU_POOL_SIZE=0) — w puli wątków, jak zwykły endpoint `def`.
+    Zadanie, które już wystartowało, po timeoucie dokończy się w tle; wynik jest porzucany.
+    """
+    pool = get_pool()
+    if pool is None:
+        return await run_in_threadpool(fn, *args)
+    fut = asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    try:
+        return await asyncio.wait_for(fut, task_timeout())
+    except asyncio.TimeoutError:
+        raise CpuTaskTimeout(f"Zadanie przekroczyło {task_timeout():.0f} s")
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise
+
+# --- Zadania (funkcje modułu — muszą dać się zapiklować) ---
+def render_pdf_task(payload, result: dict, timeline: list, assumptions: dict, today) -> bytes:
+    from . import pdf_report
+    return pdf_report.render_report_pdf(payload, result, timeline, assumptions, today)
+
+def build_xlsx_task(db_path: str, date_from: Optional[str], date_to: Optional[str], filters: dict) -> str:
+    """Buduje XLSX z bazy logów do pliku tymczasowego i zwraca jego ścieżkę (usuwa ją wywołujący)."""
+    from .usage_export import write_xlsx_to
+    from .usage_store import UsageStore
+    rows = UsageStore(db_path).query(date_from, date_to, **filters)
+    fd, path = tempfile.mkstemp(prefix="uzycia_", suffix=".xlsx")
+    with os.fdopen(fd, "wb") as f:
+        write_xlsx_to(rows, f)
+    return path
+
+def montecarlo_task(inputs, spec, paths: int, seed):
+    """Jedna paczka ścieżek Monte Carlo — zwraca tablicę (paths, 3), patrz calculations.montecarlo."""
+    from .calculations.montecarlo import simulate_paths
+    return simulate_paths(inputs, spec, paths, seed)
+
+def render_pdf_batch_task(items: list, assumptions: dict, today) -> list:
+    """Paczka raportów (POST /report/pdf/bulk): items = [(payload, result, timeline)] -> PDF albo komunikat błędu per rekord."""
+    from . import pdf_report
+    out = []
+    for payload, result, timeline in items:
+        try:
+            out.append(pdf_report.render_report_pdf(payload, result, timeline, assumptions, today))
+        except Exception as e:
+            out.append(f"{type(e).__name__}: {e}")
+    return out
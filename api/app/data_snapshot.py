@@ -0,0 +1,157 @@
+"""
+Niezmienny snapshot wczytanych danych (PARAMS, AVG_TABLE, ASSUMPTIONS + indeksy pochodne).
+
+Reload buduje nowy snapshot obok starego i podmienia go jednym przypisaniem referencji.
+Każdy request przypina snapshot, z którym wystartował (ContextVar), więc równoległy reload
+nigdy nie pokaże mu pustych ani częściowo wczytanych tabel.
+"""
+import datetime as dt
+import os
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Dict, Iterator, List, Mapping, Optional
+
+from .cache import data_version
+from .calculations import waloryzacja
+from .calculations.waloryzacja import Assumptions
+
+@dataclass(frozen=True)
+class DataSnapshot:
+    version: str
+    params: Mapping[int, Mapping]
+    avg_table: Mapping[int, float]
+    assumptions: Assumptions
+    tables_info: Mapping
+    loaded_at: str
+
+def build_snapshot(params: Dict[int, dict], avg_table: Dict[int, float], assumptions: Assumptions,
+                   tables_info: Optional[dict] = None) -> DataSnapshot:
+    """Zamraża świeżo wczytane tabele; wersja = skrót treści (jak klucze cache)."""
+    return DataSnapshot(
+        version=data_version(params, avg_table, assumptions.data),
+        params=MappingProxyType({y: MappingProxyType(dict(row)) for y, row in params.items()}),
+        avg_table=MappingProxyType(dict(avg_table)),
+        assumptions=assumptions,
+        tables_info=MappingProxyType(dict(tables_info or {})),
+        loaded_at=dt.datetime.now().isoformat(timespec="seconds"),
+    )
+
+_CURRENT: Optional[DataSnapshot] = None
+_PINNED: ContextVar[Optional[DataSnapshot]] = ContextVar("data_snapshot", default=None)
+
+def current() -> DataSnapshot:
+    """Snapshot przypięty do bieżącego requestu, a poza requestem — najnowszy."""
+    snap = _PINNED.get() or _CURRENT
+    if snap is None:
+        raise RuntimeError("Dane nie zostały jeszcze wczytane")
+    return snap
+
+def install(snap: DataSnapshot):
+    """Publikuje nowy snapshot (pojedyncze przypisanie); trwające requesty zostają przy swoim."""
+    global _CURRENT
+    waloryzacja.install(snap.assumptions)
+    _CURRENT = snap
+
+class TableView(Mapping):
+    """Słownik tylko do odczytu wskazujący na tabelę z bieżącego snapshotu (np. PARAMS)."""
+    def __init__(self, attr: str):
+        self._attr = attr
+
+    def _table(self) -> Mapping:
+        return getattr(current(), self._attr)
+
+    def __getitem__(self, key):
+        return self._table()[key]
+
+    def get(self, key, default=None):
+        return self._table().get(key, default)
+
+    def __iter__(self) -> Iterator:
+        return iter(self._table())
+
+    def __len__(self) -> int:
+        return len(self._table())
+
+class SnapshotMiddleware:
+    """
+    Middleware ASGI: przypina bieżący snapshot (i jego założenia) na czas requestu
+    i dopisuje do odpowiedzi nagłówek X-Data-Version. `refresh` (opcjonalnie) jest wołane
+    przed przypięciem — np. żeby zauważyć reload opublikowany przez inny worker. Działa w pętli
+    zdarzeń, więc musi być tanie (samo wczytywanie — w tle).
+    """
+    def __init__(self, app, refresh: Optional[Callable[[], None]] = None):
+        self.app = app
+        self.refresh = refresh
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if self.refresh is not None:
+            self.refresh()
+        snap = current()
+        token = _PINNED.set(snap)
+        a_token = waloryzacja.pin(snap.assumptions)
+        version = snap.version.encode("latin-1")
+
+        async def send_with_version(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-data-version", version)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_version)
+        finally:
+            waloryzacja.unpin(a_token)
+            _PINNED.reset(token)
+
+class FileWatcher:
+    """
+    Co `interval` s sprawdza mtime/rozmiar plików źródłowych i woła `on_change` po zmianie
+    (bez zależności od inotify/watchdog — zwykłe odpytywanie).
+    """
+    def __init__(self, paths: List[Path], interval: float, on_change: Callable[[], None]):
+        self.paths = [Path(p) for p in paths]
+        self.interval = max(0.5, interval)
+        self.on_change = on_change
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._state = self._stat()
+
+    def _stat(self) -> tuple:
+        out = []
+        for p in self.paths:
+            try:
+                st = os.stat(p)
+                out.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                out.append(None)
+        return tuple(out)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="data-watch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            state = self._stat()
+            if state == self._state:
+                pending = None
+                continue
+            if state != pending:
+                # Plik mógł być jeszcze zapisywany — przeładuj dopiero, gdy stan się ustabilizuje.
+                pending = state
+                continue
+            self._state, pending = state, None
+            try:
+                self.on_change()
+            except Exception:
+                pass
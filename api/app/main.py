@@ -1,30 +1,56 @@
-from fastapi import FastAPI, Body, Query, Response, HTTPException
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, List
+from fastapi import FastAPI, Body, Depends, Query, Response, HTTPException
+from pydantic import ValidationError
+from typing import Any, Optional, Dict, Iterable, Iterator, List, Mapping
+from dataclasses import asdict
 import datetime as dt
 from pathlib import Path
-from fastapi.responses import StreamingResponse, RedirectResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic.config import ConfigDict
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+import anyio.to_thread
 
+import asyncio
 import os
-import io
-import csv
 import copy
-
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib import colors
-
-import openpyxl
-
-from .calculations.engine import (
-    efekt_absencji_factor, waloryzuj_rocznie, waloryzuj_kwartalnie_po_31_stycznia,
-    annuitetyzuj, urealnij
+import json
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from .models import Balance, SimInput
+from .calculations.engine import waloryzuj_kwartalnie_po_31_stycznia
+from .calculations.projection import (
+    CapitalCurve, Projection, build_projection, benefit_from_capital, benefit_from_podstawa, capital_curve,
+    cpi_rate, first_retire_year_meeting, iter_capital_curve, l4_factor_for_year, running_capital
+)
+from .calculations.batch import numpy_available, project_group
+from .calculations.grid import GRID_AXES, evaluate_grid, grid_cells, grid_to_json, grid_to_npz
+from .calculations.montecarlo import (
+    DISTRIBUTIONS, MonteCarloSpec, chunk_seeds, inputs_from_projection, new_seed, simulate_chunks, summarize
+)
+from .calculations.waloryzacja import A as ASSUMPTIONS, A_PATH, build_assumptions
+from .usage_log import create_logger
+from .usage_store import UsageStore, import_legacy_csv
+from .usage_export import iter_csv, iter_file
+from .cpu_pool import (
+    CpuTaskTimeout, build_xlsx_task, get_pool, montecarlo_task, pool_size, render_pdf_batch_task, render_pdf_task,
+    run_cpu, shutdown_pool, warm_pool
+)
+from .bulk_report import render_bulk, zip_stream
+from .streaming import CSV_MEDIA, NDJSON_MEDIA, iter_csv_rows, iter_ndjson
+from .cache import LRUCache, cache_key
+from .metrics import MetricsMiddleware, metrics_enabled, render_prometheus, stage
+from .profiling import (
+    PROFILES, SLOWEST, ProfiledRoute, ProfilingMiddleware, profile_pstats, profile_text, profiling_active,
+    require_admin, require_metrics_access
+)
+from .tables import generation_counter, load_tables
+from .data_snapshot import (
+    DataSnapshot, FileWatcher, SnapshotMiddleware, TableView, build_snapshot, current as current_snapshot,
+    install as install_snapshot
 )
-from .calculations.waloryzacja import A as ASSUMPTIONS
 
 try:
     from dotenv import load_dotenv
@@ -32,114 +58,110 @@ try:
 except Exception:
     pass
 
+# --- Start: czasy inicjalizacji podsystemów (ms), raportowane przez /ready ---
+_INIT_T0 = time.perf_counter()
+STARTUP_MS: Dict[str, float] = {}
+
+@contextmanager
+def _startup_timer(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_MS[name] = round((time.perf_counter() - t0) * 1000, 2)
+
 # --- Paths / storage ---
 BASE = Path(__file__).resolve().parents[1]
-STORAGE = BASE / "storage"; STORAGE.mkdir(exist_ok=True)
-FONTS_DIR = BASE / "fonts"; FONTS_DIR.mkdir(exist_ok=True)
-DATA_DIR = BASE / "data"; DATA_DIR.mkdir(exist_ok=True)
-LOG_CSV = STORAGE / "usage.csv"
-
-# --- Colors (ZUS palette) ---
-ZUS_ORANGE = colors.Color(255/255, 179/255, 79/255)
-ZUS_GREEN  = colors.Color(0/255, 153/255, 63/255)
-ZUS_GRAY   = colors.Color(190/255, 195/255, 206/255)
-ZUS_BLUE   = colors.Color(63/255, 132/255, 210/255)
-ZUS_NAVY   = colors.Color(0/255, 65/255, 110/255)
-ZUS_RED    = colors.Color(240/255, 94/255, 94/255)
-ZUS_BLACK  = colors.black
-ZUS_LIGHT_BG = colors.Color(246/255, 248/255, 251/255)
-
-ACCENT_YELLOW = colors.Color(255/255, 203/255, 0/255)
-ACCENT_TEAL   = colors.Color(0/255, 185/255, 185/255)
-
-# --- Layout constants for PDF ---
-MARGIN_X = 32       
-MARGIN_TOP = 78      
-SECTION_GAP = 22     
-LINE_GAP = 14        
-
-# --- Typography (CSS-like font stack dla ReportLab) ---
-FONT_MAIN = "Helvetica"          
-FONT_BOLD = "Helvetica-Bold"
-
-def _register_polish_fonts():
+STORAGE = BASE / "storage"
+DATA_DIR = BASE / "data"
+LOG_CSV = STORAGE / "usage.csv"  # stary format — importowany jednorazowo do bazy
+LOG_DB = Path(os.getenv("USAGE_DB", str(STORAGE / "usage.sqlite3")))  # ENV USAGE_DB: inna baza (np. benchmark)
+with _startup_timer("usage_store"):
+    USAGE_STORE = UsageStore(LOG_DB)
+    import_legacy_csv(USAGE_STORE, LOG_CSV)
+    USAGE_LOG = create_logger(USAGE_STORE)
+
+
+# --- Podsystemy ładowane leniwie (PDF/czcionki, XLSX) + opcjonalny warm-up ---
+WARMUP = os.getenv("WARMUP", "0") == "1"
+READY = threading.Event()
+
+def _pdf_module():
+    """Moduł raportu PDF: import reportlab i rejestracja czcionek dopiero przy pierwszym użyciu."""
+    t0 = time.perf_counter()
+    from . import pdf_report
+    pdf_report.ensure_fonts()
+    STARTUP_MS.setdefault("pdf", round((time.perf_counter() - t0) * 1000, 2))
+    return pdf_report
+
+def _xlsx_module():
+    """openpyxl (eksport XLSX) — import przy pierwszym użyciu."""
+    t0 = time.perf_counter()
+    import openpyxl
+    STARTUP_MS.setdefault("xlsx", round((time.perf_counter() - t0) * 1000, 2))
+    return openpyxl
+
+def warm_up():
     """
-    Ustawia główną rodzinę czcionek wg kolejności jak w CSS:
-    ui-sans-serif, system-ui, -apple-system, 'Segoe UI', Roboto, Helvetica, Arial.
-    Szuka plików TTF/OTF w katalogu ./fonts oraz w typowych ścieżkach systemowych.
-    Pierwsza znaleziona para (Regular + Bold) staje się FONT_MAIN / FONT_BOLD.
-    Zawsze zostawia Helvetica jako ostateczny fallback.
+    Inicjalizuje podsystemy z góry (WARMUP=1); do tego czasu /ready zwraca 503.
+    Z pulą procesów (CPU_POOL_SIZE > 0) PDF/XLSX ładują się w procesach roboczych, nie w API.
     """
-    import sys
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-
-    # 1) Kolejność preferencji (nazwa logiczna, lista wzorców plików Regular, Bold)
-    PREFERRED = [
-        ("SFPro",              
-         ["SFProText-Regular.otf", "SFUIText-Regular.otf", "SFNS.ttf"],
-         ["SFProText-Bold.otf", "SFUIText-Bold.otf", "SFNS-Bold.ttf"]),
-        ("SegoeUI",            
-         ["segoeui.ttf", "Segoe UI.ttf"],
-         ["segoeuib.ttf", "Segoe UI Bold.ttf"]),
-        ("Roboto",            
-         ["Roboto-Regular.ttf"],
-         ["Roboto-Bold.ttf"]),
-        ("Arial",
-         ["Arial.ttf", "arial.ttf"],
-         ["Arial Bold.ttf", "arialbd.ttf"]),
-        ("DejaVuSans",
-         ["DejaVuSans.ttf"],
-         ["DejaVuSans-Bold.ttf"]),
-    ]
+    with _startup_timer("warmup"):
+        if get_pool() is not None:
+            with _startup_timer("cpu_pool"):
+                warm_pool()
+        else:
+            _pdf_module()
+            _xlsx_module()
+    READY.set()
 
-    # 2) Gdzie szukać plików
-    search_dirs = [
-        str(FONTS_DIR),                        
-        "/System/Library/Fonts", "/Library/Fonts",                      
-        "C:/Windows/Fonts",                                                         
-        "/usr/share/fonts", "/usr/local/share/fonts", "~/.local/share/fonts", "~/.fonts"  
-    ]
-    search_dirs = [os.path.expanduser(d) for d in search_dirs if os.path.isdir(os.path.expanduser(d))]
-
-    def _find_first(paths):
-        for base in search_dirs:
-            for name in paths:
-                p = os.path.join(base, name)
-                if os.path.isfile(p):
-                    return p
-        return None
-
-    def _try_register(alias, regular_candidates, bold_candidates):
-        reg = _find_first(regular_candidates)
-        bold = _find_first(bold_candidates)
-        if not reg or not bold:
-            return False
-        try:
-            pdfmetrics.registerFont(TTFont(alias, reg))
-            pdfmetrics.registerFont(TTFont(alias+"-Bold", bold))
-            return True
-        except Exception:
-            return False
-
-    # 3) Przejdź po stacku i wybierz pierwszą działającą parę
-    global FONT_MAIN, FONT_BOLD
-    for alias, regs, bolds in PREFERRED:
-        if _try_register(alias, regs, bolds):
-            FONT_MAIN = alias
-            FONT_BOLD = alias + "-Bold"
-            break
+def threadpool_size() -> int:
+    """Pojemność puli wątków dla lekkich endpointów `def` (ENV THREADPOOL_SIZE, domyślnie 40 jak w anyio)."""
+    try:
+        return max(1, int(os.getenv("THREADPOOL_SIZE", "40")))
+    except Exception:
+        return 40
 
-_register_polish_fonts()
+if not WARMUP:
+    READY.set()
 
-# --- App ---
-app = FastAPI(title="Emerytura360 API", version="0.4.0")
+def data_watch_interval() -> float:
+    """Co ile sekund sprawdzać pliki danych i przeładować je po zmianie (ENV DATA_WATCH_S, 0 = wyłączone)."""
+    try:
+        return max(0.0, float(os.getenv("DATA_WATCH_S", "0")))
+    except Exception:
+        return 0.0
 
+# --- App ---
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threadpool_size()
+    if WARMUP and not READY.is_set():
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    watcher = None
+    if data_watch_interval() > 0:
+        watcher = FileWatcher([PARAMS_XLSX, AVG_XLSX, A_PATH], data_watch_interval(), reload_data)
+        watcher.start()
+    yield
+    if watcher is not None:
+        watcher.stop()
+    shutdown_pool()
+    # Shutdown: dopisz zaległe logi użycia
+    USAGE_LOG.close()
+
+app = FastAPI(title="Emerytura360 API", version="0.4.0", lifespan=lifespan)
+app.router.route_class = ProfiledRoute  # argumenty endpointu dla SLOWEST + profilowanie na żądanie admina
+
+app.add_middleware(SnapshotMiddleware, refresh=lambda: sync_shared_tables())
+app.add_middleware(ProfilingMiddleware)
+if metrics_enabled():
+    app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
 
 @app.get("/", include_in_schema=False)
@@ -153,167 +175,65 @@ def health():
         "version": "0.4.0",
         "avg_loaded": bool(AVG_TABLE),
         "params_loaded": bool(PARAMS),
+        "data_version": current_snapshot().version,
         "demo": DEMO
     }
 
-# --- MODELS ---
-class Balance(BaseModel):
-    konto: Optional[float] = 0.0
-    subkonto: Optional[float] = 0.0
-
-class SimInput(BaseModel):
-    age: int = Field(..., ge=16, le=80)
-    sex: str = Field(..., pattern="^[KkMm]$")
-    gross_salary: float = Field(..., gt=0)
-    start_year: int = Field(
-        ...,
-        description="Rok rozpoczęcia pracy (liczony od stycznia danego roku)."
-    )
-    retire_year: Optional[int] = Field(
-        None,
-        description="Planowany rok zakończenia aktywności zawodowej (styczeń). Domyślnie: osiągnięcie wieku 60 (K) / 65 (M)."
-    )
-    include_sick_leave: bool = Field(
-        True,
-        description="Uwzględnia średnią absencję chorobową (dni/rok) różną dla K/M."
-    )
-    quarter_award: int = Field(3, ge=1, le=4)
-    zus_balance: Optional[Balance] = None
-    custom_wage_timeline: Optional[Dict[int, float]] = None
-    custom_sick_days: Optional[Dict[int, float]] = None  
-    expected_pension: Optional[float] = None
-    postal_code: Optional[str] = None
-
-    model_config = ConfigDict(json_schema_extra={
-        "example": {
-            "age": 28, "sex": "K", "gross_salary": 8500,
-            "start_year": 2020, "retire_year": 2065,
-            "include_sick_leave": True, "quarter_award": 3,
-            "zus_balance": {"konto": 0, "subkonto": 0},
-            "custom_wage_timeline": None,
-            "expected_pension": 5000, "postal_code": "30-001"
-        }
-    })
-
-# --- Helpers: assumptions & averages table ---
-AVG_TABLE: Dict[int, float] = {}
-
-# --- Mentor params (CPI, real wage, avg wage, waloryzacje) ---
-PARAMS: Dict[int, dict] = {}
+@app.get("/ready")
+def ready(response: Response):
+    """
+    Gotowość do ruchu (readiness probe) — w odróżnieniu od /health (liveness) czeka na warm-up
+    podsystemów, gdy WARMUP=1. Zwraca też czasy startu podsystemów w ms.
+    """
+    is_ready = READY.is_set()
+    if not is_ready:
+        response.status_code = 503
+    return {"ready": is_ready, "warmup": WARMUP, "startup_ms": STARTUP_MS}
+
+# --- Dane: niezmienny snapshot (PARAMS, AVG_TABLE, ASSUMPTIONS), podmieniany atomowo przy reloadzie ---
+# PARAMS / AVG_TABLE / ASSUMPTIONS to widoki tylko do odczytu na snapshot przypięty do requestu.
+PARAMS_XLSX = DATA_DIR / "parametry_mentor.xlsx"
+AVG_XLSX = DATA_DIR / "avg_benefit.xlsx"
+PARAMS: Mapping[int, Mapping] = TableView("params")
+AVG_TABLE: Mapping[int, float] = TableView("avg_table")
 
-def _norm(s) -> str:
-    return str(s or "").replace("\xa0", " ").strip().lower()
+DEMO = os.getenv("DEMO", "0") == "1"
 
-def _find_col(headers: Dict[str, int], *fragments: str) -> Optional[int]:
-    for name, idx in headers.items():
-        n = _norm(name)
-        if all(_norm(frag) in n for frag in fragments):
-            return idx
-    return None
+def _seed_avg_if_missing(avg: Dict[int, float]):
+    """Prosty seed średnich dla dema/hackathonu, gdy brak pliku avg_benefit.xlsx."""
+    if not avg:
+        base = 3800.0
+        for y in range(dt.date.today().year, dt.date.today().year + 10):
+            avg[y] = base * (1.03 ** (y - dt.date.today().year))
 
-def _to_float(v) -> Optional[float]:
-    try:
-        s = str(v).replace(" ", "").replace("\xa0", "").replace(",", ".")
-        return float(s)
-    except Exception:
-        return None
+TABLES_SNAPSHOT = STORAGE / "tables.snapshot"
+TABLES_GEN = generation_counter(TABLES_SNAPSHOT)
 
-def load_params_table():
+def load_data_snapshot() -> DataSnapshot:
     """
-    Wczytuje arkusz mentorów: data/parametry_mentor.xlsx (aktywny arkusz).
-    Oczekiwane kolumny (wystarczy fragment nazwy):
-    - 'rok'
-    - 'wskaźnik cen towarów i usług' (CPI, np. 1.0360)
-    - 'realnego wzrostu przeciętn' (real wage index, np. 1.0202)
-    - 'przeciętne miesięczne wynagrodzenie'
-    - 'waloryzacji składek ... na koncie'
-    - 'waloryzacji składek ... na subkoncie'
+    Buduje nowy snapshot danych: tabele XLSX i założenia JSON ze skompilowanego snapshotu
+    (tables.load_tables, mmap). Niczego nie publikuje w procesie — robi to install_snapshot.
     """
-    path = DATA_DIR / "parametry_mentor.xlsx"
-    if not path.exists():
-        return
-    try:
-        wb = openpyxl.load_workbook(path, data_only=True)
-        ws = wb.active
-        headers = { (ws.cell(row=1, column=i).value or ""): i for i in range(1, ws.max_column+1) }
-
-        c_year = _find_col(headers, "rok")
-        c_cpi  = _find_col(headers, "wskaźnik cen towarów i usług")
-        c_rw   = _find_col(headers, "realnego wzrostu przeciętn")
-        c_avg  = _find_col(headers, "przeciętne miesięczne wynagrodzenie")
-        c_wk   = _find_col(headers, "waloryzacji", "na koncie")
-        c_ws   = _find_col(headers, "waloryzacji", "na subkoncie")
-
-        for r in range(2, ws.max_row+1):
-            y_raw = ws.cell(row=r, column=c_year).value if c_year else None
-            if not y_raw:
-                continue
-            try:
-                y = int(str(y_raw).split(".")[0])
-            except Exception:
-                continue
-
-            cpi_idx   = _to_float(ws.cell(r, c_cpi).value) if c_cpi else None
-            real_wage = _to_float(ws.cell(r, c_rw).value) if c_rw else None
-            avg_wage  = _to_float(ws.cell(r, c_avg).value) if c_avg else None
-            wal_konto = _to_float(ws.cell(r, c_wk).value) if c_wk else None
-            wal_sub   = _to_float(ws.cell(r, c_ws).value) if c_ws else None
-
-            PARAMS[y] = {
-                "cpi_index": cpi_idx,         
-                "real_wage_index": real_wage,  
-                "avg_wage": avg_wage,           
-                "wal_konto": wal_konto,        
-                "wal_sub": wal_sub,          
-            }
-    except Exception:
-        pass
+    params, avg, assumptions, info = load_tables(PARAMS_XLSX, AVG_XLSX, TABLES_SNAPSHOT, A_PATH)
+    if DEMO:
+        _seed_avg_if_missing(avg)
+    return build_snapshot(params, avg, build_assumptions(assumptions), info)
 
-load_params_table()
+with _startup_timer("tables"):
+    install_snapshot(load_data_snapshot())
 
-def load_avg_benefit_table():
-    """
-    Ładuje średnie emerytury z pliku XLSX (api/data/avg_benefit.xlsx):
-    kolumny: 'rok', 'kwota' (w PLN/m-c).
-    """
-    path = DATA_DIR / "avg_benefit.xlsx"
-    if not path.exists():
-        return
+def _env_int(name: str, default: int) -> int:
     try:
-        wb = openpyxl.load_workbook(path, data_only=True)
-        ws = wb.active
-        headers = { (ws.cell(row=1, column=i).value or "").strip().lower(): i
-                    for i in range(1, ws.max_column+1) }
-        c_year = headers.get("rok")
-        c_val  = headers.get("kwota")
-        if not c_year or not c_val:
-            c_year, c_val = 1, 2
-        for r in range(2, ws.max_row+1):
-            y = ws.cell(row=r, column=c_year).value
-            v = ws.cell(row=r, column=c_val).value
-            try:
-                y = int(str(y).split(".")[0])
-                v = float(str(v).replace(" ", "").replace("\xa0","").replace(",", "."))
-                if 1990 <= y <= 2100 and v > 0:
-                    AVG_TABLE[y] = v
-            except Exception:
-                continue
+        return int(os.getenv(name, str(default)))
     except Exception:
-        pass
+        return default
 
-load_avg_benefit_table()
-
-DEMO = os.getenv("DEMO", "0") == "1"
-
-def _seed_avg_if_missing():
-    """Prosty seed średnich dla dema/hackathonu, gdy brak pliku avg_benefit.xlsx."""
-    if not AVG_TABLE:
-        base = 3800.0
-        for y in range(dt.date.today().year, dt.date.today().year + 10):
-            AVG_TABLE[y] = base * (1.03 ** (y - dt.date.today().year))
-
-if DEMO:
-    _seed_avg_if_missing()
+# Wygenerowane PDF-y (bajty + wynik do logu) — klucz: payload + wersja danych + data.
+PDF_CACHE = LRUCache(
+    max_entries=_env_int("PDF_CACHE_MAX_ENTRIES", 256),
+    max_bytes=_env_int("PDF_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+    sizeof=lambda v: len(v[0]) + 1024,
+)
 
 def _fallback_growth() -> float:
     try:
@@ -331,6 +251,15 @@ def wage_growth_rate() -> float:
     except Exception:
         return 0.03
 
+def goal_seek_horizon() -> int:
+    """
+    Ile lat po planowanym przejściu sprawdza goal-seek (ENV GOAL_SEEK_MAX_EXTRA, domyślnie 10).
+    """
+    try:
+        return max(0, int(os.getenv("GOAL_SEEK_MAX_EXTRA", "10")))
+    except Exception:
+        return 10
+
 def statutory_retire_age(sex: str) -> int:
     """Ustawowy wiek emerytalny: 60 lat K, 65 lat M."""
     return 60 if str(sex).upper() == "K" else 65
@@ -357,20 +286,11 @@ def absencja_days(sex: str) -> Optional[float]:
     key = "K" if sex.upper() == "K" else "M"
     return ASSUMPTIONS.get("absencja_chorobowa", {}).get(key, {}).get("dni_rocznie")
 
-def ensure_log_header():
-    if not LOG_CSV.exists():
-        with LOG_CSV.open("w", newline="", encoding="utf-8") as f:
-            csv.writer(f).writerow([
-                "date","time","expected_pension","age","sex","salary",
-                "included_sick_leave","konto","subkonto",
-                "benefit_actual","benefit_real","postal_code"
-            ])
-
 def log_usage(payload: SimInput, result: dict):
-    ensure_log_header()
-    with LOG_CSV.open("a", newline="", encoding="utf-8") as f:
-        w = csv.writer(f); now = dt.datetime.now()
-        w.writerow([
+    """Wrzuca wiersz do kolejki loggera w tle — request nie czeka na zapis na dysk."""
+    with stage("usage_log"):
+        now = dt.datetime.now()
+        USAGE_LOG.submit([
             now.date().isoformat(), now.strftime("%H:%M:%S"),
             payload.expected_pension or "", payload.age, payload.sex.upper(),
             payload.gross_salary, "tak" if payload.include_sick_leave else "nie",
@@ -385,14 +305,6 @@ def compute_replacement_rate(benefit_real: float, current_gross: float) -> Optio
         return round(100.0 * benefit_real / current_gross, 2)
     return None
 
-def fmt_money(v: Optional[float]) -> str:
-    if v is None: return "—"
-    return f"{v:,.2f} zł".replace(",", " ").replace("\xa0", " ")
-
-def fmt_pct(v: Optional[float]) -> str:
-    if v is None: return "—"
-    return f"{v:.2f}%"
-
 def avg_benefit_for_year(year: int, **_ignore) -> Optional[float]:
     if AVG_TABLE:
         if year in AVG_TABLE:
@@ -458,274 +370,6 @@ def buckets_for_year(year: int):
         })
     return {"year": year, "avg_source": "AVG_TABLE/ASSUMPTIONS/DEMO", "buckets": out}
 
-# --- Extra layout knobs (hackathon tuning) ---
-KPI_CARD_H = 64     
-KPI_GAP    = 18     
-COMPARE_H  = 90     
-NEG_GAP    = 80     
-
-# --- PDF helpers (stare; część zostaje, część poniżej nowa wersja) ---
-def draw_header(c: canvas.Canvas, w, h, title: str):
-    c.setFillColor(ZUS_NAVY); c.rect(0, h-72, w, 72, fill=1, stroke=0)
-    c.setFillColor(ZUS_GREEN); c.rect(0, h-72, 8, 72, fill=1, stroke=0)
-    c.setFillColor(colors.white)
-    c.setFont(FONT_BOLD, 22); c.drawString(MARGIN_X, h-42, title)
-    c.setFont(FONT_MAIN, 10); c.drawString(MARGIN_X, h-64, f"Data: {dt.date.today().isoformat()}")
-
-def draw_footer(c: canvas.Canvas, w):
-    c.setFillColor(ZUS_GRAY); c.rect(0, 0, w, 26, fill=1, stroke=0)
-    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 9)
-    c.drawRightString(w-MARGIN_X, 9, f"Emerytura360 • {dt.date.today().isoformat()}")
-
-def section_title(c: canvas.Canvas, text: str, x: float, y: float):
-    c.setFillColor(ZUS_NAVY); c.setFont(FONT_BOLD, 12)
-    c.drawString(x, y, text)
-
-def wrap_text(c: canvas.Canvas, text: str, font: str, size: int, max_width: float) -> List[str]:
-    c.setFont(font, size)
-    words = text.split(" ")
-    lines: List[str] = []
-    cur = ""
-    for w in words:
-        test = (cur + " " + w).strip()
-        if c.stringWidth(test, font, size) <= max_width:
-            cur = test
-        else:
-            if cur:
-                lines.append(cur); cur = w
-            else:
-                while c.stringWidth(w, font, size) > max_width and len(w) > 1:
-                    w = w[:-1]
-                lines.append(w); cur = ""
-    if cur: lines.append(cur)
-    if len(lines) > 2:
-        lines = [lines[0], lines[1] + "…"]
-    return lines
-
-def kpi_card(c: canvas.Canvas, x, y, w, h, label: str, value: str, accent=ZUS_GREEN):
-    corner = 12
-    c.setFillColor(colors.white)
-    c.setStrokeColor(ZUS_GRAY)
-    c.setLineWidth(0.8)
-    c.roundRect(x, y, w, h, corner, fill=1, stroke=1)
-
-    LABEL_FS = 10
-    VALUE_FS = 16
-    TOP_PAD = 16
-    SIDE_PAD = 12
-
-    c.setFillColor(ZUS_NAVY)
-    label_lines = wrap_text(c, label, FONT_MAIN, LABEL_FS, w - 2*SIDE_PAD)
-    c.setFont(FONT_MAIN, LABEL_FS)
-    base_y = y + h - TOP_PAD
-    line_h = LABEL_FS + 2
-    for i, line in enumerate(label_lines):
-        c.drawCentredString(x + w/2, base_y - i*line_h, line)
-
-    c.setFillColor(ZUS_BLACK)
-    c.setFont(FONT_BOLD, VALUE_FS)
-    safe_gap = 12
-    value_y = base_y - len(label_lines)*line_h - safe_gap
-    value_y = max(value_y, y + 10)
-    c.drawCentredString(x + w/2, value_y, value)
-
-def comparison_numbers(c: canvas.Canvas, x, y, w,
-                       my_value: Optional[float],
-                       avg_value: Optional[float]):
-    box_h = 60
-    c.setFillColor(colors.white); c.setStrokeColor(ZUS_GRAY)
-    c.roundRect(x, y, w, box_h, 10, fill=1, stroke=1)
-
-    left_x   = x + w * 0.25
-    center_x = x + w * 0.50
-    right_x  = x + w * 0.75
-    mid_y    = y + box_h / 2.0
-
-    LABEL_FS = 9
-    VALUE_FS_LEFT  = 14
-    VALUE_FS_RIGHT = 14
-    LABEL_OFFSET = 10  
-    VALUE_OFFSET = 12 
-
-    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, LABEL_FS)
-    c.drawCentredString(left_x,  mid_y + LABEL_OFFSET, "Twoja (nominalna, m-c)")
-    c.setFillColor(ZUS_BLACK); c.setFont(FONT_BOLD, VALUE_FS_LEFT)
-    c.drawCentredString(left_x,  mid_y - VALUE_OFFSET, fmt_money(my_value))
-
-    if not avg_value or avg_value <= 0: avg_value = 0.0
-    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, LABEL_FS)
-    c.drawCentredString(right_x, mid_y + LABEL_OFFSET, "Średnia")
-    c.setFillColor(ZUS_BLACK); c.setFont(FONT_BOLD, VALUE_FS_RIGHT)
-    c.drawCentredString(right_x, mid_y - VALUE_OFFSET, fmt_money(avg_value))
-
-    diff_pct = None
-    if avg_value > 0 and my_value is not None:
-        diff_pct = (my_value - avg_value) / avg_value * 100.0
-    badge_text = "—"; badge_color = ZUS_ORANGE
-    if diff_pct is not None:
-        badge_text = f"{diff_pct:+.2f}%"
-        if diff_pct >= 5: badge_color = ZUS_GREEN
-        elif diff_pct <= -5: badge_color = ZUS_RED
-
-    pill_w, pill_h = 50, 16
-    pill_x = center_x - pill_w/2
-    pill_y = mid_y - pill_h/2 - 20  
-    c.setFillColor(badge_color); c.setStrokeColor(colors.white); c.setLineWidth(1.2)
-    c.roundRect(pill_x, pill_y, pill_w, pill_h, 7, fill=1, stroke=1)
-    c.setFillColor(colors.white); c.setFont(FONT_BOLD, 10)
-    c.drawCentredString(center_x, pill_y + pill_h/2 - 3, badge_text)
-
-def fmt_money_pl_short(v: float) -> str:
-    if v >= 2_000_000:
-        s = f"{v/1_000_000:.1f}".replace(".", ",")
-        return f"{s} mln zł"
-    if v >= 20_000:
-        s = str(int(round(v/1000)))  
-        return f"{s} tys. zł"
-    s = f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", " ")
-    return f"{s} zł"
-
-
-def draw_simple_bar_chart(c: canvas.Canvas, x, y, w, h, labels, values, colors_fill=None):
-    n = len(values)
-    if n == 0:
-        return
-    max_v = max(values) if max(values) > 0 else 1.0
-
-    c.setFillColor(colors.white)
-    c.setStrokeColor(ZUS_GRAY)
-    c.roundRect(x, y, w, h, 10, fill=1, stroke=1)
-
-    pad_x = 24
-    pad_top = 32
-    pad_bottom = 34
-    chart_x = x + pad_x
-    chart_w = w - 2*pad_x
-    chart_y = y + pad_bottom
-    chart_h = h - pad_top - pad_bottom
-
-    c.setStrokeColor(ZUS_GRAY)
-    c.setLineWidth(0.6)
-    c.line(chart_x, chart_y, chart_x + chart_w, chart_y)
-
-    gap = chart_w * 0.12 / max(1, n)
-    bar_w = (chart_w - gap * (n + 1)) / n
-
-    for i, v in enumerate(values):
-        bh = 0 if max_v <= 0 else (v / max_v) * chart_h
-        bx = chart_x + gap + i * (bar_w + gap)
-        by = chart_y
-
-        if colors_fill and i < len(colors_fill):
-            c.setFillColor(colors_fill[i])
-        else:
-            c.setFillColor(ZUS_BLUE if i == 0 else ZUS_GREEN)
-
-        c.rect(bx, by, bar_w, bh, fill=1, stroke=0)
-
-        # --- Etykieta wartości (PL, skróty) ---
-        label = fmt_money_pl_short(v)
-
-        value_fs = 8
-        max_label_width = bar_w + gap * 0.5
-        while c.stringWidth(label, FONT_BOLD, value_fs) > max_label_width and value_fs > 6:
-            value_fs -= 1
-
-        val_y = min(by + bh + 12, y + h - 10)
-
-        c.setFillColor(ZUS_BLACK)
-        c.setFont(FONT_BOLD, value_fs)
-        c.drawCentredString(bx + bar_w/2, val_y, label)
-
-        c.setFillColor(ZUS_NAVY)
-        c.setFont(FONT_MAIN, 9)
-        c.drawCentredString(bx + bar_w/2, y + 6, labels[i])
-
-def bullet_line(c: canvas.Canvas, x, y, text, color=ZUS_GREEN):
-    c.setFillColor(color); c.circle(x, y+3, 2.6, fill=1, stroke=0)
-    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 10)
-    c.drawString(x+10, y, text)
-
-# ======== HELPERY do layoutu „annual report” (prawa szpalta + donuty) ========
-
-def draw_right_panel_bg(c: canvas.Canvas, w, h):
-    """Prawa połowa w kolorze ZUS_NAVY."""
-    right_x = int(w * 0.5)
-    c.setFillColor(ZUS_NAVY)
-    c.rect(right_x, 0, w-right_x, h, fill=1, stroke=0)
-    c.setFillColor(ZUS_GREEN)
-    c.rect(right_x, h-2, w-right_x, 2, fill=1, stroke=0)
-
-def donut(c: canvas.Canvas, cx, cy, r_outer, r_inner, segments, labels=None,
-          legend_x=None, legend_y=None, legend_leading=12):
-    """
-    segments = [(fraction_0to1, color, optional_label)]
-    """
-    total = sum(s[0] for s in segments) or 1.0
-    angle0 = 90.0
-    for frac, color_, *_ in segments:
-        sweep = 360.0 * (frac/total)
-        c.setFillColor(color_); c.setStrokeColor(color_)
-        c.wedge(cx-r_outer, cy-r_outer, cx+r_outer, cy+r_outer, angle0, angle0+sweep, stroke=0, fill=1)
-        angle0 += sweep
-    c.setFillColor(colors.white)
-    c.circle(cx, cy, r_inner, fill=1, stroke=0)
-
-    if legend_x is not None and labels:
-        c.setFont(FONT_MAIN, 8)
-        for i, ((frac, color_, *_), lab) in enumerate(zip(segments, labels)):
-            c.setFillColor(color_)
-            c.circle(legend_x, legend_y - i*legend_leading + 3, 3, fill=1, stroke=0)
-            c.setFillColor(colors.white)
-            c.drawString(legend_x + 10, legend_y - i*legend_leading, lab)
-
-def rr_gauge(c: canvas.Canvas, cx: float, cy: float, r_outer: float, r_inner: float,
-             rr_frac: float, title: str = "Stopa zastąpienia"):
-    """
-    Prosty „gauge” w formie pierścienia dla RR.
-    rr_frac: 0.0–1.0 (np. 0.1561 dla 15.61%)
-    """
-    rr = max(0.0, min(1.0, rr_frac))
-
-    c.setFillColor(ZUS_ORANGE)
-    c.wedge(cx - r_outer, cy - r_outer, cx + r_outer, cy + r_outer,
-            90, 90 + 360 * rr, stroke=0, fill=1)
-    c.setFillColor(ZUS_GRAY)
-    c.wedge(cx - r_outer, cy - r_outer, cx + r_outer, cy + r_outer,
-            90 + 360 * rr, 450, stroke=0, fill=1)
-
-    c.setFillColor(colors.white)
-    c.circle(cx, cy, r_inner, fill=1, stroke=0)
-
-    c.setFillColor(colors.white); c.setFont(FONT_BOLD, 18)
-    c.drawString(cx - r_outer, cy + r_outer + 22, title)
-
-    c.setFillColor(colors.white); c.setFont(FONT_BOLD, 20)
-    c.drawCentredString(cx, cy + 2, f"{rr*100:.2f}%")
-
-
-def section_heading(c: canvas.Canvas, text: str, x: float, y: float, light=False):
-    c.setFont(FONT_BOLD, 18)
-    c.setFillColor(colors.white if light else ZUS_NAVY)
-    c.drawString(x, y, text)
-
-def stat_bar(c: canvas.Canvas, x, y, w, pct, label, bar_color):
-    """Pasek postępu w stylu prostych statystyk."""
-    h = 14
-    c.setFillColor(ZUS_GRAY); c.rect(x, y, w, h, fill=1, stroke=0)
-    c.setFillColor(bar_color); c.rect(x, y, w*max(0.0, min(1.0, pct)), h, fill=1, stroke=0)
-    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 9)
-    c.drawString(x, y-16, label)
-    c.setFont(FONT_BOLD, 10); c.drawRightString(x+w, y-12, f"{int(max(0,min(100, pct*100)))}%")
-
-def kpi_circle(c: canvas.Canvas, cx, cy, r, title, value, sub=None):
-    c.setFillColor(colors.white); c.circle(cx, cy, r, fill=1, stroke=0)
-    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 9)
-    c.drawCentredString(cx, cy+r+10, title)
-    c.setFont(FONT_BOLD, 16); c.drawCentredString(cx, cy+2, value)
-    if sub:
-        c.setFont(FONT_MAIN, 8); c.setFillColor(ZUS_GRAY); c.drawCentredString(cx, cy-12, sub)
-
 # --- API Endpoints ---
 @app.get("/assumptions")
 def get_assumptions():
@@ -743,13 +387,11 @@ def get_assumptions():
         }
     }
 
-@app.post("/simulate")
-def simulate(payload: SimInput):
-    today = dt.date.today()
-    current_year = today.year
-    retire_year = payload.retire_year or (today.year + max(0, statutory_retire_age(payload.sex) - payload.age))
+def _resolve_retire_year(payload: SimInput, today: dt.date) -> int:
+    return payload.retire_year or (today.year + max(0, statutory_retire_age(payload.sex) - payload.age))
 
-    if payload.start_year >= (payload.retire_year or retire_year):
+def _validate_input(payload: SimInput, retire_year: int):
+    if payload.start_year >= retire_year:
         raise HTTPException(status_code=400, detail="start_year musi być < retire_year")
 
     if payload.custom_wage_timeline:
@@ -757,90 +399,41 @@ def simulate(payload: SimInput):
         if bad:
             raise HTTPException(status_code=400, detail=f"custom_wage_timeline zawiera niepoprawne wartości dla lat: {bad}")
 
-    # === 1) ŚCIEŻKA PŁAC ===
-    def _closest_year(d: Dict[int, dict], target: int) -> Optional[int]:
-        if not d:
-            return None
-        le = [k for k in d.keys() if k <= target]
-        if le:
-            return max(le)
-        return min(d.keys())
-
-    wages: Dict[int, float] = {}
-    used_params_path = False
-
-    if not payload.custom_wage_timeline and PARAMS:
-        ref_y = _closest_year(PARAMS, current_year)
-        have_all = ref_y and all(PARAMS.get(y, {}).get("avg_wage") for y in range(payload.start_year, retire_year))
-        if have_all:
-            used_params_path = True
-            ref_avg = PARAMS[ref_y]["avg_wage"]
-            wages = {y: float(payload.gross_salary) * (PARAMS[y]["avg_wage"] / ref_avg)
-                     for y in range(payload.start_year, retire_year)}
-
-    if not wages:
-        auto_backcast = os.getenv("AUTO_BACKCAST", "1") == "1"
-        wg_fallback = wage_growth_rate()
-        if not payload.custom_wage_timeline and auto_backcast and payload.start_year < retire_year:
-            for y in range(payload.start_year, retire_year):
-                years_diff = max(0, current_year - y)
-                wages[y] = float(payload.gross_salary) / ((1.0 + wg_fallback) ** years_diff)
-        else:
-            wages = payload.custom_wage_timeline or {y: payload.gross_salary for y in range(payload.start_year, retire_year)}
-
-    # 1.1. L4 per rok
-    def l4_factor_for_year(y: int) -> float:
-        if payload.custom_sick_days and y in payload.custom_sick_days:
-            return efekt_absencji_factor(payload.custom_sick_days[y])
-        return efekt_absencji_factor(absencja_days(payload.sex)) if payload.include_sick_leave else 1.0
-
-    # 1.2. Limit 250% przeciętnego wynagrodzenia
-    def _cap_base_monthly(y: int, base: float) -> float:
-        avg = PARAMS.get(y, {}).get("avg_wage")
-        if avg:
-            return min(base, 2.5 * avg)
-        return base
-
-    # 1.3. Limit 30× prognozowanej średniej 
-    def annual_base_with_30x_cap(y: int, monthly_base_after_cap: float) -> float:
-        avg = PARAMS.get(y, {}).get("avg_wage")  
-        annual_base = 12.0 * float(monthly_base_after_cap)
-        if avg:
-            annual_cap = 30.0 * float(avg)  
-            return min(annual_base, annual_cap)
-        return annual_base
-
-    # === 2) Składki roczne po L4 + limitach (250% m-c + 30× rocznie) ===
-    skladki_po_latach: Dict[int, float] = {}
-    for rok, wyn in wages.items():
-        monthly_base = _cap_base_monthly(rok, wyn)            
-        annual_base = annual_base_with_30x_cap(rok, monthly_base) 
-        skladki_po_latach[rok] = annual_base * 0.1952 * l4_factor_for_year(rok)
-
-    # === 3) Waloryzacje i podstawa ===
-    rocznie = waloryzuj_rocznie(skladki_po_latach)
-    if isinstance(rocznie, dict):
-        rocznie_dict = rocznie
-    else:
-        rocznie_dict = dict(skladki_po_latach)
-
-    po_kwartale = waloryzuj_kwartalnie_po_31_stycznia(retire_year, payload.quarter_award, rocznie)
-
+def _balances(payload: SimInput) -> tuple[float, float]:
     konto = (payload.zus_balance.konto if payload.zus_balance else 0.0) or 0.0
     subkonto = (payload.zus_balance.subkonto if payload.zus_balance else 0.0) or 0.0
-    podstawa = po_kwartale + konto + subkonto
+    return konto, subkonto
+
+def _cpi_for(today: dt.date) -> float:
+    return cpi_rate(current_snapshot().params, today.year, float(os.getenv("CPI", "0.03")))
+
+def _projection(payload: SimInput, retire_year: int, today: dt.date, extend_to: Optional[int] = None) -> Projection:
+    """Wspólna projekcja (płace, limity, L4, składki, waloryzacja roczna) dla wszystkich endpointów."""
+    return build_projection(
+        payload, retire_year, current_snapshot().params, today.year, wage_growth_rate(),
+        absencja_dni=absencja_days(payload.sex),
+        auto_backcast=os.getenv("AUTO_BACKCAST", "1") == "1",
+        extend_to=extend_to,
+    )
 
-    # === 4) Annuitetyzacja i urealnienie ===
-    months = expected_life_months(payload.sex, retire_year)
-    benefit_nominal = annuitetyzuj(podstawa, months)
+def _goal_seek_enabled(payload: SimInput) -> bool:
+    return bool(payload.expected_pension and payload.expected_pension > 0)
 
-    if PARAMS.get(today.year, {}).get("cpi_index"):
-        cpi = max(0.0, (PARAMS[today.year]["cpi_index"] - 1.0))
-    else:
-        cpi = float(os.getenv("CPI", "0.03"))
+def _retirement_metrics(payload: SimInput, retire_year: int, capital: float, capital_no_l4: float,
+                        today: dt.date, cpi: float) -> tuple[dict, float]:
+    """
+    Wynik dla jednego roku przejścia z gotowego kapitału (po waloryzacji rocznej):
+    świadczenie, stopy zastąpienia, wpływ L4, średnia, założenia. Zwraca (sekcje wyniku, benefit_real bez zaokrągleń).
+    """
+    current_year = today.year
+    konto, subkonto = _balances(payload)
 
+    # === 3-4) Waloryzacja kwartalna, podstawa, annuitetyzacja i urealnienie ===
+    months = expected_life_months(payload.sex, retire_year)
+    _, benefit_nominal, benefit_real = benefit_from_capital(
+        capital, retire_year, payload.quarter_award, konto, subkonto, months, cpi, today.year
+    )
     years_to_retire = max(0, retire_year - today.year)
-    benefit_real = urealnij(benefit_nominal, cpi, years_to_retire)
 
     # === 5) Zindeksowane wynagrodzenie do roku przejścia ===
     if PARAMS.get(current_year, {}).get("avg_wage") and PARAMS.get(retire_year, {}).get("avg_wage"):
@@ -870,38 +463,11 @@ def simulate(payload: SimInput):
     replacement = compute_replacement_rate(benefit_real, payload.gross_salary)
 
     # === 7) Referencja: ile byłoby BEZ L4 ===
-    def _wages_for_range(end_year: int) -> Dict[int, float]:
-        if PARAMS and all(PARAMS.get(y, {}).get("avg_wage") for y in range(payload.start_year, end_year)):
-            ref_y = _closest_year(PARAMS, current_year) or current_year
-            ref_avg = PARAMS[ref_y]["avg_wage"] if PARAMS.get(ref_y, {}) else PARAMS[payload.start_year]["avg_wage"]
-            return {y: float(payload.gross_salary) * (PARAMS[y]["avg_wage"] / ref_avg)
-                    for y in range(payload.start_year, end_year)}
-        wg_tmp = wage_growth_rate()
-        w: Dict[int, float] = {}
-        for y in range(payload.start_year, end_year):
-            years_diff = max(0, current_year - y)
-            w[y] = float(payload.gross_salary) / ((1.0 + wg_tmp) ** years_diff)
-        return w
-
-    def real_benefit_with_l4_factor(retire_y: int, l4_fact: float) -> float:
-        wages_local = payload.custom_wage_timeline or _wages_for_range(retire_y)
-        skladki_local = {}
-        for rok, wyn in wages_local.items():
-            monthly_base = _cap_base_monthly(rok, wyn)
-            annual_base = annual_base_with_30x_cap(rok, monthly_base)
-            skladki_local[rok] = annual_base * 0.1952 * l4_fact
-
-        rocznie_local = waloryzuj_rocznie(skladki_local)
-        po_kw_local = waloryzuj_kwartalnie_po_31_stycznia(retire_y, payload.quarter_award, rocznie_local)
-        konto_local = (payload.zus_balance.konto if payload.zus_balance else 0.0) or 0.0
-        subkonto_local = (payload.zus_balance.subkonto if payload.zus_balance else 0.0) or 0.0
-        podstawa_local = po_kw_local + konto_local + subkonto_local
-        months_local = expected_life_months(payload.sex, retire_y)
-        nominal_local = annuitetyzuj(podstawa_local, months_local)
-        return urealnij(nominal_local, cpi, max(0, retire_y - today.year))
-
     real_with_L4 = float(benefit_real)
-    real_no_L4   = float(real_benefit_with_l4_factor(retire_year, 1.0))
+    with stage("no_l4_reference"):
+        real_no_L4 = float(benefit_from_capital(
+            capital_no_l4, retire_year, payload.quarter_award, konto, subkonto, months, cpi, today.year
+        )[2])
     delta_abs = round(real_no_L4 - real_with_L4, 2)
     delta_pct = round(100.0 * delta_abs / real_no_L4, 2) if real_no_L4 else None
 
@@ -912,203 +478,195 @@ def simulate(payload: SimInput):
         "loss_pct": delta_pct
     }
 
-    # === 8) Goal-seek vs expected_pension ===
-    goal_seek = {
-        "enabled": False,
-        "expected": payload.expected_pension,
-        "extra_years_needed": None,
-        "target_gap": None,
-        "checked_until_year": retire_year
-    }
-    if payload.expected_pension and payload.expected_pension > 0:
-        goal_seek["enabled"] = True
-        goal_seek["target_gap"] = round(float(payload.expected_pension - benefit_real), 2)
-
-        MAX_EXTRA = 10
-        found = None
-        test_year = retire_year
-        for add in range(0, MAX_EXTRA + 1):
-            y = retire_year + add
-            real_y = real_benefit_with_l4_factor(y, l4_factor_for_year(y))
-            if real_y >= payload.expected_pension:
-                found = add
-                test_year = y
-                break
-            test_year = y
-
-        goal_seek["extra_years_needed"] = found
-        goal_seek["checked_until_year"] = test_year
-
-    years_span = list(range(payload.start_year, retire_year))
-    if years_span:
-        report_l4_factor = sum(l4_factor_for_year(y) for y in years_span) / len(years_span)
-    else:
-        report_l4_factor = l4_factor_for_year(retire_year)
-
-    # === 9) Wynik ===
-    result = {
+    metrics = {
         "benefit": {"actual": round(float(benefit_nominal), 2), "real": round(float(benefit_real), 2)},
         "retire_year": retire_year,
         "avg_benefit_year": avg_benefit,
         "replacement_rate_percent": replacement,
         "indexed_wage_at_retirement": round(float(indexed_wage_at_retirement), 2),
         "replacement_rate_indexed_percent": replacement_rate_indexed,
-        "effect_sick_leave": {"factor": round(float(report_l4_factor), 4)},
         "sick_leave_impact": sick_leave_impact,
-        "scenarios": ASSUMPTIONS.get("opoznienie_dodatkowy_wzrost_proc", {}),
         "assumptions_used": {
             "cpi": cpi,
             "life_months": months,
             "wage_growth": wg_effective,
             "wage_growth_source": "mentor_avg_wage" if wg_used is None else "env_fallback"
         },
-        "goal_seek": goal_seek,
-        "data_sources": {"mentor_params": used_params_path, "avg_benefits_file": bool(AVG_TABLE)}
     }
+    return metrics, benefit_real
 
-    log_usage(payload, result)
-    return result
-
-@app.post("/simulate/timeline")
-def simulate_timeline(payload: SimInput, format: Optional[str] = Query(None)):
+def _simulate_core(payload: SimInput, proj: Optional[Projection] = None, today: Optional[dt.date] = None) -> dict:
     """
-    Zwraca roczny timeline dla dashboardu:
-    - year
-    - base_after_indexation (po waloryzacji kwartalnej w danym roku)
-    - benefit_if_retire_in_year: {nominal, real}
+    Pełna symulacja bez logowania użycia (do wywołań wewnętrznych).
+    `proj` pozwala podać gotową projekcję (np. z /simulate/bundle) — powinna obejmować horyzont goal-seek.
     """
-    _fmt = format if isinstance(format, (str, type(None))) else None
-    today = dt.date.today()
-    current_year = today.year
-    start_y = payload.start_year
-    default_retire_year = today.year + max(0, statutory_retire_age(payload.sex) - payload.age)
-    end_y = payload.retire_year or default_retire_year
-    retire_year = payload.retire_year or default_retire_year
-
-    if payload.start_year >= (payload.retire_year or retire_year):
-        raise HTTPException(status_code=400, detail="start_year musi być < retire_year")
+    today = today or dt.date.today()
+    if proj is None:
+        max_extra = goal_seek_horizon()
+        retire_year = _resolve_retire_year(payload, today)
+        _validate_input(payload, retire_year)
+        # === 1-2) Ścieżka płac, limity (250% m-c + 30× rocznie), L4, składki, waloryzacja roczna ===
+        # Jedna projekcja, wydłużona o horyzont goal-seek (kolejne lata przejścia = przyrostowe składki).
+        extend_to = retire_year + max_extra if _goal_seek_enabled(payload) else None
+        proj = _projection(payload, retire_year, today, extend_to=extend_to)
+    planned_l4 = proj.l4[:proj.n_planned]
+    if planned_l4:
+        report_l4_factor = sum(planned_l4) / len(planned_l4)
+    else:
+        report_l4_factor = l4_factor_for_year(payload, proj.retire_year, absencja_days(payload.sex))
 
-    if payload.custom_wage_timeline:
-        bad = [y for y, v in payload.custom_wage_timeline.items() if v is None or v <= 0]
-        if bad:
-            raise HTTPException(status_code=400, detail=f"custom_wage_timeline zawiera niepoprawne wartości dla lat: {bad}")
+    with stage("no_l4_reference"):
+        capital_no_l4 = proj.capital(1.0)
+    return _assemble_result(
+        payload, proj.retire_year, proj.capital(), capital_no_l4, report_l4_factor,
+        proj.used_params_path, running_capital(proj), today
+    )
 
-    def _closest_year(d: Dict[int, dict], target: int) -> Optional[int]:
-        if not d:
-            return None
-        le = [k for k in d.keys() if k <= target]
-        if le:
-            return max(le)
-        return min(d.keys())
-
-    wages: Dict[int, float] = {}
-    if not payload.custom_wage_timeline and PARAMS:
-        ref_y = _closest_year(PARAMS, current_year)
-        have_all = ref_y and all(PARAMS.get(y, {}).get("avg_wage") for y in range(start_y, end_y))
-        if have_all:
-            ref_avg = PARAMS[ref_y]["avg_wage"]
-            wages = {y: float(payload.gross_salary) * (PARAMS[y]["avg_wage"] / ref_avg)
-                     for y in range(start_y, end_y)}
-
-    if not wages:
-        auto_backcast = os.getenv("AUTO_BACKCAST", "1") == "1"
-        wg = wage_growth_rate()
-        if not payload.custom_wage_timeline and auto_backcast and start_y < end_y:
-            for y in range(start_y, end_y):
-                years_diff = max(0, current_year - y)
-                wages[y] = float(payload.gross_salary) / ((1.0 + wg) ** years_diff)
-        else:
-            wages = payload.custom_wage_timeline or {y: payload.gross_salary for y in range(start_y, end_y)}
-
-    def l4_factor_for_year(y: int) -> float:
-        if payload.custom_sick_days and y in payload.custom_sick_days:
-            return efekt_absencji_factor(payload.custom_sick_days[y])
-        return efekt_absencji_factor(absencja_days(payload.sex)) if payload.include_sick_leave else 1.0
-
-    def _cap_base_monthly(y: int, base: float) -> float:
-        avg = PARAMS.get(y, {}).get("avg_wage")
-        if avg:
-            return min(base, 2.5 * avg)
-        return base
-
-    def annual_base_with_30x_cap(y: int, monthly_base_after_cap: float) -> float:
-        avg = PARAMS.get(y, {}).get("avg_wage")
-        annual_base = 12.0 * float(monthly_base_after_cap)
-        if avg:
-            annual_cap = 30.0 * float(avg)
-            return min(annual_base, annual_cap)
-        return annual_base
-
-    if PARAMS.get(today.year, {}).get("cpi_index"):
-        cpi = max(0.0, (PARAMS[today.year]["cpi_index"] - 1.0))
-    else:
-        cpi = float(os.getenv("CPI", "0.03"))
+# Wyniki /simulate (LRU + TTL) — klucz: payload bez pól tylko do logu + wersja danych + data.
+SIM_CACHE = LRUCache(
+    max_entries=_env_int("SIM_CACHE_MAX_ENTRIES", 2048),
+    max_bytes=_env_int("SIM_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+    ttl=_env_int("SIM_CACHE_TTL_S", 3600),
+    sizeof=lambda v: len(json.dumps(v)),
+)
 
-    out: List[Dict] = []
-    base_running = 0.0  
+def _simulate_cached(payload: SimInput, today: Optional[dt.date] = None) -> dict:
+    """
+    _simulate_core z cache wyników (bez logowania — logowanie zostaje w endpointach, więc trafienie
+    w cache też jest logowane). Zwraca kopię, żeby wywołujący nie zmienił wpisu w cache.
+    """
+    today = today or dt.date.today()
+    key = cache_key("simulate", payload.model_dump(mode="json", exclude={"postal_code"}), current_snapshot().version, today)
+    result = None if profiling_active() else SIM_CACHE.get(key)
+    if result is None:
+        result = _simulate_core(payload, today=today)
+        SIM_CACHE.put(key, result)
+    return copy.deepcopy(result)
+
+def _assemble_result(payload: SimInput, retire_year: int, capital: float, capital_no_l4: float,
+                     report_l4_factor: float, used_params_path: bool,
+                     running: Iterable[tuple[int, float]], today: dt.date) -> dict:
+    """
+    Składa wynik /simulate z gotowego kapitału (po waloryzacji rocznej).
+    `running` to kapitał narastająco (rok składki, kapitał) — co najmniej do końca horyzontu goal-seek.
+    """
+    max_extra = goal_seek_horizon()
+    cpi = _cpi_for(today)
+    konto, subkonto = _balances(payload)
 
-    for y in range(start_y, end_y):
-        wage_y = wages.get(y, payload.gross_salary)
-        monthly_base = _cap_base_monthly(y, wage_y)
-        annual_base = annual_base_with_30x_cap(y, monthly_base)
-        contr_y = annual_base * 0.1952 * l4_factor_for_year(y)
+    # === 3-7) Świadczenie, stopy zastąpienia, referencja bez L4 ===
+    metrics, benefit_real = _retirement_metrics(payload, retire_year, capital, capital_no_l4, today, cpi)
 
-        rocznie = waloryzuj_rocznie({y: contr_y})
-        if isinstance(rocznie, dict):
-            add_indexed = float(sum(rocznie.values()))
-        else:
-            add_indexed = float(rocznie)
+    # === 8) Goal-seek vs expected_pension ===
+    goal_seek = {
+        "enabled": False,
+        "expected": payload.expected_pension,
+        "extra_years_needed": None,
+        "target_gap": None,
+        "checked_until_year": retire_year,
+        "max_extra_years": max_extra
+    }
+    if _goal_seek_enabled(payload):
+        goal_seek["enabled"] = True
+        goal_seek["target_gap"] = round(float(payload.expected_pension - benefit_real), 2)
 
-        base_running += add_indexed
+        def _real_for(capital_y: float, retire_y: int) -> float:
+            months_y = expected_life_months(payload.sex, retire_y)
+            return benefit_from_capital(
+                capital_y, retire_y, payload.quarter_award, konto, subkonto, months_y, cpi, today.year
+            )[2]
 
-        base_after_q = waloryzuj_kwartalnie_po_31_stycznia(y, payload.quarter_award, base_running)
+        with stage("goal_seek"):
+            found_year, test_year = first_retire_year_meeting(
+                running, retire_year, retire_year + max_extra, float(payload.expected_pension), _real_for
+            )
+        goal_seek["extra_years_needed"] = None if found_year is None else found_year - retire_year
+        goal_seek["checked_until_year"] = test_year
 
-        konto = (payload.zus_balance.konto if payload.zus_balance else 0.0) or 0.0
-        subkonto = (payload.zus_balance.subkonto if payload.zus_balance else 0.0) or 0.0
-        podstawa_y = base_after_q + konto + subkonto
+    # === 9) Wynik ===
+    return {
+        "benefit": metrics["benefit"],
+        "retire_year": retire_year,
+        "avg_benefit_year": metrics["avg_benefit_year"],
+        "replacement_rate_percent": metrics["replacement_rate_percent"],
+        "indexed_wage_at_retirement": metrics["indexed_wage_at_retirement"],
+        "replacement_rate_indexed_percent": metrics["replacement_rate_indexed_percent"],
+        "effect_sick_leave": {"factor": round(float(report_l4_factor), 4)},
+        "sick_leave_impact": metrics["sick_leave_impact"],
+        "scenarios": ASSUMPTIONS.get("opoznienie_dodatkowy_wzrost_proc", {}),
+        "assumptions_used": metrics["assumptions_used"],
+        "goal_seek": goal_seek,
+        "data_sources": {"mentor_params": used_params_path, "avg_benefits_file": bool(AVG_TABLE)}
+    }
 
-        months = expected_life_months(payload.sex, y)
-        nominal = annuitetyzuj(podstawa_y, months)
-        real = urealnij(nominal, cpi, max(0, y - dt.date.today().year))
+def _timeline_curve(payload: SimInput, proj: Projection, today: dt.date, until: Optional[int] = None) -> CapitalCurve:
+    """Serie kolumnowe dla lat przejścia do `until` (domyślnie planowany rok) — jeden przebieg po projekcji."""
+    konto, subkonto = _balances(payload)
+    return capital_curve(
+        proj, payload.quarter_award, konto, subkonto,
+        lambda y: expected_life_months(payload.sex, y), _cpi_for(today), today.year, until=until
+    )
 
-        out.append({
+def _iter_timeline_rows(payload: SimInput, proj: Projection, today: dt.date, until: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Wiersze timeline (rok przejścia -> podstawa i świadczenie) z gotowej projekcji, liczone leniwie.
+    Ostatni wiersz dla planowanego roku to dokładnie świadczenie z /simulate.
+    """
+    konto, subkonto = _balances(payload)
+    rows = iter_capital_curve(
+        proj, payload.quarter_award, konto, subkonto,
+        lambda y: expected_life_months(payload.sex, y), _cpi_for(today), today.year, until=until
+    )
+    for y, _contr, _cap, podstawa_y, nominal, real in rows:
+        yield {
             "year": y,
             "base_after_indexation": round(float(podstawa_y), 2),
             "benefit_if_retire_in_year": {
                 "nominal": round(float(nominal), 2),
                 "real": round(float(real), 2),
             }
-        })
+        }
 
-    if (_fmt or "").lower() == "csv":
-        import csv as _csv, io as _io
-        buf = _io.StringIO()
-        w = _csv.writer(buf)
-        w.writerow(["year", "base_after_indexation", "benefit_nominal", "benefit_real"])
-        for row in out:
-            w.writerow([
-                row["year"],
-                row["base_after_indexation"],
-                row["benefit_if_retire_in_year"]["nominal"],
-                row["benefit_if_retire_in_year"]["real"]
-            ])
-        return Response(content=buf.getvalue(), media_type="text/csv")
-    return {"timeline": out}
+def _timeline_rows(payload: SimInput, proj: Projection, today: dt.date, until: Optional[int] = None) -> List[Dict]:
+    return list(_iter_timeline_rows(payload, proj, today, until))
+
+TIMELINE_CSV_HEADER = ("year", "base_after_indexation", "benefit_nominal", "benefit_real")
+
+def _timeline_csv_cells(row: Dict) -> tuple:
+    benefit = row["benefit_if_retire_in_year"]
+    return row["year"], row["base_after_indexation"], benefit["nominal"], benefit["real"]
+
+def _timeline_columns(curve: CapitalCurve) -> Dict[str, list]:
+    return {
+        "year": curve.retire_year,
+        "contribution": [round(v, 2) for v in curve.contribution],
+        "capital": [round(v, 2) for v in curve.capital],
+        "base_after_indexation": [round(v, 2) for v in curve.podstawa],
+        "benefit_nominal": [round(v, 2) for v in curve.nominal],
+        "benefit_real": [round(v, 2) for v in curve.real],
+    }
+
+def _validate_delays(payload: SimInput, retire_year: int, delays: List[int]):
+    if delays and retire_year + min(delays) <= payload.start_year:
+        raise HTTPException(status_code=400, detail="start_year musi być < retire_year (również po opóźnieniu)")
+
+def _what_if_result(payload: SimInput, proj: Projection, delays: List[int], today: dt.date) -> dict:
+    """Scenariusze opóźnienia z jednej projekcji (musi obejmować lata do retire_year + max(delays))."""
+    retire_year = proj.retire_year
+    targets = sorted({retire_year} | {retire_year + d for d in delays})
+    cpi = _cpi_for(today)
+    capital = dict(running_capital(proj))
+    capital_no_l4 = dict(running_capital(proj, l4_override=1.0))
+
+    metrics = {
+        y: _retirement_metrics(payload, y, capital[y - 1], capital_no_l4[y - 1], today, cpi)[0]
+        for y in targets
+    }
+    base = metrics[retire_year]
 
-@app.post("/simulate/what-if")
-def simulate_what_if(
-    payload: SimInput,
-    delays: List[int] = Query([0, 1, 2, 5], description="Lata opóźnienia vs retire_year")
-):
-    """
-    Zwraca zestaw scenariuszy dla różnych opóźnień przejścia (0,1,2,5 lat).
-    Bazuje na /simulate – więc używa arkusza mentorów, limitu 250% itd.
-    """
-    base = simulate(payload)
     out = []
     for d in delays:
-        p2 = payload.model_copy(update={"retire_year": (payload.retire_year or base["retire_year"]) + d})
-        sim_d = simulate(p2)
+        sim_d = metrics[retire_year + d]
         out.append({
             "delay_years": d,
             "retire_year": sim_d["retire_year"],
@@ -1136,73 +694,25 @@ def simulate_what_if(
         "scenarios": out
     }
 
-@app.post("/simulate/explain")
-def simulate_explain(payload: SimInput):
-    """
-    Zwraca breakdown: składki roczne (po L4 i limicie), suma po waloryzacji rocznej,
-    baza po waloryzacji kwartalnej, annuitetyzację i urealnienie.
-    """
-    today = dt.date.today()
-    current_year = today.year
-    retire_year = payload.retire_year or (today.year + max(0, statutory_retire_age(payload.sex) - payload.age))
-
-    def _closest_year(d: Dict[int, dict], target: int) -> Optional[int]:
-        if not d: return None
-        le = [k for k in d.keys() if k <= target]
-        return max(le) if le else min(d.keys())
-
-    wages: Dict[int, float] = {}
-    ref_y = _closest_year(PARAMS, current_year) if PARAMS else None
-    if not payload.custom_wage_timeline and PARAMS and ref_y and all(PARAMS.get(y,{}).get("avg_wage") for y in range(payload.start_year, retire_year)):
-        ref_avg = PARAMS[ref_y]["avg_wage"]
-        wages = {y: float(payload.gross_salary) * (PARAMS[y]["avg_wage"] / ref_avg)
-                 for y in range(payload.start_year, retire_year)}
-    else:
-        auto_backcast = os.getenv("AUTO_BACKCAST", "1") == "1"
-        wg = wage_growth_rate()
-        if not payload.custom_wage_timeline and auto_backcast and payload.start_year < retire_year:
-            for y in range(payload.start_year, retire_year):
-                years_diff = max(0, current_year - y)
-                wages[y] = float(payload.gross_salary) / ((1.0 + wg) ** years_diff)
-        else:
-            wages = payload.custom_wage_timeline or {y: payload.gross_salary for y in range(payload.start_year, retire_year)}
-
-    def l4_factor_for_year(y: int) -> float:
-        if payload.custom_sick_days and y in payload.custom_sick_days:
-            return efekt_absencji_factor(payload.custom_sick_days[y])
-        return efekt_absencji_factor(absencja_days(payload.sex)) if payload.include_sick_leave else 1.0
-
-    def _cap_base(y: int, base: float) -> float:
-        avg = PARAMS.get(y, {}).get("avg_wage")
-        return min(base, 2.5 * avg) if avg else base
-
-    skladki_po_latach = {}
-    per_year = []
-    for rok, wyn in wages.items():
-        base_y = _cap_base(rok, wyn)
-        l4f = l4_factor_for_year(rok)
-        contr = base_y * 0.1952 * l4f
-        skladki_po_latach[rok] = contr
-        per_year.append({"year": rok, "wage": round(wyn,2), "base_after_cap": round(base_y,2), "l4_factor": round(l4f,4), "contribution": round(contr,2)})
-
-    rocznie = waloryzuj_rocznie(skladki_po_latach)
-    if isinstance(rocznie, dict):
-        base_after_annual = float(sum(rocznie.values()))
-    else:
-        base_after_annual = float(rocznie)
+def _explain_result(payload: SimInput, proj: Projection, today: dt.date) -> dict:
+    """Krok po kroku dla planowanego roku przejścia (z gotowej projekcji)."""
+    retire_year = proj.retire_year
+    n = proj.n_planned
+    per_year = [
+        {"year": rok, "wage": round(wyn,2), "base_after_cap": round(base_y,2), "l4_factor": round(l4f,4), "contribution": round(contr,2)}
+        for rok, wyn, base_y, l4f, contr in zip(proj.years[:n], proj.wage, proj.base_capped, proj.l4, proj.contribution)
+    ]
 
-    base_after_quarter = waloryzuj_kwartalnie_po_31_stycznia(retire_year, payload.quarter_award, base_after_annual)
-
-    konto = (payload.zus_balance.konto if payload.zus_balance else 0.0) or 0.0
-    subkonto = (payload.zus_balance.subkonto if payload.zus_balance else 0.0) or 0.0
-    podstawa = base_after_quarter + konto + subkonto
+    base_after_annual = proj.capital()
+    # Te same kroki co benefit_from_capital, z waloryzacją kwartalną liczoną raz (wynik = /simulate).
+    with stage("quarterly_indexation"):
+        base_after_quarter = waloryzuj_kwartalnie_po_31_stycznia(retire_year, payload.quarter_award, base_after_annual)
 
+    konto, subkonto = _balances(payload)
     months = expected_life_months(payload.sex, retire_year)
-    nominal = annuitetyzuj(podstawa, months)
-
-    cpi = max(0.0, (PARAMS[today.year]["cpi_index"] - 1.0)) if PARAMS.get(today.year,{}).get("cpi_index") else float(os.getenv("CPI","0.03"))
-    years_to_retire = max(0, retire_year - today.year)
-    real = urealnij(nominal, cpi, years_to_retire)
+    cpi = _cpi_for(today)
+    podstawa = base_after_quarter + konto + subkonto
+    nominal, real = benefit_from_podstawa(podstawa, retire_year, months, cpi, today.year)
 
     return {
         "retire_year": retire_year,
@@ -1220,6 +730,353 @@ def simulate_explain(payload: SimInput):
         }
     }
 
+@app.post("/simulate")
+def simulate(payload: SimInput):
+    result = _simulate_cached(payload)
+    log_usage(payload, result)
+    return result
+
+@app.post("/simulate/timeline")
+def simulate_timeline(
+    payload: SimInput,
+    format: Optional[str] = Query(None),
+    horizon: int = Query(0, ge=0, le=40, description="Dodatkowe lata przejścia po retire_year"),
+    layout: Optional[str] = Query(None, description="'columns' = serie kolumnowe zamiast wierszy"),
+):
+    """
+    Zwraca roczny timeline dla dashboardu (dla każdego roku przejścia do retire_year + horizon):
+    - year (rok przejścia)
+    - base_after_indexation (kapitał po waloryzacji rocznej i kwartalnej + konto/subkonto)
+    - benefit_if_retire_in_year: {nominal, real}
+    `layout=columns` zwraca serie kolumnowe (year, contribution, capital, base_after_indexation,
+    benefit_nominal, benefit_real) — wszystkie z jednego przebiegu po projekcji.
+    `format=csv` / `format=ndjson` — odpowiedź strumieniowa: wiersze wysyłane w miarę liczenia
+    (waloryzacja i świadczenie dla kolejnych lat przejścia), bez budowania całej listy.
+    """
+    _fmt = format if isinstance(format, (str, type(None))) else None
+    today = dt.date.today()
+    retire_year = _resolve_retire_year(payload, today)
+    _validate_input(payload, retire_year)
+
+    until = retire_year + horizon
+    proj = _projection(payload, retire_year, today, extend_to=until if horizon else None)
+    if (layout or "").lower() == "columns":
+        return {"columns": _timeline_columns(_timeline_curve(payload, proj, today, until))}
+    rows = _iter_timeline_rows(payload, proj, today, until)
+
+    if (_fmt or "").lower() == "csv":
+        return StreamingResponse(iter_csv_rows(TIMELINE_CSV_HEADER, rows, _timeline_csv_cells), media_type=CSV_MEDIA)
+    if (_fmt or "").lower() == "ndjson":
+        return StreamingResponse(iter_ndjson(rows), media_type=NDJSON_MEDIA)
+    return {"timeline": list(rows)}
+
+@app.post("/simulate/what-if")
+def simulate_what_if(
+    payload: SimInput,
+    delays: List[int] = Query([0, 1, 2, 5], description="Lata opóźnienia vs retire_year")
+):
+    """
+    Zwraca zestaw scenariuszy dla różnych opóźnień przejścia (0,1,2,5 lat).
+    Jedna projekcja do najdalszego roku przejścia; każde opóźnienie to tylko dopisane lata składek
+    i wyliczenie świadczenia (bez logowania użycia).
+    """
+    today = dt.date.today()
+    retire_year = _resolve_retire_year(payload, today)
+    _validate_input(payload, retire_year)
+    _validate_delays(payload, retire_year, delays)
+
+    proj = _projection(payload, retire_year, today, extend_to=retire_year + max([0, *delays]))
+    return _what_if_result(payload, proj, delays, today)
+
+@app.post("/simulate/explain")
+def simulate_explain(payload: SimInput):
+    """
+    Zwraca breakdown: składki roczne (po L4 i limicie), suma po waloryzacji rocznej,
+    baza po waloryzacji kwartalnej, annuitetyzację i urealnienie.
+    """
+    today = dt.date.today()
+    retire_year = _resolve_retire_year(payload, today)
+    _validate_input(payload, retire_year)
+
+    return _explain_result(payload, _projection(payload, retire_year, today), today)
+
+@app.post("/simulate/bundle")
+def simulate_bundle(
+    payload: SimInput,
+    timeline: bool = Query(True, description="Dołącz roczny timeline"),
+    what_if: bool = Query(True, description="Dołącz scenariusze opóźnienia"),
+    delays: List[int] = Query([0, 1, 2, 5], description="Lata opóźnienia vs retire_year"),
+    explain: bool = Query(False, description="Dołącz breakdown krok po kroku")
+):
+    """
+    Wynik /simulate + (opcjonalnie) timeline, what-if i explain w jednym wywołaniu.
+    Wspólna projekcja liczona raz — wydłużona o horyzont goal-seek i najdalsze opóźnienie.
+    Loguje użycie raz (jak /simulate).
+    """
+    today = dt.date.today()
+    retire_year = _resolve_retire_year(payload, today)
+    _validate_input(payload, retire_year)
+    if what_if:
+        _validate_delays(payload, retire_year, delays)
+
+    extend_to = retire_year
+    if _goal_seek_enabled(payload):
+        extend_to = max(extend_to, retire_year + goal_seek_horizon())
+    if what_if and delays:
+        extend_to = max(extend_to, retire_year + max(delays))
+    proj = _projection(payload, retire_year, today, extend_to=extend_to)
+
+    result = _simulate_core(payload, proj=proj, today=today)
+    log_usage(payload, result)
+
+    out = {"result": result}
+    if timeline:
+        out["timeline"] = _timeline_rows(payload, proj, today)
+    if what_if:
+        out["what_if"] = _what_if_result(payload, proj, delays, today)
+    if explain:
+        out["explain"] = _explain_result(payload, proj, today)
+    return out
+
+# Maks. liczba rekordów liczonych jedną macierzą (ogranicza pamięć dla dużych kohort).
+BATCH_CHUNK = 5000
+# Tryb strumieniowy: rekordy liczone oknami tej wielkości (wyniki okna wysyłane przed liczeniem kolejnego).
+BATCH_STREAM_CHUNK = max(1, _env_int("BATCH_STREAM_CHUNK", 500))
+
+BATCH_CSV_HEADER = (
+    "index", "ok", "retire_year", "benefit_actual", "benefit_real", "replacement_rate_percent",
+    "replacement_rate_indexed_percent", "avg_benefit_year", "sick_leave_loss_abs", "goal_seek_extra_years", "error",
+)
+
+def _batch_csv_cells(row: Dict) -> tuple:
+    r = row.get("result")
+    if r is None:
+        error = row["error"] if isinstance(row["error"], str) else json.dumps(row["error"], ensure_ascii=False)
+        return (row["index"], 0) + ("",) * (len(BATCH_CSV_HEADER) - 3) + (error,)
+    extra = r["goal_seek"]["extra_years_needed"]
+    return (
+        row["index"], 1, r["retire_year"], r["benefit"]["actual"], r["benefit"]["real"],
+        r["replacement_rate_percent"], r["replacement_rate_indexed_percent"], r["avg_benefit_year"],
+        r["sick_leave_impact"]["loss_abs"], "" if extra is None else extra, "",
+    )
+
+def _batch_results(part: List[tuple[int, Any]], today: dt.date) -> List[dict]:
+    """
+    Wyniki dla rekordów `part` = [(index, dict | SimInput)] w tej samej kolejności. Rekordy są grupowane
+    po (start_year, retire_year, sex) i liczone wektorowo (numpy; bez numpy — rekord po rekordzie).
+    """
+    results: Dict[int, dict] = {}
+    groups: Dict[tuple, List[tuple[int, SimInput]]] = {}
+
+    for i, raw in part:
+        try:
+            p = raw if isinstance(raw, SimInput) else SimInput.model_validate(raw)
+            retire_year = _resolve_retire_year(p, today)
+            _validate_input(p, retire_year)
+        except ValidationError as e:
+            results[i] = {"index": i, "ok": False, "error": e.errors(include_url=False, include_context=False)}
+            continue
+        except HTTPException as e:
+            results[i] = {"index": i, "ok": False, "error": e.detail}
+            continue
+        groups.setdefault((p.start_year, retire_year, p.sex.upper()), []).append((i, p))
+
+    auto_backcast = os.getenv("AUTO_BACKCAST", "1") == "1"
+    for (start_year, retire_year, sex), members in groups.items():
+        if not numpy_available():
+            for i, p in members:
+                try:
+                    results[i] = {"index": i, "ok": True, "result": _simulate_core(p, today=today)}
+                except Exception as e:
+                    results[i] = {"index": i, "ok": False, "error": str(e)}
+            continue
+
+        for off in range(0, len(members), BATCH_CHUNK):
+            chunk = members[off:off + BATCH_CHUNK]
+            chunk_payloads = [p for _, p in chunk]
+            extra = goal_seek_horizon() if any(_goal_seek_enabled(p) for p in chunk_payloads) else 0
+            group = project_group(
+                chunk_payloads, start_year, retire_year, current_snapshot().params, today.year, wage_growth_rate(),
+                absencja_dni=absencja_days(sex), auto_backcast=auto_backcast, extra_years=extra
+            )
+            for j, (i, p) in enumerate(chunk):
+                running = [(retire_year - 1 + k, float(v)) for k, v in enumerate(group.running[j])]
+                try:
+                    results[i] = {"index": i, "ok": True, "result": _assemble_result(
+                        p, retire_year, float(group.capital[j]), float(group.capital_no_l4[j]),
+                        float(group.l4_mean[j]), bool(group.used_params_path[j]), running, today
+                    )}
+                except Exception as e:
+                    results[i] = {"index": i, "ok": False, "error": str(e)}
+
+    return [results[i] for i, _ in part]
+
+def _iter_batch_results(payloads: List[Any], today: dt.date, window: int = BATCH_STREAM_CHUNK) -> Iterator[dict]:
+    """Wyniki w kolejności wejścia, liczone oknami po `window` rekordów — pamięć ograniczona do jednego okna."""
+    for off in range(0, len(payloads), window):
+        yield from _batch_results(list(enumerate(payloads[off:off + window], off)), today)
+
+@app.post("/simulate/batch")
+def simulate_batch(
+    payloads: List[Dict[str, Any]] = Body(...),
+    format: Optional[str] = Query(None, description="'ndjson' | 'csv' = odpowiedź strumieniowa"),
+):
+    """
+    Symulacja wielu rekordów naraz (kohorty). Rekordy są grupowane po (start_year, retire_year, sex)
+    i liczone wektorowo (numpy; bez numpy — rekord po rekordzie). Wyniki w kolejności wejścia,
+    błędy per rekord wracają w wierszu ({"ok": false, "error": ...}). Bez logowania użycia.
+    Można wołać bezpośrednio z Pythona z listą dictów lub SimInput.
+    `format=ndjson` (wiersz = wynik rekordu) / `format=csv` (spłaszczone kluczowe pola) — strumieniowo,
+    oknami po BATCH_STREAM_CHUNK rekordów: pierwsze wyniki idą do klienta przed policzeniem kolejnych.
+    """
+    _fmt = (format if isinstance(format, str) else "").lower()
+    today = dt.date.today()
+    if _fmt == "ndjson":
+        return StreamingResponse(iter_ndjson(_iter_batch_results(payloads, today)), media_type=NDJSON_MEDIA)
+    if _fmt == "csv":
+        rows = _iter_batch_results(payloads, today)
+        return StreamingResponse(iter_csv_rows(BATCH_CSV_HEADER, rows, _batch_csv_cells), media_type=CSV_MEDIA)
+    results = _batch_results(list(enumerate(payloads)), today)
+    return {"count": len(payloads), "results": results}
+
+# Monte Carlo: limit ścieżek na request i rozmiar paczki (paczki > 1 idą do puli procesów).
+MC_MAX_PATHS = _env_int("MC_MAX_PATHS", 200_000)
+MC_CHUNK_PATHS = max(1000, _env_int("MC_CHUNK_PATHS", 20_000))
+
+def _montecarlo_inputs(payload: SimInput, today: dt.date):
+    """Deterministyczna projekcja osoby (na snapshocie requestu) -> płaskie wejście Monte Carlo + wynik bazowy."""
+    retire_year = _resolve_retire_year(payload, today)
+    _validate_input(payload, retire_year)
+    proj = _projection(payload, retire_year, today)
+    konto, subkonto = _balances(payload)
+    months = expected_life_months(payload.sex, retire_year)
+    cpi = _cpi_for(today)
+    inputs = inputs_from_projection(
+        proj, payload.quarter_award, konto, subkonto, months, cpi, today.year,
+        wage_growth_rate(), float(payload.gross_salary)
+    )
+    _, nominal, real = benefit_from_capital(
+        proj.capital(), retire_year, payload.quarter_award, konto, subkonto, months, cpi, today.year
+    )
+    return inputs, {"retire_year": retire_year, "nominal": round(float(nominal), 2), "real": round(float(real), 2)}
+
+@app.post("/simulate/montecarlo")
+async def simulate_montecarlo(
+    payload: SimInput,
+    paths: int = Query(10_000, ge=100, description="Liczba ścieżek (limit: MC_MAX_PATHS)"),
+    seed: Optional[int] = Query(None, ge=0, description="Ziarno; brak = losowe (zwracane w odpowiedzi)"),
+    distribution: str = Query("normal", description="Rozkład szoków: normal | t"),
+    df: float = Query(5.0, gt=2.0, description="Stopnie swobody dla distribution=t"),
+    wage_growth_sd: float = Query(0.015, ge=0.0, le=0.5),
+    cpi_sd: float = Query(0.01, ge=0.0, le=0.5),
+    waloryzacja_sd: float = Query(0.015, ge=0.0, le=0.5),
+    corr_wage_cpi: float = Query(0.5, ge=-1.0, le=1.0),
+    corr_wage_waloryzacja: float = Query(0.7, ge=-1.0, le=1.0),
+    corr_cpi_waloryzacja: float = Query(0.5, ge=-1.0, le=1.0),
+    percentiles: List[float] = Query([5, 25, 50, 75, 95]),
+):
+    """
+    Projekcja stochastyczna: N wspólnych ścieżek wzrostu płac, CPI i waloryzacji rocznej
+    (od bieżącego roku do przejścia), liczonych wektorowo. Zwraca pasma percentyli świadczenia
+    nominalnego/realnego i stopy zastąpienia oraz wynik deterministyczny dla porównania.
+    Duże N dzielone na paczki po MC_CHUNK_PATHS liczone w puli procesów. Bez logowania użycia.
+    """
+    if not numpy_available():
+        raise HTTPException(status_code=503, detail="Monte Carlo wymaga numpy")
+    if paths > MC_MAX_PATHS:
+        raise HTTPException(status_code=400, detail=f"paths > {MC_MAX_PATHS} (MC_MAX_PATHS)")
+    if distribution not in DISTRIBUTIONS:
+        raise HTTPException(status_code=400, detail=f"distribution: {' | '.join(DISTRIBUTIONS)}")
+    if not percentiles or any(not 0 <= p <= 100 for p in percentiles):
+        raise HTTPException(status_code=400, detail="percentiles: wartości z zakresu 0..100")
+    spec = MonteCarloSpec(
+        distribution=distribution, df=df, wage_growth_sd=wage_growth_sd, cpi_sd=cpi_sd,
+        waloryzacja_sd=waloryzacja_sd, corr_wage_cpi=corr_wage_cpi,
+        corr_wage_waloryzacja=corr_wage_waloryzacja, corr_cpi_waloryzacja=corr_cpi_waloryzacja,
+    )
+    try:
+        spec.cholesky()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    today = dt.date.today()
+    inputs, deterministic = await run_in_threadpool(_montecarlo_inputs, payload, today)
+    seed = new_seed() if seed is None else seed
+    chunks = chunk_seeds(seed, paths, MC_CHUNK_PATHS)
+    if len(chunks) > 1 and get_pool() is not None:
+        parts = await asyncio.gather(*(_run_heavy(montecarlo_task, inputs, spec, n, s) for n, s in chunks))
+    else:
+        parts = await run_in_threadpool(simulate_chunks, inputs, spec, chunks)
+
+    return {
+        "paths": paths,
+        "seed": seed,
+        "spec": asdict(spec),
+        "deterministic": deterministic,
+        **summarize(parts, percentiles, payload.expected_pension),
+    }
+
+# Siatka parametrów: limit liczby komórek (iloczyn długości osi) na request.
+GRID_MAX_CELLS = _env_int("GRID_MAX_CELLS", 200_000)
+
+def _validate_grid_axes(axes: Dict[str, List[float]]):
+    unknown = [name for name in axes if name not in GRID_AXES]
+    if not axes or unknown:
+        raise HTTPException(status_code=400, detail=f"axes: podaj co najmniej jedną z osi {', '.join(GRID_AXES)}")
+    empty = [name for name, values in axes.items() if not values]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"Puste osie: {empty}")
+    non_finite = [name for name, values in axes.items() if not all(math.isfinite(v) for v in values)]
+    if non_finite:
+        raise HTTPException(status_code=400, detail=f"Wartości nieskończone lub NaN w osiach: {non_finite}")
+    if grid_cells(axes) > GRID_MAX_CELLS:
+        raise HTTPException(status_code=400, detail=f"Siatka ma {grid_cells(axes)} komórek (limit GRID_MAX_CELLS={GRID_MAX_CELLS})")
+    checks = {
+        "gross_salary": (lambda v: v > 0, "wartości > 0"),
+        "retire_year": (lambda v: v == int(v), "lata całkowite"),
+        "sick_days": (lambda v: 0 <= v <= 365, "0..365 dni"),
+        "quarter_award": (lambda v: v in (1, 2, 3, 4), "1..4"),
+    }
+    for name, values in axes.items():
+        ok, rule = checks[name]
+        if not all(ok(v) for v in values):
+            raise HTTPException(status_code=400, detail=f"{name}: {rule}")
+
+@app.post("/simulate/grid")
+def simulate_grid(
+    base: SimInput = Body(..., description="Payload bazowy — wartości osi nadpisują jego pola"),
+    axes: Dict[str, List[float]] = Body(..., description="Osie: gross_salary, retire_year, sick_days, quarter_award"),
+    format: Optional[str] = Query(None, description="json (domyślnie) | npz"),
+):
+    """
+    Wyniki dla pełnego iloczynu kartezjańskiego osi (np. pensja × rok przejścia × dni L4) — do heatmap.
+    Jedna wektorowa projekcja zamiast setek wywołań /simulate: wspólna ścieżka płac, limity i waloryzacja
+    liczone raz. Bez goal-seek, referencji bez L4 i logowania użycia.
+    JSON: osie z etykietami + gęste tablice świadczenia nominalnego, realnego i stopy zastąpienia;
+    `format=npz`: te same dane w postaci binarnej numpy (.npz).
+    """
+    if not numpy_available():
+        raise HTTPException(status_code=503, detail="Siatka parametrów wymaga numpy")
+    today = dt.date.today()
+    default_retire = _resolve_retire_year(base, today)
+    _validate_grid_axes(axes)
+    # Każdy rok przejścia z siatki przechodzi te same reguły co /simulate (400 zamiast cichego wyniku).
+    for retire_year in sorted({int(r) for r in axes.get("retire_year", [default_retire])}):
+        _validate_input(base, retire_year)
+
+    grid = evaluate_grid(
+        base, axes, default_retire, current_snapshot().params, today.year, wage_growth_rate(),
+        absencja_days(base.sex), _cpi_for(today), lambda y: expected_life_months(base.sex, y),
+        auto_backcast=os.getenv("AUTO_BACKCAST", "1") == "1",
+    )
+    if (format or "").lower() == "npz":
+        import io
+        buf = io.BytesIO()
+        grid_to_npz(grid, buf)
+        return Response(content=buf.getvalue(), media_type="application/octet-stream",
+                        headers={"Content-Disposition": 'attachment; filename="grid.npz"'})
+    return grid_to_json(grid)
+
 @app.get("/buckets")
 def get_buckets(year: Optional[int] = None):
     """
@@ -1234,243 +1091,49 @@ def get_buckets(year: Optional[int] = None):
     responses={200: {"content": {"application/pdf": {"schema": {"type":"string","format":"binary"}}},
                      "description":"Pobierz wygenerowany raport PDF"}}
 )
-def report_pdf(payload: SimInput = Body(...)):
-    result = simulate(payload)
-
-    buffer = io.BytesIO()
-    pdf_name = "raport_emerytura.pdf"
-    c = canvas.Canvas(buffer, pagesize=A4)
-    c.setTitle(pdf_name)
-    w, h = A4
-
-    panel_x = MARGIN_X
-    panel_w = w - 2 * MARGIN_X
-
-    title_y = h - 96
-    c.setFillColor(ZUS_NAVY)
-    c.setFont(FONT_BOLD, 30); c.drawString(panel_x, title_y, "Raport 2025")
-    c.setFont(FONT_BOLD, 22); c.drawString(panel_x, title_y - 28, "Prognoza Emerytury")
-
-    y = title_y - 70
-    kpi_gap = 64
-    kpi_left_x  = panel_x
-    kpi_right_x = panel_x + panel_w/2 + 24
-
-    c.setFont(FONT_MAIN, 10); c.setFillColor(ZUS_NAVY)
-    c.drawString(kpi_left_x,  y, "Nominalne (m-c)")
-    c.drawString(kpi_right_x, y, "Realne dziś (m-c)")
-
-    y -= 20
-    c.setFont(FONT_BOLD, 18); c.setFillColor(ZUS_BLACK)
-    c.drawString(kpi_left_x,  y, fmt_money(result['benefit']['actual']))
-    c.drawString(kpi_right_x, y, fmt_money(result['benefit']['real']))
-
-    GUTTER = 28
-    col_w = (panel_w - GUTTER) / 2
-    left_x  = panel_x
-    right_x = panel_x + col_w + GUTTER
-
-    HEADING_GAP   = 36
-    SECTION_GAP_Y = 16
-    BAR_SPACING   = 34
-
-    left_y  = y - HEADING_GAP
-    right_y = y - HEADING_GAP
-
-    # ===== LEWA KOLUMNA: „Najważniejsze wskaźniki”  =====
-    section_heading(c, "Najważniejsze wskaźniki", left_x, left_y)
-    left_y -= SECTION_GAP_Y + 16
-
-    imp = result.get("sick_leave_impact", {})
-    loss_pct = max(0.0, min(1.0, (imp.get("loss_pct") or 0) / 100.0))
-    stat_bar(c, left_x, left_y, col_w, loss_pct, "Utrata z L4 (proc.)", ZUS_ORANGE)
-    left_y -= BAR_SPACING
-
-    gs = result.get("goal_seek", {})
-    tgt = float(gs.get("expected") or 0)
-    prog = float(result['benefit']['real'] or 0)
-    pct_goal = 0 if tgt <= 0 else max(0.0, min(1.0, prog / tgt))
-    stat_bar(c, left_x, left_y, col_w, pct_goal, "Progres względem oczekiwań", ZUS_GREEN)
-    left_y -= BAR_SPACING
-
-    avg_nom = float(result.get("avg_benefit_year") or 0)
-    pct_vs_avg = 0 if avg_nom <= 0 else max(0.0, min(1.0, float(result['benefit']['actual']) / avg_nom))
-    stat_bar(c, left_x, left_y, col_w, pct_vs_avg, "Twoja nominalna vs średnia", ZUS_BLUE)
-    left_y -= BAR_SPACING
-
-    rr_pct = max(0.0, min(1.0, (result.get("replacement_rate_percent") or 0) / 100.0))
-    stat_bar(c, left_x, left_y, col_w, rr_pct, "Stopa zastąpienia (RR)", ACCENT_TEAL)
-    left_y -= (BAR_SPACING + 6)
-
-    # ===== PRAWA KOLUMNA ====
-    section_heading(c, "Porównanie ze średnią", right_x, right_y)
-    right_y -= (SECTION_GAP_Y + 4)
-
-    cmp_h = 65
-    comparison_numbers(
-        c,
-        x=right_x,
-        y=right_y - cmp_h,
-        w=col_w,
-        my_value=float(result["benefit"]["actual"]),
-        avg_value=avg_nom,
+async def report_pdf(payload: SimInput = Body(...)):
+    """
+    PDF z cache: powtórne pobranie tego samego raportu (ten sam payload, dane i dzień) nie renderuje
+    dokumentu od nowa. Każde pobranie jest logowane raz, jak /simulate.
+    Render idzie do puli procesów (cpu_pool), symulacja — do puli wątków.
+    """
+    today = dt.date.today()
+    key = cache_key("pdf", payload.model_dump(mode="json"), current_snapshot().version, today)
+    cached = None if profiling_active() else PDF_CACHE.get(key)
+    if cached is None:
+        result, timeline = await run_in_threadpool(_report_inputs, payload, today)
+        with stage("pdf_draw"):
+            pdf = await _run_heavy(render_pdf_task, payload, result, timeline,
+                                   current_snapshot().assumptions.data, today)
+        cached = (pdf, result)
+        PDF_CACHE.put(key, cached)
+    pdf, result = cached
+    log_usage(payload, result)
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": "attachment; filename=raport_emerytura.pdf"}
     )
-    right_y -= (cmp_h + 24)
-
-    y_after_cols = min(left_y, right_y) - 18
-
-    col2_w   = (panel_w - GUTTER) / 2
-    left2_x  = panel_x
-    right2_x = panel_x + col2_w + GUTTER
-
-    section_heading(c, "Dane wejściowe", left2_x, y_after_cols)
-    section_heading(c, "Założenia i parametry", right2_x, y_after_cols)
-
-    LINE_H = 12
-    c.setFont(FONT_MAIN, 9)
-    c.setFillColor(ZUS_NAVY)
-
-    left_list_y = y_after_cols - 16
-    bullets = [
-        f"Wiek: {payload.age}",
-        f"Płeć: {payload.sex.upper()}",
-        f"Pensja brutto (dziś): {fmt_money(payload.gross_salary)}",
-        f"Lata pracy: {payload.start_year}–{result['retire_year']}",
-        f"Kwartał przyznania: {payload.quarter_award}",
-        f"Uwzględniono L4: {'tak' if payload.include_sick_leave else 'nie'}",
-        f"Konto/Subkonto: {fmt_money((payload.zus_balance.konto if payload.zus_balance else 0.0))} / "
-            f"{fmt_money((payload.zus_balance.subkonto if payload.zus_balance else 0.0))}",
-    ]
-    if payload.expected_pension:
-        expected = float(payload.expected_pension or 0)
-        prognoza_real = float(result["benefit"]["real"] or 0) 
-        gap = max(0.0, round(expected - prognoza_real, 2))
-
-        gs = result.get("goal_seek", {}) or {}
-        if gs.get("enabled"):
-            yn = gs.get("extra_years_needed")
-            years_label = ">10" if yn is None else str(int(yn))
-        else:
-            years_label = "—"
-
-        bullets.extend([
-            f"Oczekiwana emerytura: {fmt_money(expected)}",
-            f"Oczekiwana vs prognoza: {fmt_money(expected)} vs {fmt_money(prognoza_real)}",
-            f"Brakuje do oczekiwań: {fmt_money(gap)}",
-            f"Lata potrzebne: {years_label}",
-        ])
-
-    for line in bullets:
-        c.drawString(left2_x, left_list_y, f"• {line}")
-        left_list_y -= LINE_H
-
-    right_list_y = y_after_cols - 16
-    wg_src = "Mentor (średnia płaca)" if result['assumptions_used']['wage_growth_source']=='mentor_avg_wage' \
-            else "ENV fallback"
-    assumptions_lines = [
-        f"CPI użyte: {fmt_pct((result['assumptions_used']['cpi'] or 0)*100)}",
-        f"Oczek. długość życia: {result['assumptions_used']['life_months']} mies.",
-        f"CAGR płac do przejścia: {fmt_pct((result['assumptions_used']['wage_growth'] or 0)*100)} ({wg_src})",
-        f"Rok przejścia: {result['retire_year']}",
-        f"Średnia emerytura w roku przejścia: {fmt_money(float(result.get('avg_benefit_year') or 0))}",
-        f"RR (dziś): {fmt_pct((result.get('replacement_rate_percent') or 0))}",
-    ]
-    dni_l4 = ASSUMPTIONS.get("absencja_chorobowa", {}).get(payload.sex.upper(), {}).get("dni_rocznie")
-    loss_abs = (result.get("sick_leave_impact", {}) or {}).get("loss_abs")
-    loss_pct = (result.get("sick_leave_impact", {}) or {}).get("loss_pct")
-    if dni_l4 is not None and loss_pct is not None:
-        assumptions_lines.append(
-            f"Absencja: ~{int(dni_l4)} dni/rok; wpływ: {fmt_money(loss_abs)} ({fmt_pct(loss_pct)})"
-        )
-
-    for line in assumptions_lines:
-        c.drawString(right2_x, right_list_y, f"• {line}")
-        right_list_y -= LINE_H
-
-
-    # Stopka
-    c.setFillColor(ZUS_GRAY); c.rect(0, 0, w, 26, fill=1, stroke=0)
-    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 9)
-    c.drawRightString(w - MARGIN_X, 9, f"Emerytura360 • {dt.date.today().isoformat()}")
-
-    # --- STRONA 2: Wykresy z /simulate/timeline ---
-    c.showPage()
-
-    w, h = A4
-    panel_x = MARGIN_X
-    panel_w = w - 2 * MARGIN_X
-    c.setFillColor(ZUS_NAVY)
-    c.setFont(FONT_BOLD, 24); c.drawString(panel_x, h - 96, "Jak rośnie Twoja emerytura")
-    c.setFont(FONT_BOLD, 14); c.drawString(panel_x, h - 120, "Podstawa (konto+subkonto+waloryzacje) i świadczenie realne")
-
-    tl = simulate_timeline(payload, format=None).get("timeline", [])
-    if tl:
-        target_points = 8
-        step = max(1, len(tl) // target_points)
-        sample = [tl[i] for i in range(0, len(tl), step)]
-        if sample[-1]["year"] != tl[-1]["year"]:
-            sample.append(tl[-1])
-
-        labels = [str(r["year"]) for r in sample]
-        values_base = [float(r["base_after_indexation"]) for r in sample]
-        values_real = [float(r["benefit_if_retire_in_year"]["real"]) for r in sample]
-
-        chart_w = panel_w
-        chart_h = 160
-        x = panel_x
-        y_top = h - 170
-
-        c.setFont(FONT_BOLD, 12); c.setFillColor(ZUS_NAVY)
-        c.drawString(x, y_top, "Podstawa po waloryzacjach (koniec roku)")
-        draw_simple_bar_chart(
-            c,
-            x=x,
-            y=y_top - (chart_h + 8),
-            w=chart_w,
-            h=chart_h,
-            labels=labels,
-            values=values_base,
-            colors_fill=[ZUS_BLUE] * len(values_base)
-        )
-
-        y2 = y_top - (chart_h + 8) - 40 - chart_h
-        c.setFont(FONT_BOLD, 12); c.setFillColor(ZUS_NAVY)
-        c.drawString(x, y2 + chart_h + 8, "Prognozowane świadczenie REAL (m-c) – punktowo po latach")
-        draw_simple_bar_chart(
-            c,
-            x=x,
-            y=y2,
-            w=chart_w,
-            h=chart_h,
-            labels=labels,
-            values=values_real,
-            colors_fill=[ZUS_GREEN] * len(values_real)
-        )
-
-        c.setFont(FONT_MAIN, 9); c.setFillColor(ZUS_NAVY)
-        c.drawString(x, y2 - 18, "Kwoty w PLN (miesięcznie)")
-    else:
-        c.setFont(FONT_BOLD, 14); c.setFillColor(ZUS_RED)
-        c.drawString(panel_x, h - 160, "Brak danych do wykresu timeline.")
 
-    c.setFillColor(ZUS_GRAY); c.rect(0, 0, w, 26, fill=1, stroke=0)
-    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 9)
-    c.drawRightString(w - MARGIN_X, 9, f"Emerytura360 • {dt.date.today().isoformat()}")
+def _report_inputs(payload: SimInput, today: dt.date) -> tuple[dict, List[Dict]]:
+    """Wynik /simulate i timeline do raportu (liczone na snapshocie przypiętym do requestu)."""
+    result = _simulate_cached(payload, today=today)
+    timeline = _timeline_rows(payload, _projection(payload, result["retire_year"], today), today)
+    return result, timeline
 
-
-    c.save(); buffer.seek(0)
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={pdf_name}"}
-    )
+async def _run_heavy(fn, *args):
+    """Zadanie w puli procesów; przekroczenie CPU_TASK_TIMEOUT_S -> 504."""
+    try:
+        return await run_cpu(fn, *args)
+    except CpuTaskTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
 
 @app.get(
     "/report/pdf/example",
     responses={200: {"content": {"application/pdf": {"schema": {"type":"string","format":"binary"}}},
                      "description":"Przykładowy raport PDF bez podawania payloadu"}}
 )
-def report_pdf_example():
+async def report_pdf_example():
     sample = SimInput(
         age=28, sex="K", gross_salary=8500,
         start_year=2020, retire_year=2065,
@@ -1479,54 +1142,156 @@ def report_pdf_example():
         custom_wage_timeline=None,
         expected_pension=5000, postal_code="30-001"
     )
-    return report_pdf(sample)
+    return await report_pdf(sample)
+
+# Raporty hurtem: limit rekordów na request i rozmiar paczki renderowanej jednym zadaniem puli.
+BULK_PDF_MAX_RECORDS = _env_int("BULK_PDF_MAX_RECORDS", 20_000)
+BULK_PDF_CHUNK = max(1, _env_int("BULK_PDF_CHUNK", 16))
+
+def _bulk_report_inputs(part: List[tuple[int, Any]], today: dt.date) -> List[tuple[int, Optional[tuple], Any]]:
+    """
+    Walidacja + symulacja + timeline dla paczki rekordów (bez cache i logowania użycia).
+    -> [(index, (payload, result, timeline) | None, błąd)], błędy jak w /simulate/batch.
+    """
+    out = []
+    for i, raw in part:
+        try:
+            p = raw if isinstance(raw, SimInput) else SimInput.model_validate(raw)
+            result = _simulate_core(p, today=today)
+            timeline = _timeline_rows(p, _projection(p, result["retire_year"], today), today)
+            out.append((i, (p, result, timeline), None))
+        except ValidationError as e:
+            out.append((i, None, e.errors(include_url=False, include_context=False)))
+        except HTTPException as e:
+            out.append((i, None, e.detail))
+        except Exception as e:
+            out.append((i, None, str(e)))
+    return out
+
+def bulk_report_records(payloads: List[Any], today: dt.date):
+    """Strumień BulkRecord (PDF albo błąd) w kolejności wejścia — wspólny dla endpointu i CLI (bulk_report)."""
+    assumptions = current_snapshot().assumptions.data
+    return render_bulk(
+        payloads,
+        prepare=lambda part: _bulk_report_inputs(part, today),
+        render=lambda items: run_cpu(render_pdf_batch_task, items, assumptions, today),
+        chunk=BULK_PDF_CHUNK,
+        window=max(2, pool_size() * 2),
+    )
+
+@app.post(
+    "/report/pdf/bulk",
+    responses={200: {"content": {"application/zip": {"schema": {"type":"string","format":"binary"}}},
+                     "description":"ZIP z raportem PDF per rekord i manifest.csv"}}
+)
+async def report_pdf_bulk(payloads: List[Dict[str, Any]] = Body(...)):
+    """
+    Raport PDF dla każdego rekordu listy SimInput (kohorty, HR) w jednym strumieniu ZIP:
+    raport_00000.pdf, ... (numer = indeks na liście) + manifest.csv (index, plik, status, błąd). Render równolegle w puli procesów,
+    paczkami po BULK_PDF_CHUNK, pamięć stała względem liczby rekordów. Bez cache PDF i logowania użycia.
+    """
+    if len(payloads) > BULK_PDF_MAX_RECORDS:
+        raise HTTPException(status_code=400, detail=f"Maksymalnie {BULK_PDF_MAX_RECORDS} rekordów na request")
+    today = dt.date.today()
+    return StreamingResponse(
+        zip_stream(bulk_report_records(payloads, today), today),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=raporty.zip"},
+    )
+
+XLSX_MEDIA = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
 @app.get(
     "/admin/export-xls",
-    responses={200: {"content": {"application/vnd.openxmlformats-officedocument.spreadsheetml.sheet":
-                                 {"schema": {"type":"string","format":"binary"}}},
-                     "description":"Eksport użyć symulatora (XLSX) – z logów"}}
+    responses={200: {"content": {XLSX_MEDIA: {"schema": {"type":"string","format":"binary"}},
+                                 "text/csv": {"schema": {"type":"string"}},
+                                 "application/gzip": {"schema": {"type":"string","format":"binary"}}},
+                     "description":"Eksport użyć symulatora (XLSX / CSV / CSV.gz) – z logów"}}
 )
-def export_xls():
-    ensure_log_header()
-    wb = openpyxl.Workbook(); ws = wb.active; ws.title = "Użycia"
-    headers = ["Data użycia","Godzina użycia","Emerytura oczekiwana","Wiek","Płeć","Wynagrodzenie",
-               "Czy uwzględniał okresy choroby","Środki konto","Środki subkonto",
-               "Emerytura rzeczywista","Emerytura urealniona","Kod pocztowy"]
-    ws.append(headers)
-    with LOG_CSV.open("r", newline="", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            ws.append([row["date"],row["time"],row["expected_pension"],row["age"],row["sex"],row["salary"],
-                       row["included_sick_leave"],row["konto"],row["subkonto"],
-                       row["benefit_actual"],row["benefit_real"],row["postal_code"]])
-    tmp = io.BytesIO(); wb.save(tmp); tmp.seek(0)
-    return StreamingResponse(tmp,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition":"attachment; filename=uzycia_symulatora.xlsx"})
+async def export_xls(
+    date_from: Optional[dt.date] = Query(None, alias="from", description="Od dnia (RRRR-MM-DD, włącznie)"),
+    date_to: Optional[dt.date] = Query(None, alias="to", description="Do dnia (RRRR-MM-DD, włącznie)"),
+    sex: Optional[str] = Query(None, description="K lub M"),
+    age_min: Optional[int] = Query(None, ge=0),
+    age_max: Optional[int] = Query(None, ge=0),
+    postal_code: Optional[str] = Query(None),
+    format: str = Query("xlsx", description="xlsx | csv | csv.gz"),
+):
+    fmt = format.lower()
+    if fmt not in ("xlsx", "csv", "csv.gz"):
+        raise HTTPException(status_code=400, detail="format musi być jednym z: xlsx, csv, csv.gz")
+    await run_in_threadpool(USAGE_LOG.flush)
+    d_from = date_from.isoformat() if date_from else None
+    d_to = date_to.isoformat() if date_to else None
+    filters = {"sex": sex, "age_min": age_min, "age_max": age_max, "postal_code": postal_code}
+    if fmt == "xlsx":
+        path = await _run_heavy(build_xlsx_task, str(LOG_DB), d_from, d_to, filters)
+        return StreamingResponse(iter_file(open(path, "rb")), media_type=XLSX_MEDIA,
+            headers={"Content-Disposition":"attachment; filename=uzycia_symulatora.xlsx"},
+            background=BackgroundTask(os.unlink, path))
+    rows = USAGE_STORE.query(d_from, d_to, **filters)
+    if fmt == "csv":
+        return StreamingResponse(iter_csv(rows), media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition":"attachment; filename=uzycia_symulatora.csv"})
+    return StreamingResponse(iter_csv(rows, gzip=True), media_type="application/gzip",
+        headers={"Content-Disposition":"attachment; filename=uzycia_symulatora.csv.gz"})
 
 @app.post("/admin/clear-logs")
 def clear_logs():
-    try:
-        LOG_CSV.unlink(missing_ok=True) 
-    except TypeError:
-        if LOG_CSV.exists():
-            LOG_CSV.unlink()
-    ensure_log_header()
+    USAGE_LOG.clear()
     return {"cleared": True}
 
+def reload_data() -> DataSnapshot:
+    """Wczytuje dane obok bieżących i publikuje je jednym przypisaniem; czyści cache wyników."""
+    snap = load_data_snapshot()
+    install_snapshot(snap)
+    PDF_CACHE.clear()
+    SIM_CACHE.clear()
+    return snap
+
+_SHARED_SYNC_LOCK = threading.Lock()  # zajęta na czas wczytywania w tle
+_SHARED_SEEN = 0  # ostatnia obsłużona wartość licznika (bez pętli reloadów, gdy plik jest starszy niż licznik)
+
+def _shared_generation_seen() -> int:
+    return max(_SHARED_SEEN, current_snapshot().tables_info.get("generation", 0))
+
+def sync_shared_tables():
+    """
+    Wołane przed każdym requestem (SnapshotMiddleware, w pętli zdarzeń): jeśli inny worker opublikował
+    nowszą generację snapshotu tabel (reload, auto-reload), zleca jej wczytanie wątkowi w tle i wraca od razu.
+    W pętli zostaje tylko odczyt licznika z mmap; do czasu podmiany requesty dostają dotychczasowy snapshot.
+    """
+    published = TABLES_GEN.get()
+    if published <= _shared_generation_seen():
+        return
+    if not _SHARED_SYNC_LOCK.acquire(blocking=False):
+        return  # wczytywanie już trwa
+    threading.Thread(target=_load_shared_generation, args=(published,), name="tables-sync", daemon=True).start()
+
+def _load_shared_generation(published: int):
+    global _SHARED_SEEN
+    try:
+        if published > _shared_generation_seen():
+            reload_data()
+    finally:
+        # Także po błędzie: kolejna próba dopiero przy następnej generacji, nie przy każdym requeście.
+        _SHARED_SEEN = max(_SHARED_SEEN, published)
+        _SHARED_SYNC_LOCK.release()
+
 @app.post("/admin/reload")
 def reload_tables():
-    PARAMS.clear()
-    AVG_TABLE.clear()
-    load_params_table()
-    load_avg_benefit_table()
+    try:
+        snap = reload_data()
+    except ValueError as e:  # np. uszkodzony JSON założeń — obowiązuje dotychczasowy snapshot
+        raise HTTPException(status_code=500, detail=f"Nie wczytano danych ({e}); bez zmian: {current_snapshot().version}")
+    params, avg = snap.params, snap.avg_table
     return {
         "reloaded": True,
-        "params_loaded": bool(PARAMS),
-        "avg_loaded": bool(AVG_TABLE),
-        "params_years": [min(PARAMS.keys()), max(PARAMS.keys())] if PARAMS else [],
-        "avg_years": [min(AVG_TABLE.keys()), max(AVG_TABLE.keys())] if AVG_TABLE else []
+        "data_version": snap.version,
+        "params_loaded": bool(params),
+        "avg_loaded": bool(avg),
+        "params_years": [min(params.keys()), max(params.keys())] if params else [],
+        "avg_years": [min(avg.keys()), max(avg.keys())] if avg else []
     }
 
 @app.get("/admin/sources")
@@ -1541,5 +1306,51 @@ def sources():
         "avg_loaded": bool(AVG_TABLE),
         "params_years_range": [min(PARAMS.keys()), max(PARAMS.keys())] if PARAMS else [],
         "avg_years_range": [min(AVG_TABLE.keys()), max(AVG_TABLE.keys())] if AVG_TABLE else [],
-        "sample_params_first_year": sample_params
+        "sample_params_first_year": sample_params,
+        "data_version": current_snapshot().version,
+        "data_loaded_at": current_snapshot().loaded_at,
+        "tables": dict(current_snapshot().tables_info),
+        "pdf_cache": PDF_CACHE.stats(),
+        "simulate_cache": SIM_CACHE.stats()
     }
+
+@app.get("/admin/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+def admin_metrics():
+    """
+    Histogramy czasu requestów i etapów obliczeń per endpoint (format tekstowy Prometheus).
+    Etapy: wage_path, contributions, annual_indexation, quarterly_indexation, annuitization,
+    goal_seek, no_l4_reference, pdf_draw, usage_log (mogą się zagnieżdżać). ENV METRICS=0 wyłącza pomiar.
+    Jak pozostała diagnostyka wymaga X-Admin-Key; METRICS_PUBLIC=1 otwiera go dla scrapera.
+    """
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/slowest", dependencies=[Depends(require_admin)])
+def admin_slowest():
+    """Najwolniejsze requesty z ostatnich SLOW_WINDOW_S sekund: czas, etapy i argumenty (payload)."""
+    return {"requests": SLOWEST.snapshot()}
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+def admin_profiles():
+    """Zapisane profile (najnowsze pierwsze) — bez samych danych profilu."""
+    return {"profiles": PROFILES.list()}
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def admin_profile(profile_id: str, format: str = Query("text", pattern="^(text|pstats)$"),
+                  sort: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$"),
+                  limit: int = Query(60, ge=1, le=1000)):
+    """
+    Profil requestu wywołanego z `X-Profile: 1` (id z nagłówka odpowiedzi `X-Profile-Id`).
+    text: raport pstats; pstats: plik do `python -m pstats` / snakeviz.
+    """
+    item = PROFILES.get(profile_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Brak profilu (wygasł albo zły identyfikator)")
+    if format == "pstats":
+        return Response(
+            content=profile_pstats(item["stats"]),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f"attachment; filename=profile_{profile_id}.pstats"}
+        )
+    return PlainTextResponse(profile_text(item["stats"], sort, limit))
+
+STARTUP_MS["app_init"] = round((time.perf_counter() - _INIT_T0) * 1000, 2)
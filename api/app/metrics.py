@@ -0,0 +1,143 @@
+"""
+Czasy etapów obliczeń per request: nagłówek Server-Timing i histogramy w formacie Prometheus.
+
+Etapy mierzone są w kodzie przez `stage("nazwa")` (blok) albo `clock()` + `add("nazwa", t0)`
+(gorące, krótkie funkcje). Poza requestem (albo przy METRICS=0) pomiar to jedno odczytanie ContextVar.
+Etapy mogą się zagnieżdżać (np. waloryzacja kwartalna wewnątrz goal-seek) — czasy są sumowane per nazwa.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# Granice kubełków histogramu [s] (jak domyślne w klientach Prometheus, z gęstszym początkiem).
+BUCKETS: Tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                              0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def metrics_enabled() -> bool:
+    return os.getenv("METRICS", "1") == "1"
+
+def metrics_public() -> bool:
+    """METRICS_PUBLIC=1: /admin/metrics bez X-Admin-Key (np. scrape Prometheusa z sieci wewnętrznej)."""
+    return os.getenv("METRICS_PUBLIC", "0") == "1"
+
+_STAGES: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+def clock() -> float:
+    return time.perf_counter()
+
+def add(name: str, t0: float):
+    """Dolicza czas od `t0` (z clock()) do etapu `name` bieżącego requestu."""
+    stages = _STAGES.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + (time.perf_counter() - t0)
+
+def current_stages() -> Dict[str, float]:
+    """Czasy etapów bieżącego requestu [s] (kopia; pusty słownik poza requestem)."""
+    return dict(_STAGES.get() or {})
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, t0)
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+_LOCK = threading.Lock()
+_STAGE_HIST: Dict[Tuple[str, str], Histogram] = {}
+_REQUEST_HIST: Dict[Tuple[str, str], Histogram] = {}
+
+def _observe(registry: Dict[Tuple[str, str], Histogram], key: Tuple[str, str], value: float):
+    hist = registry.get(key)
+    if hist is None:
+        hist = registry.setdefault(key, Histogram())
+    hist.observe(value)
+
+def record(endpoint: str, method: str, total: float, stages: Dict[str, float]):
+    with _LOCK:
+        _observe(_REQUEST_HIST, (endpoint, method), total)
+        for name, value in stages.items():
+            _observe(_STAGE_HIST, (endpoint, name), value)
+
+def reset():
+    with _LOCK:
+        _STAGE_HIST.clear()
+        _REQUEST_HIST.clear()
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _render_histograms(lines: List[str], metric: str, help_text: str, label_names: Tuple[str, str],
+                       registry: Dict[Tuple[str, str], Histogram]):
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} histogram")
+    for key, hist in sorted(registry.items()):
+        labels = ",".join(f'{n}="{_label(v)}"' for n, v in zip(label_names, key))
+        cumulative = 0
+        for bound, n in zip(BUCKETS, hist.counts):
+            cumulative += n
+            lines.append(f'{metric}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {hist.count}')
+        lines.append(f"{metric}_sum{{{labels}}} {hist.sum:.9g}")
+        lines.append(f"{metric}_count{{{labels}}} {hist.count}")
+
+def render_prometheus() -> str:
+    """Histogramy w formacie tekstowym Prometheus (0.0.4)."""
+    lines: List[str] = []
+    with _LOCK:
+        _render_histograms(lines, "e360_request_duration_seconds", "Czas obsługi requestu per endpoint.",
+                           ("endpoint", "method"), _REQUEST_HIST)
+        _render_histograms(lines, "e360_stage_duration_seconds", "Czas etapów obliczeń per endpoint.",
+                           ("endpoint", "stage"), _STAGE_HIST)
+    return "\n".join(lines) + "\n"
+
+def server_timing(stages: Dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={value * 1000:.3f}" for name, value in stages.items()]
+    parts.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(parts)
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: zbiera czasy etapów requestu, dopisuje nagłówek Server-Timing (etapy zakończone
+    przed wysłaniem nagłówków) i zapisuje histogramy per szablon ścieżki (np. /simulate/timeline).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stages: Dict[str, float] = {}
+        token = _STAGES.set(stages)
+        t0 = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                header = server_timing(stages, time.perf_counter() - t0).encode("latin-1")
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _STAGES.reset(token)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            record(endpoint, scope.get("method", ""), time.perf_counter() - t0, stages)
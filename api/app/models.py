@@ -0,0 +1,43 @@
+"""Modele wejścia API (pydantic) — osobny moduł, żeby procesy robocze mogły je odpiklować bez importu aplikacji."""
+from typing import Dict, Optional
+
+from pydantic import BaseModel, Field
+from pydantic.config import ConfigDict
+
+class Balance(BaseModel):
+    konto: Optional[float] = 0.0
+    subkonto: Optional[float] = 0.0
+
+class SimInput(BaseModel):
+    age: int = Field(..., ge=16, le=80)
+    sex: str = Field(..., pattern="^[KkMm]$")
+    gross_salary: float = Field(..., gt=0)
+    start_year: int = Field(
+        ...,
+        description="Rok rozpoczęcia pracy (liczony od stycznia danego roku)."
+    )
+    retire_year: Optional[int] = Field(
+        None,
+        description="Planowany rok zakończenia aktywności zawodowej (styczeń). Domyślnie: osiągnięcie wieku 60 (K) / 65 (M)."
+    )
+    include_sick_leave: bool = Field(
+        True,
+        description="Uwzględnia średnią absencję chorobową (dni/rok) różną dla K/M."
+    )
+    quarter_award: int = Field(3, ge=1, le=4)
+    zus_balance: Optional[Balance] = None
+    custom_wage_timeline: Optional[Dict[int, float]] = None
+    custom_sick_days: Optional[Dict[int, float]] = None  
+    expected_pension: Optional[float] = None
+    postal_code: Optional[str] = None
+
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "age": 28, "sex": "K", "gross_salary": 8500,
+            "start_year": 2020, "retire_year": 2065,
+            "include_sick_leave": True, "quarter_award": 3,
+            "zus_balance": {"konto": 0, "subkonto": 0},
+            "custom_wage_timeline": None,
+            "expected_pension": 5000, "postal_code": "30-001"
+        }
+    })
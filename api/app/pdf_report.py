@@ -0,0 +1,717 @@
+"""
+Raport PDF (reportlab): paleta, czcionki, helpery rysowania i render dwustronicowego raportu.
+
+Moduł jest importowany dopiero przy pierwszym PDF-ie (albo w fazie warm-up), a czcionki
+rejestrowane raz — workery obsługujące tylko /simulate nie płacą za reportlab ani skanowanie fontów.
+
+Koszt jednego raportu: stałe elementy stron (tytuły, nagłówki sekcji, opisy wskaźników, ramki, stopka)
+są rysowane raz na dokument jako form XObjects i osadzane na stronach; per raport rysowane są tylko
+liczby i wykresy. Szerokości tekstu i podzbiory czcionek TTF są pamiętane w procesie, a strumienie
+zapisywane binarnie (Flate, bez ASCII85).
+"""
+import datetime as dt
+import io
+import os
+import threading
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+from reportlab.lib import colors
+
+# Strumienie (strony, czcionki) kompresowane Flate i zapisywane binarnie — bez ASCII85 (+25% rozmiaru i czasu).
+rl_config.useA85 = 0
+
+FONTS_DIR = Path(__file__).resolve().parents[1] / "fonts"
+
+# --- Colors (ZUS palette) ---
+ZUS_ORANGE = colors.Color(255/255, 179/255, 79/255)
+ZUS_GREEN  = colors.Color(0/255, 153/255, 63/255)
+ZUS_GRAY   = colors.Color(190/255, 195/255, 206/255)
+ZUS_BLUE   = colors.Color(63/255, 132/255, 210/255)
+ZUS_NAVY   = colors.Color(0/255, 65/255, 110/255)
+ZUS_RED    = colors.Color(240/255, 94/255, 94/255)
+ZUS_BLACK  = colors.black
+ZUS_LIGHT_BG = colors.Color(246/255, 248/255, 251/255)
+
+ACCENT_YELLOW = colors.Color(255/255, 203/255, 0/255)
+ACCENT_TEAL   = colors.Color(0/255, 185/255, 185/255)
+
+# --- Layout constants for PDF ---
+MARGIN_X = 32       
+MARGIN_TOP = 78      
+SECTION_GAP = 22     
+LINE_GAP = 14        
+
+# --- Typography (CSS-like font stack dla ReportLab) ---
+FONT_MAIN = "Helvetica"          
+FONT_BOLD = "Helvetica-Bold"
+
+def _register_polish_fonts():
+    """
+    Ustawia główną rodzinę czcionek wg kolejności jak w CSS:
+    ui-sans-serif, system-ui, -apple-system, 'Segoe UI', Roboto, Helvetica, Arial.
+    Szuka plików TTF/OTF w katalogu ./fonts oraz w typowych ścieżkach systemowych.
+    Pierwsza znaleziona para (Regular + Bold) staje się FONT_MAIN / FONT_BOLD.
+    Zawsze zostawia Helvetica jako ostateczny fallback.
+    """
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    # 1) Kolejność preferencji (nazwa logiczna, lista wzorców plików Regular, Bold)
+    PREFERRED = [
+        ("SFPro",              
+         ["SFProText-Regular.otf", "SFUIText-Regular.otf", "SFNS.ttf"],
+         ["SFProText-Bold.otf", "SFUIText-Bold.otf", "SFNS-Bold.ttf"]),
+        ("SegoeUI",            
+         ["segoeui.ttf", "Segoe UI.ttf"],
+         ["segoeuib.ttf", "Segoe UI Bold.ttf"]),
+        ("Roboto",            
+         ["Roboto-Regular.ttf"],
+         ["Roboto-Bold.ttf"]),
+        ("Arial",
+         ["Arial.ttf", "arial.ttf"],
+         ["Arial Bold.ttf", "arialbd.ttf"]),
+        ("DejaVuSans",
+         ["DejaVuSans.ttf"],
+         ["DejaVuSans-Bold.ttf"]),
+    ]
+
+    # 2) Gdzie szukać plików
+    search_dirs = [
+        str(FONTS_DIR),                        
+        "/System/Library/Fonts", "/Library/Fonts",                      
+        "C:/Windows/Fonts",                                                         
+        "/usr/share/fonts", "/usr/local/share/fonts", "~/.local/share/fonts", "~/.fonts"  
+    ]
+    search_dirs = [os.path.expanduser(d) for d in search_dirs if os.path.isdir(os.path.expanduser(d))]
+
+    def _find_first(paths):
+        for base in search_dirs:
+            for name in paths:
+                p = os.path.join(base, name)
+                if os.path.isfile(p):
+                    return p
+        return None
+
+    def _try_register(alias, regular_candidates, bold_candidates):
+        reg = _find_first(regular_candidates)
+        bold = _find_first(bold_candidates)
+        if not reg or not bold:
+            return False
+        try:
+            for name, path in ((alias, reg), (alias + "-Bold", bold)):
+                font = TTFont(name, path)
+                _memoize_subsets(font)
+                pdfmetrics.registerFont(font)
+            return True
+        except Exception:
+            return False
+
+    # 3) Przejdź po stacku i wybierz pierwszą działającą parę
+    global FONT_MAIN, FONT_BOLD
+    for alias, regs, bolds in PREFERRED:
+        if _try_register(alias, regs, bolds):
+            FONT_MAIN = alias
+            FONT_BOLD = alias + "-Bold"
+            break
+
+def _memoize_subsets(font, maxsize: int = 64):
+    """
+    Podzbiory czcionki TTF (plik osadzany w PDF) liczone i kompresowane raz na proces dla danej listy znaków.
+    Stałe teksty stron idą do dokumentu pierwsze, więc kolejne raporty mają zwykle te same podzbiory.
+    Skompresowany strumień dostaje gotowy /Filter, więc reportlab go nie kompresuje ponownie.
+    Korzysta z wewnętrznych nazw reportlab (makeSubset, addSubsetObjects, klucz "fontFile:...") — wersja
+    jest przypięta w requirements, a api/tests/test_pdf_fonts.py sprawdza osadzone czcionki po aktualizacji.
+    """
+    from reportlab.pdfbase import pdfdoc
+
+    face = font.face
+    make_subset, add_subset_objects = face.makeSubset, face.addSubsetObjects
+
+    @lru_cache(maxsize=maxsize)
+    def subset_bytes(subset: tuple) -> tuple[bytes, bytes]:
+        raw = make_subset(list(subset))
+        return raw, zlib.compress(raw)
+
+    def add_cached_subset_objects(doc, fontname, subset):
+        ref = add_subset_objects(doc, fontname, subset)
+        stream = doc.idToObject.get("fontFile:%s(%s)" % (face.filename, fontname))
+        if doc.compression and isinstance(stream, pdfdoc.PDFStream):
+            stream.content = subset_bytes(tuple(subset))[1]
+            stream.dictionary["Filter"] = pdfdoc.PDFArray([pdfdoc.PDFName("FlateDecode")])
+        return ref
+
+    face.makeSubset = lambda subset: subset_bytes(tuple(subset))[0]
+    face.addSubsetObjects = add_cached_subset_objects
+
+_fonts_lock = threading.Lock()
+_fonts_ready = False
+
+def ensure_fonts():
+    """Rejestruje czcionki przy pierwszym użyciu (idempotentne, bezpieczne wątkowo)."""
+    global _fonts_ready
+    if _fonts_ready:
+        return
+    with _fonts_lock:
+        if not _fonts_ready:
+            _register_polish_fonts()
+            _fonts_ready = True
+
+@lru_cache(maxsize=4096)
+def text_width(text: str, font: str, size: float) -> float:
+    """pdfmetrics.stringWidth z pamięcią per (tekst, czcionka, rozmiar) — pętle zwężania pytają wielokrotnie."""
+    return pdfmetrics.stringWidth(text, font, size)
+
+def fmt_money(v: Optional[float]) -> str:
+    if v is None: return "—"
+    return f"{v:,.2f} zł".replace(",", " ").replace("\xa0", " ")
+
+def fmt_pct(v: Optional[float]) -> str:
+    if v is None: return "—"
+    return f"{v:.2f}%"
+
+# --- Extra layout knobs (hackathon tuning) ---
+KPI_CARD_H = 64     
+KPI_GAP    = 18     
+COMPARE_H  = 90     
+NEG_GAP    = 80     
+
+# --- PDF helpers (stare; część zostaje, część poniżej nowa wersja) ---
+def draw_header(c: canvas.Canvas, w, h, title: str):
+    c.setFillColor(ZUS_NAVY); c.rect(0, h-72, w, 72, fill=1, stroke=0)
+    c.setFillColor(ZUS_GREEN); c.rect(0, h-72, 8, 72, fill=1, stroke=0)
+    c.setFillColor(colors.white)
+    c.setFont(FONT_BOLD, 22); c.drawString(MARGIN_X, h-42, title)
+    c.setFont(FONT_MAIN, 10); c.drawString(MARGIN_X, h-64, f"Data: {dt.date.today().isoformat()}")
+
+def draw_footer(c: canvas.Canvas, w):
+    c.setFillColor(ZUS_GRAY); c.rect(0, 0, w, 26, fill=1, stroke=0)
+    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 9)
+    c.drawRightString(w-MARGIN_X, 9, f"Emerytura360 • {dt.date.today().isoformat()}")
+
+def section_title(c: canvas.Canvas, text: str, x: float, y: float):
+    c.setFillColor(ZUS_NAVY); c.setFont(FONT_BOLD, 12)
+    c.drawString(x, y, text)
+
+def wrap_text(c: canvas.Canvas, text: str, font: str, size: int, max_width: float) -> List[str]:
+    c.setFont(font, size)
+    words = text.split(" ")
+    lines: List[str] = []
+    cur = ""
+    for w in words:
+        test = (cur + " " + w).strip()
+        if text_width(test, font, size) <= max_width:
+            cur = test
+        else:
+            if cur:
+                lines.append(cur); cur = w
+            else:
+                while text_width(w, font, size) > max_width and len(w) > 1:
+                    w = w[:-1]
+                lines.append(w); cur = ""
+    if cur: lines.append(cur)
+    if len(lines) > 2:
+        lines = [lines[0], lines[1] + "…"]
+    return lines
+
+def kpi_card(c: canvas.Canvas, x, y, w, h, label: str, value: str, accent=ZUS_GREEN):
+    corner = 12
+    c.setFillColor(colors.white)
+    c.setStrokeColor(ZUS_GRAY)
+    c.setLineWidth(0.8)
+    c.roundRect(x, y, w, h, corner, fill=1, stroke=1)
+
+    LABEL_FS = 10
+    VALUE_FS = 16
+    TOP_PAD = 16
+    SIDE_PAD = 12
+
+    c.setFillColor(ZUS_NAVY)
+    label_lines = wrap_text(c, label, FONT_MAIN, LABEL_FS, w - 2*SIDE_PAD)
+    c.setFont(FONT_MAIN, LABEL_FS)
+    base_y = y + h - TOP_PAD
+    line_h = LABEL_FS + 2
+    for i, line in enumerate(label_lines):
+        c.drawCentredString(x + w/2, base_y - i*line_h, line)
+
+    c.setFillColor(ZUS_BLACK)
+    c.setFont(FONT_BOLD, VALUE_FS)
+    safe_gap = 12
+    value_y = base_y - len(label_lines)*line_h - safe_gap
+    value_y = max(value_y, y + 10)
+    c.drawCentredString(x + w/2, value_y, value)
+
+COMPARE_BOX_H = 60
+
+def comparison_frame(c: canvas.Canvas, x, y, w):
+    """Stała część porównania: ramka i podpisy kolumn."""
+    c.setFillColor(colors.white); c.setStrokeColor(ZUS_GRAY)
+    c.roundRect(x, y, w, COMPARE_BOX_H, 10, fill=1, stroke=1)
+    mid_y = y + COMPARE_BOX_H / 2.0
+    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 9)
+    c.drawCentredString(x + w * 0.25, mid_y + 10, "Twoja (nominalna, m-c)")
+    c.drawCentredString(x + w * 0.75, mid_y + 10, "Średnia")
+
+def comparison_numbers(c: canvas.Canvas, x, y, w,
+                       my_value: Optional[float],
+                       avg_value: Optional[float],
+                       frame: bool = True):
+    """Porównanie ze średnią; `frame=False` — ramka i podpisy są już na stronie (comparison_frame)."""
+    if frame:
+        comparison_frame(c, x, y, w)
+
+    left_x   = x + w * 0.25
+    center_x = x + w * 0.50
+    right_x  = x + w * 0.75
+    mid_y    = y + COMPARE_BOX_H / 2.0
+
+    VALUE_FS_LEFT  = 14
+    VALUE_FS_RIGHT = 14
+    VALUE_OFFSET = 12 
+
+    c.setFillColor(ZUS_BLACK); c.setFont(FONT_BOLD, VALUE_FS_LEFT)
+    c.drawCentredString(left_x,  mid_y - VALUE_OFFSET, fmt_money(my_value))
+
+    if not avg_value or avg_value <= 0: avg_value = 0.0
+    c.setFont(FONT_BOLD, VALUE_FS_RIGHT)
+    c.drawCentredString(right_x, mid_y - VALUE_OFFSET, fmt_money(avg_value))
+
+    diff_pct = None
+    if avg_value > 0 and my_value is not None:
+        diff_pct = (my_value - avg_value) / avg_value * 100.0
+    badge_text = "—"; badge_color = ZUS_ORANGE
+    if diff_pct is not None:
+        badge_text = f"{diff_pct:+.2f}%"
+        if diff_pct >= 5: badge_color = ZUS_GREEN
+        elif diff_pct <= -5: badge_color = ZUS_RED
+
+    pill_w, pill_h = 50, 16
+    pill_x = center_x - pill_w/2
+    pill_y = mid_y - pill_h/2 - 20  
+    c.setFillColor(badge_color); c.setStrokeColor(colors.white); c.setLineWidth(1.2)
+    c.roundRect(pill_x, pill_y, pill_w, pill_h, 7, fill=1, stroke=1)
+    c.setFillColor(colors.white); c.setFont(FONT_BOLD, 10)
+    c.drawCentredString(center_x, pill_y + pill_h/2 - 3, badge_text)
+
+def fmt_money_pl_short(v: float) -> str:
+    if v >= 2_000_000:
+        s = f"{v/1_000_000:.1f}".replace(".", ",")
+        return f"{s} mln zł"
+    if v >= 20_000:
+        s = str(int(round(v/1000)))  
+        return f"{s} tys. zł"
+    s = f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", " ")
+    return f"{s} zł"
+
+
+def draw_simple_bar_chart(c: canvas.Canvas, x, y, w, h, labels, values, colors_fill=None):
+    n = len(values)
+    if n == 0:
+        return
+    max_v = max(values) if max(values) > 0 else 1.0
+
+    c.setFillColor(colors.white)
+    c.setStrokeColor(ZUS_GRAY)
+    c.roundRect(x, y, w, h, 10, fill=1, stroke=1)
+
+    pad_x = 24
+    pad_top = 32
+    pad_bottom = 34
+    chart_x = x + pad_x
+    chart_w = w - 2*pad_x
+    chart_y = y + pad_bottom
+    chart_h = h - pad_top - pad_bottom
+
+    c.setStrokeColor(ZUS_GRAY)
+    c.setLineWidth(0.6)
+    c.line(chart_x, chart_y, chart_x + chart_w, chart_y)
+
+    gap = chart_w * 0.12 / max(1, n)
+    bar_w = (chart_w - gap * (n + 1)) / n
+
+    for i, v in enumerate(values):
+        bh = 0 if max_v <= 0 else (v / max_v) * chart_h
+        bx = chart_x + gap + i * (bar_w + gap)
+        by = chart_y
+
+        if colors_fill and i < len(colors_fill):
+            c.setFillColor(colors_fill[i])
+        else:
+            c.setFillColor(ZUS_BLUE if i == 0 else ZUS_GREEN)
+
+        c.rect(bx, by, bar_w, bh, fill=1, stroke=0)
+
+        # --- Etykieta wartości (PL, skróty) ---
+        label = fmt_money_pl_short(v)
+
+        value_fs = 8
+        max_label_width = bar_w + gap * 0.5
+        while text_width(label, FONT_BOLD, value_fs) > max_label_width and value_fs > 6:
+            value_fs -= 1
+
+        val_y = min(by + bh + 12, y + h - 10)
+
+        c.setFillColor(ZUS_BLACK)
+        c.setFont(FONT_BOLD, value_fs)
+        c.drawCentredString(bx + bar_w/2, val_y, label)
+
+        c.setFillColor(ZUS_NAVY)
+        c.setFont(FONT_MAIN, 9)
+        c.drawCentredString(bx + bar_w/2, y + 6, labels[i])
+
+def bullet_line(c: canvas.Canvas, x, y, text, color=ZUS_GREEN):
+    c.setFillColor(color); c.circle(x, y+3, 2.6, fill=1, stroke=0)
+    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 10)
+    c.drawString(x+10, y, text)
+
+# ======== HELPERY do layoutu „annual report” (prawa szpalta + donuty) ========
+
+def draw_right_panel_bg(c: canvas.Canvas, w, h):
+    """Prawa połowa w kolorze ZUS_NAVY."""
+    right_x = int(w * 0.5)
+    c.setFillColor(ZUS_NAVY)
+    c.rect(right_x, 0, w-right_x, h, fill=1, stroke=0)
+    c.setFillColor(ZUS_GREEN)
+    c.rect(right_x, h-2, w-right_x, 2, fill=1, stroke=0)
+
+def donut(c: canvas.Canvas, cx, cy, r_outer, r_inner, segments, labels=None,
+          legend_x=None, legend_y=None, legend_leading=12):
+    """
+    segments = [(fraction_0to1, color, optional_label)]
+    """
+    total = sum(s[0] for s in segments) or 1.0
+    angle0 = 90.0
+    for frac, color_, *_ in segments:
+        sweep = 360.0 * (frac/total)
+        c.setFillColor(color_); c.setStrokeColor(color_)
+        c.wedge(cx-r_outer, cy-r_outer, cx+r_outer, cy+r_outer, angle0, angle0+sweep, stroke=0, fill=1)
+        angle0 += sweep
+    c.setFillColor(colors.white)
+    c.circle(cx, cy, r_inner, fill=1, stroke=0)
+
+    if legend_x is not None and labels:
+        c.setFont(FONT_MAIN, 8)
+        for i, ((frac, color_, *_), lab) in enumerate(zip(segments, labels)):
+            c.setFillColor(color_)
+            c.circle(legend_x, legend_y - i*legend_leading + 3, 3, fill=1, stroke=0)
+            c.setFillColor(colors.white)
+            c.drawString(legend_x + 10, legend_y - i*legend_leading, lab)
+
+def rr_gauge(c: canvas.Canvas, cx: float, cy: float, r_outer: float, r_inner: float,
+             rr_frac: float, title: str = "Stopa zastąpienia"):
+    """
+    Prosty „gauge” w formie pierścienia dla RR.
+    rr_frac: 0.0–1.0 (np. 0.1561 dla 15.61%)
+    """
+    rr = max(0.0, min(1.0, rr_frac))
+
+    c.setFillColor(ZUS_ORANGE)
+    c.wedge(cx - r_outer, cy - r_outer, cx + r_outer, cy + r_outer,
+            90, 90 + 360 * rr, stroke=0, fill=1)
+    c.setFillColor(ZUS_GRAY)
+    c.wedge(cx - r_outer, cy - r_outer, cx + r_outer, cy + r_outer,
+            90 + 360 * rr, 450, stroke=0, fill=1)
+
+    c.setFillColor(colors.white)
+    c.circle(cx, cy, r_inner, fill=1, stroke=0)
+
+    c.setFillColor(colors.white); c.setFont(FONT_BOLD, 18)
+    c.drawString(cx - r_outer, cy + r_outer + 22, title)
+
+    c.setFillColor(colors.white); c.setFont(FONT_BOLD, 20)
+    c.drawCentredString(cx, cy + 2, f"{rr*100:.2f}%")
+
+
+def section_heading(c: canvas.Canvas, text: str, x: float, y: float, light=False):
+    c.setFont(FONT_BOLD, 18)
+    c.setFillColor(colors.white if light else ZUS_NAVY)
+    c.drawString(x, y, text)
+
+STAT_BAR_H = 14
+
+def stat_bar_frame(c: canvas.Canvas, x, y, w, label):
+    """Stała część paska: tło i podpis."""
+    c.setFillColor(ZUS_GRAY); c.rect(x, y, w, STAT_BAR_H, fill=1, stroke=0)
+    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 9)
+    c.drawString(x, y-16, label)
+
+def stat_bar(c: canvas.Canvas, x, y, w, pct, label, bar_color, frame: bool = True):
+    """Pasek postępu w stylu prostych statystyk; `frame=False` — tło i podpis są już na stronie."""
+    if frame:
+        stat_bar_frame(c, x, y, w, label)
+    c.setFillColor(bar_color); c.rect(x, y, w*max(0.0, min(1.0, pct)), STAT_BAR_H, fill=1, stroke=0)
+    c.setFillColor(ZUS_NAVY)
+    c.setFont(FONT_BOLD, 10); c.drawRightString(x+w, y-12, f"{int(max(0,min(100, pct*100)))}%")
+
+def kpi_circle(c: canvas.Canvas, cx, cy, r, title, value, sub=None):
+    c.setFillColor(colors.white); c.circle(cx, cy, r, fill=1, stroke=0)
+    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 9)
+    c.drawCentredString(cx, cy+r+10, title)
+    c.setFont(FONT_BOLD, 16); c.drawCentredString(cx, cy+2, value)
+    if sub:
+        c.setFont(FONT_MAIN, 8); c.setFillColor(ZUS_GRAY); c.drawCentredString(cx, cy-12, sub)
+
+# ======== Raport: stały układ stron (liczony raz na proces) + form XObjects dokumentu ========
+
+STAT_BARS = (
+    ("Utrata z L4 (proc.)", ZUS_ORANGE),
+    ("Progres względem oczekiwań", ZUS_GREEN),
+    ("Twoja nominalna vs średnia", ZUS_BLUE),
+    ("Stopa zastąpienia (RR)", ACCENT_TEAL),
+)
+
+@dataclass(frozen=True)
+class PageLayout:
+    """Współrzędne stałych elementów raportu (A4) — te same dla każdego raportu."""
+    w: float
+    h: float
+    panel_x: float
+    panel_w: float
+    title_y: float
+    kpi_label_y: float
+    kpi_value_y: float
+    kpi_right_x: float
+    col_w: float
+    right_x: float
+    heading_y: float
+    stat_bar_y: tuple
+    compare_y: float
+    lists_y: float
+    chart_w: float
+    chart_h: float
+    chart1_y: float
+    chart1_caption_y: float
+    chart2_y: float
+
+@lru_cache(maxsize=1)
+def page_layout() -> PageLayout:
+    w, h = A4
+    panel_x = MARGIN_X
+    panel_w = w - 2 * MARGIN_X
+    title_y = h - 96
+    kpi_label_y = title_y - 70
+    kpi_value_y = kpi_label_y - 20
+
+    GUTTER = 28
+    HEADING_GAP = 36
+    SECTION_GAP_Y = 16
+    BAR_SPACING = 34
+    col_w = (panel_w - GUTTER) / 2
+    heading_y = kpi_value_y - HEADING_GAP
+
+    # Lewa kolumna: paski pod nagłówkiem; prawa: ramka porównania (65 pt) pod nagłówkiem.
+    first_bar_y = heading_y - (SECTION_GAP_Y + 16)
+    stat_bar_y = tuple(first_bar_y - i * BAR_SPACING for i in range(len(STAT_BARS)))
+    left_end = stat_bar_y[-1] - (BAR_SPACING + 6)
+    cmp_h = 65
+    compare_top = heading_y - (SECTION_GAP_Y + 4)
+    right_end = compare_top - (cmp_h + 24)
+
+    chart_h = 160
+    chart1_caption_y = h - 170
+    chart1_y = chart1_caption_y - (chart_h + 8)
+    return PageLayout(
+        w=w, h=h, panel_x=panel_x, panel_w=panel_w, title_y=title_y,
+        kpi_label_y=kpi_label_y, kpi_value_y=kpi_value_y, kpi_right_x=panel_x + panel_w/2 + 24,
+        col_w=col_w, right_x=panel_x + col_w + GUTTER, heading_y=heading_y,
+        stat_bar_y=stat_bar_y, compare_y=compare_top - cmp_h, lists_y=min(left_end, right_end) - 18,
+        chart_w=panel_w, chart_h=chart_h, chart1_y=chart1_y, chart1_caption_y=chart1_caption_y,
+        chart2_y=chart1_y - 40 - chart_h,
+    )
+
+def _page_forms(c: canvas.Canvas, L: PageLayout, today: dt.date, charts: bool):
+    """
+    Stałe elementy stron jako form XObjects: rysowane raz na dokument, osadzane przez doForm.
+    Definiowane przed treścią, więc znaki stałych tekstów dostają w podzbiorach czcionek te same kody
+    w każdym raporcie (podzbiory z pamięci procesu — _memoize_subsets).
+    """
+    c.beginForm("page1")
+    c.setFillColor(ZUS_NAVY)
+    c.setFont(FONT_BOLD, 30); c.drawString(L.panel_x, L.title_y, "Raport 2025")
+    c.setFont(FONT_BOLD, 22); c.drawString(L.panel_x, L.title_y - 28, "Prognoza Emerytury")
+    c.setFont(FONT_MAIN, 10)
+    c.drawString(L.panel_x, L.kpi_label_y, "Nominalne (m-c)")
+    c.drawString(L.kpi_right_x, L.kpi_label_y, "Realne dziś (m-c)")
+    section_heading(c, "Najważniejsze wskaźniki", L.panel_x, L.heading_y)
+    for (label, _), bar_y in zip(STAT_BARS, L.stat_bar_y):
+        stat_bar_frame(c, L.panel_x, bar_y, L.col_w, label)
+    section_heading(c, "Porównanie ze średnią", L.right_x, L.heading_y)
+    comparison_frame(c, L.right_x, L.compare_y, L.col_w)
+    section_heading(c, "Dane wejściowe", L.panel_x, L.lists_y)
+    section_heading(c, "Założenia i parametry", L.right_x, L.lists_y)
+    c.endForm()
+
+    c.beginForm("page2")
+    c.setFillColor(ZUS_NAVY)
+    c.setFont(FONT_BOLD, 24); c.drawString(L.panel_x, L.h - 96, "Jak rośnie Twoja emerytura")
+    c.setFont(FONT_BOLD, 14); c.drawString(L.panel_x, L.h - 120, "Podstawa (konto+subkonto+waloryzacje) i świadczenie realne")
+    if charts:
+        c.setFont(FONT_BOLD, 12)
+        c.drawString(L.panel_x, L.chart1_caption_y, "Podstawa po waloryzacjach (koniec roku)")
+        c.drawString(L.panel_x, L.chart2_y + L.chart_h + 8, "Prognozowane świadczenie REAL (m-c) – punktowo po latach")
+        c.setFont(FONT_MAIN, 9)
+        c.drawString(L.panel_x, L.chart2_y - 18, "Kwoty w PLN (miesięcznie)")
+    c.endForm()
+
+    c.beginForm("footer")
+    c.setFillColor(ZUS_GRAY); c.rect(0, 0, L.w, 26, fill=1, stroke=0)
+    c.setFillColor(ZUS_NAVY); c.setFont(FONT_MAIN, 9)
+    c.drawRightString(L.w - MARGIN_X, 9, f"Emerytura360 • {today.isoformat()}")
+    c.endForm()
+
+def render_report_pdf(payload, result: dict, timeline: List[dict], assumptions: dict, today: dt.date) -> bytes:
+    """Dwustronicowy raport: KPI i porównania (str. 1), wykresy z timeline (str. 2)."""
+    ensure_fonts()
+    buffer = io.BytesIO()
+    pdf_name = "raport_emerytura.pdf"
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    c.setTitle(pdf_name)
+    L = page_layout()
+    tl = timeline
+    _page_forms(c, L, today, charts=bool(tl))
+    c.doForm("page1")
+
+    c.setFont(FONT_BOLD, 18); c.setFillColor(ZUS_BLACK)
+    c.drawString(L.panel_x, L.kpi_value_y, fmt_money(result['benefit']['actual']))
+    c.drawString(L.kpi_right_x, L.kpi_value_y, fmt_money(result['benefit']['real']))
+
+    # ===== LEWA KOLUMNA: „Najważniejsze wskaźniki” (tło i podpisy pasków w formie page1) =====
+    imp = result.get("sick_leave_impact", {})
+    loss_pct = max(0.0, min(1.0, (imp.get("loss_pct") or 0) / 100.0))
+
+    gs = result.get("goal_seek", {})
+    tgt = float(gs.get("expected") or 0)
+    prog = float(result['benefit']['real'] or 0)
+    pct_goal = 0 if tgt <= 0 else max(0.0, min(1.0, prog / tgt))
+
+    avg_nom = float(result.get("avg_benefit_year") or 0)
+    pct_vs_avg = 0 if avg_nom <= 0 else max(0.0, min(1.0, float(result['benefit']['actual']) / avg_nom))
+
+    rr_pct = max(0.0, min(1.0, (result.get("replacement_rate_percent") or 0) / 100.0))
+    for (label, bar_color), bar_y, pct in zip(STAT_BARS, L.stat_bar_y, (loss_pct, pct_goal, pct_vs_avg, rr_pct)):
+        stat_bar(c, L.panel_x, bar_y, L.col_w, pct, label, bar_color, frame=False)
+
+    # ===== PRAWA KOLUMNA ====
+    comparison_numbers(
+        c,
+        x=L.right_x,
+        y=L.compare_y,
+        w=L.col_w,
+        my_value=float(result["benefit"]["actual"]),
+        avg_value=avg_nom,
+        frame=False,
+    )
+
+    LINE_H = 12
+    c.setFont(FONT_MAIN, 9)
+    c.setFillColor(ZUS_NAVY)
+
+    left_list_y = L.lists_y - 16
+    bullets = [
+        f"Wiek: {payload.age}",
+        f"Płeć: {payload.sex.upper()}",
+        f"Pensja brutto (dziś): {fmt_money(payload.gross_salary)}",
+        f"Lata pracy: {payload.start_year}–{result['retire_year']}",
+        f"Kwartał przyznania: {payload.quarter_award}",
+        f"Uwzględniono L4: {'tak' if payload.include_sick_leave else 'nie'}",
+        f"Konto/Subkonto: {fmt_money((payload.zus_balance.konto if payload.zus_balance else 0.0))} / "
+            f"{fmt_money((payload.zus_balance.subkonto if payload.zus_balance else 0.0))}",
+    ]
+    if payload.expected_pension:
+        expected = float(payload.expected_pension or 0)
+        prognoza_real = float(result["benefit"]["real"] or 0) 
+        gap = max(0.0, round(expected - prognoza_real, 2))
+
+        gs = result.get("goal_seek", {}) or {}
+        if gs.get("enabled"):
+            yn = gs.get("extra_years_needed")
+            years_label = f">{gs.get('max_extra_years', 10)}" if yn is None else str(int(yn))
+        else:
+            years_label = "—"
+
+        bullets.extend([
+            f"Oczekiwana emerytura: {fmt_money(expected)}",
+            f"Oczekiwana vs prognoza: {fmt_money(expected)} vs {fmt_money(prognoza_real)}",
+            f"Brakuje do oczekiwań: {fmt_money(gap)}",
+            f"Lata potrzebne: {years_label}",
+        ])
+
+    for line in bullets:
+        c.drawString(L.panel_x, left_list_y, f"• {line}")
+        left_list_y -= LINE_H
+
+    right_list_y = L.lists_y - 16
+    wg_src = "Mentor (średnia płaca)" if result['assumptions_used']['wage_growth_source']=='mentor_avg_wage' \
+            else "ENV fallback"
+    assumptions_lines = [
+        f"CPI użyte: {fmt_pct((result['assumptions_used']['cpi'] or 0)*100)}",
+        f"Oczek. długość życia: {result['assumptions_used']['life_months']} mies.",
+        f"CAGR płac do przejścia: {fmt_pct((result['assumptions_used']['wage_growth'] or 0)*100)} ({wg_src})",
+        f"Rok przejścia: {result['retire_year']}",
+        f"Średnia emerytura w roku przejścia: {fmt_money(float(result.get('avg_benefit_year') or 0))}",
+        f"RR (dziś): {fmt_pct((result.get('replacement_rate_percent') or 0))}",
+    ]
+    dni_l4 = assumptions.get("absencja_chorobowa", {}).get(payload.sex.upper(), {}).get("dni_rocznie")
+    loss_abs = (result.get("sick_leave_impact", {}) or {}).get("loss_abs")
+    loss_pct = (result.get("sick_leave_impact", {}) or {}).get("loss_pct")
+    if dni_l4 is not None and loss_pct is not None:
+        assumptions_lines.append(
+            f"Absencja: ~{int(dni_l4)} dni/rok; wpływ: {fmt_money(loss_abs)} ({fmt_pct(loss_pct)})"
+        )
+
+    for line in assumptions_lines:
+        c.drawString(L.right_x, right_list_y, f"• {line}")
+        right_list_y -= LINE_H
+
+    c.doForm("footer")
+
+    # --- STRONA 2: Wykresy z /simulate/timeline ---
+    c.showPage()
+    c.doForm("page2")
+
+    if tl:
+        target_points = 8
+        step = max(1, len(tl) // target_points)
+        sample = [tl[i] for i in range(0, len(tl), step)]
+        if sample[-1]["year"] != tl[-1]["year"]:
+            sample.append(tl[-1])
+
+        labels = [str(r["year"]) for r in sample]
+        values_base = [float(r["base_after_indexation"]) for r in sample]
+        values_real = [float(r["benefit_if_retire_in_year"]["real"]) for r in sample]
+
+        draw_simple_bar_chart(
+            c,
+            x=L.panel_x,
+            y=L.chart1_y,
+            w=L.chart_w,
+            h=L.chart_h,
+            labels=labels,
+            values=values_base,
+            colors_fill=[ZUS_BLUE] * len(values_base)
+        )
+        draw_simple_bar_chart(
+            c,
+            x=L.panel_x,
+            y=L.chart2_y,
+            w=L.chart_w,
+            h=L.chart_h,
+            labels=labels,
+            values=values_real,
+            colors_fill=[ZUS_GREEN] * len(values_real)
+        )
+    else:
+        c.setFont(FONT_BOLD, 14); c.setFillColor(ZUS_RED)
+        c.drawString(L.panel_x, L.h - 160, "Brak danych do wykresu timeline.")
+
+    c.doForm("footer")
+
+    c.save()
+    return buffer.getvalue()
@@ -0,0 +1,294 @@
+"""
+Profilowanie pojedynczych requestów na żądanie admina i lista najwolniejszych wywołań.
+
+- `X-Profile: 1` (albo `?profile=1`) + `X-Admin-Key: <ADMIN_KEY>` -> endpoint tego requestu liczy się pod
+  cProfile; odpowiedź dostaje nagłówek `X-Profile-Id`, a profil leży w pamięci procesu
+  (GET /admin/profiles/{id}, tekst albo pstats). Bez ADMIN_KEY profilowanie jest wyłączone.
+- Profiler działa tylko w wątku, w którym wykonuje się endpoint (endpointy asynchroniczne: tylko ich
+  własne kroki w pętli zdarzeń), więc pozostałe requesty nie są spowolnione ani nie trafiają do profilu.
+  Praca oddana do puli wątków lub procesów (np. symulacja i render w /report/pdf) widoczna jest jako oczekiwanie.
+- Najwolniejsze wywołania (SLOW_TOP_N w oknie SLOW_WINDOW_S): endpoint, czas, etapy (metrics) i argumenty.
+"""
+import cProfile
+import heapq
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from fastapi import Header, HTTPException
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from .metrics import current_stages, metrics_public
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+def admin_key() -> str:
+    return os.getenv("ADMIN_KEY", "")
+
+def check_admin_key(key: Optional[str]) -> bool:
+    expected = admin_key()
+    return bool(expected) and key is not None and hmac.compare_digest(key.encode(), expected.encode())
+
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """Zależność FastAPI dla endpointów diagnostycznych: nagłówek X-Admin-Key musi być równy ADMIN_KEY."""
+    if not check_admin_key(x_admin_key):
+        raise HTTPException(status_code=403, detail="Wymagany poprawny X-Admin-Key")
+
+def require_metrics_access(x_admin_key: Optional[str] = Header(None)):
+    """Jak require_admin; przy METRICS_PUBLIC=1 histogramy są dostępne bez klucza."""
+    if not metrics_public():
+        require_admin(x_admin_key)
+
+class _RequestState:
+    __slots__ = ("profiler", "kwargs")
+
+    def __init__(self, profiler: Optional[cProfile.Profile]):
+        self.profiler = profiler
+        self.kwargs: Optional[Dict[str, Any]] = None
+
+_STATE: ContextVar[Optional[_RequestState]] = ContextVar("request_profile", default=None)
+
+def profiling_active() -> bool:
+    """Czy bieżący request jest profilowany (wtedy cache wyników jest pomijany — profil ma pokazać obliczenia)."""
+    state = _STATE.get()
+    return state is not None and state.profiler is not None
+
+# --- Profile ---
+class ProfileStore:
+    """Ostatnie `keep` profili (pstats.Stats) w pamięci procesu."""
+    def __init__(self, keep: int):
+        self.keep = max(1, keep)
+        self._items: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, profile_id: str, profiler: cProfile.Profile, info: Dict):
+        stats = pstats.Stats(profiler)
+        with self._lock:
+            self._items[profile_id] = {**info, "id": profile_id, "stats": stats}
+            while len(self._items) > self.keep:
+                self._items.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._items.get(profile_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [{k: v for k, v in item.items() if k != "stats"} for item in reversed(self._items.values())]
+
+def profile_text(stats: pstats.Stats, sort: str = "cumulative", limit: int = 60) -> str:
+    out = io.StringIO()
+    copy = pstats.Stats(stream=out)  # kopia: sortowanie nie zmienia zapisanego profilu
+    copy.add(stats)
+    copy.sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+def profile_pstats(stats: pstats.Stats) -> bytes:
+    """Ten sam format co pstats.Stats.dump_stats (snakeviz, `python -m pstats plik`)."""
+    return marshal.dumps(stats.stats)
+
+PROFILES = ProfileStore(_env_int("PROFILE_KEEP", 20))
+
+# --- Najwolniejsze wywołania ---
+def _describe(kwargs: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Argumenty endpointu do podglądu: pojedynczy model jako JSON, listy i słowniki (np. kohorty z /simulate/batch)
+    tylko jako liczność — bez trzymania referencji do ciała requestu i bez danych osób z kohorty.
+    """
+    if kwargs is None:
+        return None
+    out = {}
+    for name, value in kwargs.items():
+        if isinstance(value, BaseModel):
+            out[name] = value.model_dump(mode="json")
+        elif isinstance(value, (list, tuple, dict)):
+            out[name] = {"count": len(value)}
+        elif isinstance(value, str):
+            out[name] = value[:200]
+        elif value is None or isinstance(value, (int, float, bool)):
+            out[name] = value
+        else:
+            out[name] = repr(value)[:200]
+    return out
+
+class SlowestRequests:
+    """
+    `n` najwolniejszych requestów z ostatnich `window_s` sekund (kopiec min). Szybka ścieżka bez blokady:
+    request szybszy od najwolniejszego-n-tego (jeszcze nie przeterminowanego) nie jest zapisywany.
+    """
+    def __init__(self, n: int, window_s: float):
+        self.n = n
+        self.window_s = window_s
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def offer(self, seconds: float, info: Callable[[], Dict]):
+        if self.n <= 0:
+            return
+        now = time.time()
+        heap = self._heap
+        if len(heap) >= self.n:
+            try:
+                smallest = heap[0]  # bez blokady: równoległy _prune może właśnie skrócić listę
+            except IndexError:
+                smallest = None
+            if smallest is not None and seconds <= smallest[0] and now - smallest[2]["at"] <= self.window_s:
+                return
+        entry = {**info(), "ms": round(seconds * 1000, 3), "at": now}
+        with self._lock:
+            self._prune(now)
+            item = (seconds, next(self._seq), entry)
+            if len(heap) < self.n:
+                heapq.heappush(heap, item)
+            elif seconds > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+    def _prune(self, now: float):
+        fresh = [item for item in self._heap if now - item[2]["at"] <= self.window_s]
+        if len(fresh) != len(self._heap):
+            heapq.heapify(fresh)
+            self._heap[:] = fresh
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            self._prune(time.time())
+            return [item[2] for item in sorted(self._heap, reverse=True)]
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+
+SLOWEST = SlowestRequests(_env_int("SLOW_TOP_N", 20), float(_env_int("SLOW_WINDOW_S", 3600)))
+
+# --- Endpointy: zapamiętanie argumentów i profilowanie w wątku endpointu ---
+class _ProfiledAwaitable:
+    """Prowadzi korutynę endpointu krok po kroku, z profilerem włączonym tylko na czas jej kroków."""
+    def __init__(self, coro, profiler: cProfile.Profile):
+        self.coro = coro
+        self.profiler = profiler
+
+    def __await__(self):
+        it = self.coro.__await__()
+        value, error = None, None
+        while True:
+            self.profiler.enable()
+            try:
+                step = it.throw(error) if error is not None else it.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.profiler.disable()
+            try:
+                value, error = (yield step), None
+            except BaseException as e:
+                value, error = None, e
+
+def instrument(endpoint: Callable) -> Callable:
+    if iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def run_async(*args, **kwargs):
+            state = _STATE.get()
+            if state is None:
+                return await endpoint(*args, **kwargs)
+            state.kwargs = kwargs
+            if state.profiler is None:
+                return await endpoint(*args, **kwargs)
+            return await _ProfiledAwaitable(endpoint(*args, **kwargs), state.profiler)
+        return run_async
+
+    @wraps(endpoint)
+    def run_sync(*args, **kwargs):
+        state = _STATE.get()
+        if state is None:
+            return endpoint(*args, **kwargs)
+        state.kwargs = kwargs
+        if state.profiler is None:
+            return endpoint(*args, **kwargs)
+        state.profiler.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            state.profiler.disable()
+    return run_sync
+
+class ProfiledRoute(APIRoute):
+    """Klasa tras aplikacji: endpoint opakowany przez `instrument` (ta sama sygnatura dla FastAPI)."""
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, instrument(endpoint), **kwargs)
+
+def _profile_requested(scope) -> tuple[bool, Optional[str]]:
+    flag, key = False, None
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile":
+            flag = value.strip() in (b"1", b"true")
+        elif name == b"x-admin-key":
+            key = value.decode("latin-1")
+    qs = scope.get("query_string", b"")
+    if not flag and b"profile=" in qs:
+        flag = parse_qs(qs.decode("latin-1")).get("profile", [""])[0] in ("1", "true")
+    return flag, key
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI: stan requestu dla `instrument` (argumenty, opcjonalnie profiler), zapis profilu
+    i zgłoszenie czasu do SLOWEST. Prośba o profil bez poprawnego klucza -> 403.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        profile, key = _profile_requested(scope)
+        if profile and not check_admin_key(key):
+            response = JSONResponse({"detail": "Profilowanie wymaga poprawnego X-Admin-Key"}, status_code=403)
+            return await response(scope, receive, send)
+
+        state = _RequestState(cProfile.Profile() if profile else None)
+        token = _STATE.set(state)
+        t0 = time.perf_counter()
+        profile_id = secrets.token_hex(8) if profile else None
+
+        async def send_with_id(message):
+            if profile_id and message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _STATE.reset(token)
+            elapsed = time.perf_counter() - t0
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+
+            def info() -> Dict:
+                return {
+                    "endpoint": endpoint,
+                    "method": scope.get("method", ""),
+                    "stages_ms": {k: round(v * 1000, 3) for k, v in current_stages().items()},
+                    "args": _describe(state.kwargs),
+                }
+
+            if profile_id:
+                PROFILES.put(profile_id, state.profiler, {**info(), "ms": round(elapsed * 1000, 3), "at": time.time()})
+            SLOWEST.offer(elapsed, info)
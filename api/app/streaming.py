@@ -0,0 +1,58 @@
+"""
+Odpowiedzi strumieniowe dla wyników liczonych wiersz po wierszu (timeline, /simulate/batch).
+
+Generatory biorą iterator wierszy prosto z silnika i oddają bajty paczkami: pierwszy wiersz od razu
+(klient dostaje początek, zanim policzy się reszta), dalej co STREAM_CHUNK_ROWS wierszy. W pamięci
+jest tylko bieżąca paczka, nie cały wynik.
+"""
+import csv
+import io
+import json
+import os
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+try:
+    STREAM_CHUNK_ROWS = max(1, int(os.getenv("STREAM_CHUNK_ROWS", "256")))
+except Exception:
+    STREAM_CHUNK_ROWS = 256
+
+NDJSON_MEDIA = "application/x-ndjson"
+CSV_MEDIA = "text/csv; charset=utf-8"
+
+def _chunked(lines: Iterable[str], chunk_rows: int) -> Iterator[bytes]:
+    buf = []
+    first = True
+    for line in lines:
+        buf.append(line)
+        if first or len(buf) >= chunk_rows:
+            yield "".join(buf).encode("utf-8")
+            buf.clear()
+            first = False
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+def iter_ndjson(rows: Iterable[Any], chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[bytes]:
+    """NDJSON: jeden obiekt JSON na linię."""
+    return _chunked((json.dumps(row, ensure_ascii=False) + "\n" for row in rows), chunk_rows)
+
+def iter_csv_rows(header: Sequence[str], rows: Iterable[Any], cells: Callable[[Any], Sequence] = tuple,
+                  chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[bytes]:
+    """CSV z nagłówkiem; `cells` zamienia wiersz silnika na listę komórek."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+
+    def line(values) -> str:
+        w.writerow(values)
+        out = buf.getvalue()
+        buf.seek(0); buf.truncate()
+        return out
+
+    def lines() -> Iterator[str]:
+        head = line(header)  # nagłówek idzie razem z pierwszym wierszem
+        for row in rows:
+            yield head + line(cells(row))
+            head = ""
+        if head:
+            yield head
+
+    return _chunked(lines(), chunk_rows)
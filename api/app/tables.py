@@ -0,0 +1,350 @@
+"""
+Tabele wejściowe (parametry_mentor.xlsx, avg_benefit.xlsx, założenia JSON) i ich skompilowany snapshot binarny.
+
+Arkusze są czytane strumieniowo (openpyxl read_only), a wynik zapisywany jako kolumny typowane
+(`array`: lata int32, wartości float64 z NaN = brak) z nagłówkiem JSON i skrótem treści.
+Przy starcie/reloadzie wystarczy odczytać snapshot; XLSX jest parsowany ponownie tylko wtedy,
+gdy zmienił się plik źródłowy (rozmiar/mtime, a przy niezgodności — skrót SHA-256).
+
+Snapshot jest mapowany w pamięci (mmap, tylko do odczytu), więc wszystkie workery na węźle
+czytają te same strony z page cache. Obok leży licznik generacji (`tables.snapshot.gen`,
+8 bajtów, też mmap): worker, który przekompilował tabele, podbija go, a pozostałe workery
+widzą zmianę przy najbliższym requeście i wczytują nowy snapshot bez parsowania XLSX.
+
+Ręczna kompilacja: `python -m api.app.tables`.
+"""
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+SNAPSHOT_MAGIC = b"E360TBL1"
+SNAPSHOT_FORMAT = 2
+
+PARAM_FIELDS = ["cpi_index", "real_wage_index", "avg_wage", "wal_konto", "wal_sub"]
+
+BASE = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE / "data"
+PARAMS_XLSX = DATA_DIR / "parametry_mentor.xlsx"
+AVG_XLSX = DATA_DIR / "avg_benefit.xlsx"
+A_JSON = DATA_DIR / "assumptions_from_parametry.json"
+SNAPSHOT_PATH = BASE / "storage" / "tables.snapshot"
+
+# --- Parsowanie XLSX (strumieniowo) ---
+def _norm(s) -> str:
+    return str(s or "").replace("\xa0", " ").strip().lower()
+
+def _find_col(headers: Dict[str, int], *fragments: str) -> Optional[int]:
+    for name, idx in headers.items():
+        n = _norm(name)
+        if all(_norm(frag) in n for frag in fragments):
+            return idx
+    return None
+
+def _to_float(v) -> Optional[float]:
+    try:
+        s = str(v).replace(" ", "").replace("\xa0", "").replace(",", ".")
+        return float(s)
+    except Exception:
+        return None
+
+def _rows(path: Path):
+    import openpyxl  # tylko przy kompilacji snapshotu
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def _cell(row: tuple, col: Optional[int]):
+    return row[col] if col is not None and col < len(row) else None
+
+def parse_params_xlsx(path: Path) -> Dict[int, dict]:
+    """
+    Arkusz mentorów (aktywny arkusz). Oczekiwane kolumny (wystarczy fragment nazwy):
+    - 'rok'
+    - 'wskaźnik cen towarów i usług' (CPI, np. 1.0360)
+    - 'realnego wzrostu przeciętn' (real wage index, np. 1.0202)
+    - 'przeciętne miesięczne wynagrodzenie'
+    - 'waloryzacji składek ... na koncie'
+    - 'waloryzacji składek ... na subkoncie'
+    """
+    params: Dict[int, dict] = {}
+    if not path.exists():
+        return params
+    try:
+        rows = _rows(path)
+        header = next(rows, ())
+        headers = {(name or ""): i for i, name in enumerate(header)}
+
+        c_year = _find_col(headers, "rok")
+        c_cpi  = _find_col(headers, "wskaźnik cen towarów i usług")
+        c_rw   = _find_col(headers, "realnego wzrostu przeciętn")
+        c_avg  = _find_col(headers, "przeciętne miesięczne wynagrodzenie")
+        c_wk   = _find_col(headers, "waloryzacji", "na koncie")
+        c_ws   = _find_col(headers, "waloryzacji", "na subkoncie")
+
+        for row in rows:
+            y_raw = _cell(row, c_year)
+            if not y_raw:
+                continue
+            try:
+                y = int(str(y_raw).split(".")[0])
+            except Exception:
+                continue
+            params[y] = {
+                "cpi_index": _to_float(_cell(row, c_cpi)) if c_cpi is not None else None,
+                "real_wage_index": _to_float(_cell(row, c_rw)) if c_rw is not None else None,
+                "avg_wage": _to_float(_cell(row, c_avg)) if c_avg is not None else None,
+                "wal_konto": _to_float(_cell(row, c_wk)) if c_wk is not None else None,
+                "wal_sub": _to_float(_cell(row, c_ws)) if c_ws is not None else None,
+            }
+    except Exception:
+        pass
+    return params
+
+def parse_avg_xlsx(path: Path) -> Dict[int, float]:
+    """Średnie emerytury: kolumny 'rok', 'kwota' (w PLN/m-c); bez nagłówków — dwie pierwsze kolumny."""
+    avg: Dict[int, float] = {}
+    if not path.exists():
+        return avg
+    try:
+        rows = _rows(path)
+        header = next(rows, ())
+        headers = {str(name or "").strip().lower(): i for i, name in enumerate(header)}
+        c_year = headers.get("rok")
+        c_val = headers.get("kwota")
+        if c_year is None or c_val is None:
+            c_year, c_val = 0, 1
+        for row in rows:
+            try:
+                y = int(str(_cell(row, c_year)).split(".")[0])
+                v = float(str(_cell(row, c_val)).replace(" ", "").replace("\xa0", "").replace(",", "."))
+                if 1990 <= y <= 2100 and v > 0:
+                    avg[y] = v
+            except Exception:
+                continue
+    except Exception:
+        pass
+    return avg
+
+# --- Snapshot binarny ---
+Column = Union[array, memoryview]
+
+def _fingerprint(path: Path, with_hash: bool = True) -> dict:
+    if not path.exists():
+        return {"exists": False}
+    st = path.stat()
+    fp = {"exists": True, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if with_hash:
+        fp["sha256"] = hashlib.sha256(path.read_bytes()).hexdigest()
+    return fp
+
+def _columns(params: Dict[int, dict], avg: Dict[int, float]) -> Dict[str, array]:
+    cols = {"params.year": array("i", params.keys())}
+    for f in PARAM_FIELDS:
+        cols[f"params.{f}"] = array("d", (math.nan if r.get(f) is None else r[f] for r in params.values()))
+    cols["avg.year"] = array("i", avg.keys())
+    cols["avg.value"] = array("d", avg.values())
+    return cols
+
+def _pad8(n: int) -> int:
+    return -n % 8
+
+def write_snapshot(path: Path, params: Dict[int, dict], avg: Dict[int, float], sources: Dict[str, dict],
+                   assumptions: Optional[dict] = None, generation: int = 0) -> str:
+    """
+    Zapisuje snapshot atomowo (plik tymczasowy + os.replace). Zwraca skrót treści.
+    Kolumny są wyrównane do 8 bajtów, żeby dało się je zmapować bez kopiowania (memoryview.cast).
+    """
+    cols = _columns(params, avg)
+    blobs = {name: col.tobytes() for name, col in cols.items()}
+    a_blob = json.dumps(assumptions or {}, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    content = hashlib.sha256(
+        b"".join(name.encode() + b"\x00" + b for name, b in blobs.items()) + b"assumptions\x00" + a_blob
+    ).hexdigest()
+    layout, offset = [], 0
+    for name, col in cols.items():
+        layout.append({"name": name, "type": col.typecode, "count": len(col), "offset": offset})
+        offset += len(blobs[name]) + _pad8(len(blobs[name]))
+    header = json.dumps({"format": SNAPSHOT_FORMAT, "content_hash": content, "generation": generation,
+                         "sources": sources, "assumptions": assumptions or {}, "columns": layout},
+                        ensure_ascii=False).encode("utf-8")
+    header += b" " * _pad8(12 + len(header))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for name in cols:
+            f.write(blobs[name])
+            f.write(b"\x00" * _pad8(len(blobs[name])))
+    os.replace(tmp, path)
+    return content
+
+def read_snapshot(path: Path) -> Optional[Tuple[dict, Dict[str, Column]]]:
+    """
+    (nagłówek, kolumny) albo None, gdy pliku brak lub jest niezgodny/uszkodzony.
+    Kolumny to widoki memoryview na plik zmapowany w pamięci — bez kopiowania; mapowanie żyje,
+    dopóki żyją widoki (podmiana pliku przez os.replace nie narusza już zmapowanej wersji).
+    """
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:8] != SNAPSHOT_MAGIC:
+            return None
+        (hlen,) = struct.unpack_from("<I", mm, 8)
+        header = json.loads(mm[12:12 + hlen])
+        if header.get("format") != SNAPSHOT_FORMAT:
+            return None
+        data = memoryview(mm)[12 + hlen:]
+        cols: Dict[str, Column] = {}
+        for c in header["columns"]:
+            size = array(c["type"]).itemsize
+            cols[c["name"]] = data[c["offset"]:c["offset"] + c["count"] * size].cast(c["type"])
+        return header, cols
+    except Exception:
+        return None
+
+def _tables_from_columns(cols: Dict[str, Column]) -> Tuple[Dict[int, dict], Dict[int, float]]:
+    params: Dict[int, dict] = {}
+    field_cols = [(f, cols[f"params.{f}"]) for f in PARAM_FIELDS]
+    for i, y in enumerate(cols["params.year"]):
+        params[y] = {f: (None if math.isnan(col[i]) else col[i]) for f, col in field_cols}
+    avg = dict(zip(cols["avg.year"], cols["avg.value"]))
+    return params, avg
+
+def _sources_match(recorded: dict, paths: Dict[str, Path]) -> Optional[dict]:
+    """
+    Aktualne odciski plików, jeśli treść źródeł się nie zmieniła (szybko: rozmiar+mtime;
+    przy różnicy — porównanie SHA-256). None = trzeba przekompilować.
+    """
+    current = {}
+    for name, p in paths.items():
+        rec = recorded.get(name) or {}
+        fp = _fingerprint(p, with_hash=False)
+        if not fp["exists"] or not rec.get("exists"):
+            if fp["exists"] != rec.get("exists", False):
+                return None
+            current[name] = fp
+            continue
+        if fp["size"] == rec.get("size") and fp["mtime_ns"] == rec.get("mtime_ns"):
+            current[name] = {**fp, "sha256": rec.get("sha256")}
+            continue
+        fp = _fingerprint(p)
+        if fp["sha256"] != rec.get("sha256"):
+            return None
+        current[name] = fp
+    return current
+
+def _read_json(path: Path) -> dict:
+    """Brak pliku = puste założenia; uszkodzony JSON to błąd (reload zostawia wtedy poprzedni snapshot)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+# --- Licznik generacji (współdzielony przez workery) ---
+class GenerationCounter:
+    """
+    Numer ostatnio opublikowanej generacji snapshotu — u64 w 8-bajtowym pliku zmapowanym
+    MAP_SHARED, więc zapis jednego procesu jest od razu widoczny w pozostałych (bez syscalli przy odczycie).
+    Gdy pliku nie da się utworzyć (np. read-only FS), get() zwraca 0, a publish() nic nie robi.
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._mm: Optional[mmap.mmap] = None
+
+    def _map(self) -> Optional[mmap.mmap]:
+        if self._mm is None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    if os.fstat(fd).st_size < 8:
+                        os.ftruncate(fd, 8)
+                    self._mm = mmap.mmap(fd, 8)
+                finally:
+                    os.close(fd)
+            except OSError:
+                return None
+        return self._mm
+
+    def get(self) -> int:
+        mm = self._map()
+        return struct.unpack_from("<Q", mm, 0)[0] if mm is not None else 0
+
+    def publish(self, generation: int):
+        mm = self._map()
+        if mm is not None:
+            struct.pack_into("<Q", mm, 0, generation)
+
+_COUNTERS: Dict[Path, GenerationCounter] = {}
+
+def generation_counter(snapshot_path: Path = SNAPSHOT_PATH) -> GenerationCounter:
+    """Licznik generacji dla danego snapshotu (jeden obiekt/mapowanie na proces)."""
+    path = Path(snapshot_path).with_name(Path(snapshot_path).name + ".gen")
+    counter = _COUNTERS.get(path)
+    if counter is None:
+        counter = _COUNTERS.setdefault(path, GenerationCounter(path))
+    return counter
+
+def load_tables(params_path: Path = PARAMS_XLSX, avg_path: Path = AVG_XLSX, snapshot_path: Path = SNAPSHOT_PATH,
+                assumptions_path: Path = A_JSON) -> Tuple[Dict[int, dict], Dict[int, float], dict, dict]:
+    """
+    Tabele PARAMS, AVG_TABLE i założenia ze snapshotu (przebudowywanego automatycznie, gdy zmieniły się źródła).
+    Zwraca (params, avg, assumptions, info) — info: źródło ('snapshot'/'xlsx'), skrót treści,
+    generacja, czas w ms. Po przebudowie publikuje nową generację dla pozostałych workerów.
+    """
+    t0 = time.perf_counter()
+    snapshot_path = Path(snapshot_path)
+    counter = generation_counter(snapshot_path)
+    paths = {"params": Path(params_path), "avg": Path(avg_path), "assumptions": Path(assumptions_path)}
+    snap = read_snapshot(snapshot_path)
+    if snap is not None:
+        header, cols = snap
+        current = _sources_match(header.get("sources", {}), paths)
+        if current is not None:
+            params, avg = _tables_from_columns(cols)
+            assumptions = header.get("assumptions", {})
+            generation = header.get("generation", 0)
+            if current != header.get("sources"):
+                # Ta sama treść, inny mtime (np. checkout) — odśwież tylko odciski (ta sama generacja).
+                try:
+                    write_snapshot(snapshot_path, params, avg, current, assumptions, generation)
+                except OSError:
+                    pass
+            if counter.get() < generation:
+                counter.publish(generation)
+            return params, avg, assumptions, {
+                "source": "snapshot", "content_hash": header["content_hash"], "generation": generation,
+                "ms": round((time.perf_counter() - t0) * 1000, 2),
+            }
+
+    params = parse_params_xlsx(paths["params"])
+    avg = parse_avg_xlsx(paths["avg"])
+    assumptions = _read_json(paths["assumptions"])
+    sources = {name: _fingerprint(p) for name, p in paths.items()}
+    generation = max(counter.get(), snap[0].get("generation", 0) if snap else 0) + 1
+    try:
+        content = write_snapshot(snapshot_path, params, avg, sources, assumptions, generation)
+        counter.publish(generation)
+    except OSError:
+        content = None
+    return params, avg, assumptions, {
+        "source": "xlsx", "content_hash": content, "generation": generation,
+        "ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
+
+if __name__ == "__main__":
+    SNAPSHOT_PATH.unlink(missing_ok=True)
+    p, a, _, info = load_tables()
+    print(f"{SNAPSHOT_PATH}: {len(p)} lat parametrów, {len(a)} lat średnich, {info}")
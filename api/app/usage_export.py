@@ -0,0 +1,68 @@
+"""
+Strumieniowy eksport logów użycia (XLSX / CSV / CSV.gz) w stałej pamięci.
+
+Wiersze przychodzą z kursora SQLite paczkami; CSV jest kodowany i kompresowany kawałkami,
+a XLSX budowany skoroszytem write-only w pliku tymczasowym (w puli procesów) i wysyłany blokami.
+"""
+import csv
+import io
+import zlib
+from typing import IO, Iterable, Iterator
+
+EXPORT_HEADERS = ["Data użycia","Godzina użycia","Emerytura oczekiwana","Wiek","Płeć","Wynagrodzenie",
+                  "Czy uwzględniał okresy choroby","Środki konto","Środki subkonto",
+                  "Emerytura rzeczywista","Emerytura urealniona","Kod pocztowy"]
+
+CHUNK_ROWS = 1000
+CHUNK_BYTES = 64 * 1024
+
+def _cells(row: Iterable) -> list:
+    return ["" if v is None else v for v in row]
+
+def iter_csv(rows: Iterable[tuple], gzip: bool = False) -> Iterator[bytes]:
+    """CSV (UTF-8 z BOM, żeby Excel poprawnie czytał polskie znaki) w kawałkach po CHUNK_ROWS wierszy."""
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None  # wbits=31 -> format gzip
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(EXPORT_HEADERS)
+    n = 0
+
+    def take() -> bytes:
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0); buf.truncate()
+        return comp.compress(data) if comp else data
+
+    yield b"\xef\xbb\xbf" if comp is None else comp.compress(b"\xef\xbb\xbf")
+    for row in rows:
+        w.writerow(_cells(row))
+        n += 1
+        if n % CHUNK_ROWS == 0:
+            chunk = take()
+            if chunk:
+                yield chunk
+    chunk = take()
+    if comp:
+        chunk += comp.flush()
+    if chunk:
+        yield chunk
+
+def write_xlsx_to(rows: Iterable[tuple], f: IO[bytes]):
+    """Skoroszyt write-only (wiersze nie są trzymane w pamięci) zapisany do pliku `f`."""
+    import openpyxl  # leniwie — workery bez eksportu nie importują openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Użycia")
+    ws.append(EXPORT_HEADERS)
+    for row in rows:
+        ws.append(_cells(row))
+    wb.save(f)
+
+def iter_file(f: IO[bytes]) -> Iterator[bytes]:
+    """Wysyła plik blokami i zamyka go po zakończeniu."""
+    try:
+        while True:
+            chunk = f.read(CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
@@ -0,0 +1,151 @@
+"""
+Buforowany, nieblokujący zapis logów użycia do magazynu SQLite (storage/usage.sqlite3).
+
+Requesty tylko wrzucają wiersz do kolejki w pamięci; osobny wątek zapisuje paczki
+(po BATCH_SIZE wierszy albo co FLUSH_INTERVAL s) jedną transakcją. SQLite w trybie WAL
+serializuje zapisy, więc kilka workerów uvicorna może bezpiecznie logować do tej samej bazy.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from .usage_store import UsageStore
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+_STOP = object()
+_FLUSH = object()
+
+class UsageLogger:
+    def __init__(self, store: UsageStore, batch_size: int = 200, flush_interval: float = 2.0,
+                 max_queue: int = 100_000):
+        self.store = store
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.05, flush_interval)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self._flushed = threading.Condition()
+        self._pending = 0
+        self.dropped = 0
+
+    # --- API dla requestów ---
+    def submit(self, row: list):
+        """Dodaje wiersz do kolejki (nie czeka na dysk). Przy pełnej kolejce wiersz jest pomijany."""
+        self._ensure_thread()
+        try:
+            with self._flushed:
+                self._pending += 1
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._flushed:
+                self._pending -= 1
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wymusza zapis zaległych wierszy i czeka na niego (np. przed eksportem)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._drain_sync()
+            return True
+        self._queue.put(_FLUSH)
+        with self._flushed:
+            return self._flushed.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def close(self):
+        """Czysty flush przy zamykaniu procesu."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=10.0)
+        self._drain_sync()
+
+    def clear(self):
+        self.flush()
+        self.store.clear()
+
+    def _write_rows(self, rows: List[list]):
+        if rows:
+            self.store.insert_many(rows)
+
+    # --- Wątek w tle ---
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="usage-log-writer", daemon=True)
+            self._thread.start()
+
+    def _done(self, n: int):
+        with self._flushed:
+            self._pending -= n
+            self._flushed.notify_all()
+
+    def _run(self):
+        batch: List[list] = []
+        deadline = 0.0
+        while True:
+            stop = flush = False
+            timeout = max(0.0, deadline - time.monotonic()) if batch else self.flush_interval
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is _STOP:
+                    stop = True
+                elif item is _FLUSH:
+                    flush = True
+                else:
+                    if not batch:
+                        deadline = time.monotonic() + self.flush_interval
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            if batch and (stop or flush or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                try:
+                    self._write_rows(batch)
+                except Exception:
+                    pass
+                self._done(len(batch))
+                batch = []
+            if stop:
+                return
+
+    def _drain_sync(self):
+        rows: List[list] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, list):
+                rows.append(item)
+        if rows:
+            try:
+                self._write_rows(rows)
+            finally:
+                self._done(len(rows))
+
+def create_logger(store: UsageStore) -> UsageLogger:
+    """Logger z ustawieniami z ENV (USAGE_LOG_BATCH, USAGE_LOG_FLUSH_S)."""
+    logger = UsageLogger(
+        store,
+        batch_size=_env_int("USAGE_LOG_BATCH", 200),
+        flush_interval=_env_float("USAGE_LOG_FLUSH_S", 2.0),
+    )
+    atexit.register(logger.close)
+    return logger
@@ -0,0 +1,172 @@
+"""
+Magazyn logów użycia w SQLite (tryb WAL) z indeksami po dacie, płci, wieku i kodzie pocztowym.
+Zapytania i eksporty po zakresie dat korzystają z indeksu zamiast czytać cały log.
+"""
+import csv
+import datetime as dt
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+USAGE_COLUMNS = [
+    "date","time","expected_pension","age","sex","salary",
+    "included_sick_leave","konto","subkonto",
+    "benefit_actual","benefit_real","postal_code"
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    expected_pension REAL,
+    age INTEGER,
+    sex TEXT,
+    salary REAL,
+    included_sick_leave TEXT,
+    konto REAL,
+    subkonto REAL,
+    benefit_actual REAL,
+    benefit_real REAL,
+    postal_code TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_usage_date ON usage(date, time);
+CREATE INDEX IF NOT EXISTS ix_usage_sex ON usage(sex, date);
+CREATE INDEX IF NOT EXISTS ix_usage_age ON usage(age, date);
+CREATE INDEX IF NOT EXISTS ix_usage_postal ON usage(postal_code, date);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    imported_at TEXT NOT NULL
+);
+"""
+
+def _num(v) -> Optional[float]:
+    if v is None or v == "":
+        return None
+    try:
+        return float(str(v).replace(" ", "").replace("\xa0", "").replace(",", "."))
+    except Exception:
+        return None
+
+def _int(v) -> Optional[int]:
+    f = _num(v)
+    return None if f is None else int(f)
+
+def _row_values(row: list) -> tuple:
+    """Wiersz w kolejności USAGE_COLUMNS -> wartości do INSERT (puste = NULL)."""
+    (date, time, expected, age, sex, salary, sick, konto, subkonto, actual, real, postal) = row
+    return (str(date), str(time), _num(expected), _int(age), (sex or None), _num(salary), (sick or None),
+            _num(konto), _num(subkonto), _num(actual), _num(real), (postal or None))
+
+class UsageStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as con:
+            con.executescript(_SCHEMA)
+
+    def _open(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    def _conn(self) -> sqlite3.Connection:
+        """Osobne połączenie na wątek; WAL pozwala czytać w trakcie zapisu z innych workerów."""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._open()
+            self._local.con = con
+        return con
+
+    def insert_many(self, rows: Iterable[list]):
+        with self._conn() as con:
+            con.executemany(
+                f"INSERT INTO usage ({', '.join(USAGE_COLUMNS)}) VALUES ({', '.join('?' * len(USAGE_COLUMNS))})",
+                (_row_values(r) for r in rows),
+            )
+
+    @staticmethod
+    def _where(date_from: Optional[str], date_to: Optional[str], sex: Optional[str] = None,
+               age_min: Optional[int] = None, age_max: Optional[int] = None,
+               postal_code: Optional[str] = None) -> tuple[str, list]:
+        clauses: List[str] = []
+        args: list = []
+        if date_from:
+            clauses.append("date >= ?"); args.append(date_from)
+        if date_to:
+            clauses.append("date <= ?"); args.append(date_to)
+        if sex:
+            clauses.append("sex = ?"); args.append(sex.upper())
+        if age_min is not None:
+            clauses.append("age >= ?"); args.append(age_min)
+        if age_max is not None:
+            clauses.append("age <= ?"); args.append(age_max)
+        if postal_code:
+            clauses.append("postal_code = ?"); args.append(postal_code)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def query(self, date_from: Optional[str] = None, date_to: Optional[str] = None, **filters) -> Iterator[tuple]:
+        """
+        Wiersze (kolejność USAGE_COLUMNS) po dacie/godzinie; strumieniowo z kursora.
+        Własne połączenie, bo generator może być konsumowany z różnych wątków (StreamingResponse).
+        """
+        where, args = self._where(date_from, date_to, **filters)
+        con = self._open()
+        try:
+            cur = con.execute(
+                f"SELECT {', '.join(USAGE_COLUMNS)} FROM usage{where} ORDER BY date, time, id", args
+            )
+            while True:
+                rows = cur.fetchmany(1000)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            con.close()
+
+    def count(self, date_from: Optional[str] = None, date_to: Optional[str] = None, **filters) -> int:
+        where, args = self._where(date_from, date_to, **filters)
+        return self._conn().execute(f"SELECT COUNT(*) FROM usage{where}", args).fetchone()[0]
+
+    def clear(self):
+        with self._conn() as con:
+            con.execute("DELETE FROM usage")
+
+    def import_csv(self, path: Path) -> int:
+        """
+        Jednorazowy import starego pliku usage.csv (nagłówek jak USAGE_COLUMNS).
+        Zaimportowane pliki są zapamiętywane w tabeli `imports`, więc ponowne wywołanie nic nie robi.
+        Plik jest zajmowany wpisem w `imports` w tej samej transakcji co import wierszy — przy kilku
+        workerach startujących naraz importuje go dokładnie jeden, pozostałe dostają 0.
+        """
+        path = Path(path)
+        if not path.exists():
+            return 0
+        source = str(path.resolve())
+        with path.open("r", newline="", encoding="utf-8") as f:
+            rows = [[r.get(c, "") for c in USAGE_COLUMNS] for r in csv.DictReader(f)]
+        with self._conn() as con:
+            claimed = con.execute(
+                "INSERT OR IGNORE INTO imports (source, rows, imported_at) VALUES (?, ?, ?)",
+                (source, len(rows), dt.datetime.now().isoformat(timespec="seconds")),
+            ).rowcount
+            if not claimed:
+                return 0
+            con.executemany(
+                f"INSERT INTO usage ({', '.join(USAGE_COLUMNS)}) VALUES ({', '.join('?' * len(USAGE_COLUMNS))})",
+                (_row_values(r) for r in rows),
+            )
+        return len(rows)
+
+def import_legacy_csv(store: UsageStore, csv_path: Path) -> int:
+    """Import starych logów: rotowane usage.csv.N (od najstarszego) i bieżący usage.csv — każdy plik raz."""
+    csv_path = Path(csv_path)
+    rotated = sorted(
+        (p for p in csv_path.parent.glob(csv_path.name + ".*") if p.suffix[1:].isdigit()),
+        key=lambda p: int(p.suffix[1:]), reverse=True,
+    )
+    return sum(store.import_csv(p) for p in (*rotated, csv_path))
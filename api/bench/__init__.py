@@ -0,0 +1 @@
+"""Benchmarki silnika obliczeń i endpointów API (uruchamianie: `python -m api.bench --help`)."""
@@ -0,0 +1,247 @@
+"""
+Benchmark silnika i endpointów: `python -m api.bench [--target inproc|spawn|http://host:port] ...`
+
+- inproc: aplikacja w tym procesie (TestClient — pełny stos ASGI bez sieci),
+- spawn:  lokalny uvicorn uruchomiony na wolnym porcie (i zatrzymany po pomiarach),
+- URL:    działający serwer (eksport mierzony na jego bieżącym logu, bez zasiewu).
+
+Przy inproc/spawn logi użycia idą do tymczasowej bazy (ENV USAGE_DB), więc pomiary nie brudzą
+`api/storage/usage.sqlite3`. Wynik: JSON z p50/p95/średnią [ms] per benchmark; z `--baseline`
+porównanie p50 i lista regresji powyżej `--threshold` (kod wyjścia 1, gdy są regresje).
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .workload import sim_payloads, usage_rows
+
+ROOT = Path(__file__).resolve().parents[2]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+NOISE_FLOOR_MS = 0.05  # różnice p50 poniżej tej wartości nie są traktowane jako regresja
+
+ENDPOINTS = {
+    "simulate": "/simulate",
+    "simulate_timeline": "/simulate/timeline",
+    "simulate_what_if": "/simulate/what-if",
+    "simulate_explain": "/simulate/explain",
+    "report_pdf": "/report/pdf",
+}
+
+def _stats(samples: List[float], errors: int = 0) -> Dict:
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "n": len(ms),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(ms[len(ms) // 2], 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "min_ms": round(ms[0], 3),
+    }
+
+def _measure(call: Callable, items: Iterable, warmup: int = 3) -> Dict:
+    """Czas każdego wywołania `call(item)`; pierwsze `warmup` elementów bez pomiaru. call zwraca False przy błędzie."""
+    samples, errors = [], 0
+    for i, item in enumerate(items):
+        t0 = time.perf_counter()
+        ok = call(item)
+        elapsed = time.perf_counter() - t0
+        if i < warmup:
+            continue
+        samples.append(elapsed)
+        errors += ok is False
+    return _stats(samples, errors)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@contextmanager
+def _client(target: str, db_path: Optional[Path]):
+    """Klient HTTP (httpx.Client albo TestClient) dla wybranego celu."""
+    if target == "inproc":
+        os.environ["USAGE_DB"] = str(db_path)
+        from fastapi.testclient import TestClient
+        from api.app.main import app
+        with TestClient(app) as client:
+            yield client
+        return
+
+    import httpx
+    if target != "spawn":
+        with httpx.Client(base_url=target, timeout=120) as client:
+            yield client
+        return
+
+    port = _free_port()
+    env = {**os.environ, "USAGE_DB": str(db_path)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if client.get("/ready").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise RuntimeError("uvicorn nie wystartował")
+                time.sleep(0.2)
+            yield client
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+def bench_waloryzuj_rocznie(n: int, seed: int) -> Dict:
+    """Czysta funkcja silnika (w tym procesie): waloryzacja roczna słownika składek o długości 1–50 lat."""
+    from api.app.calculations.engine import waloryzuj_rocznie
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(n):
+        start = rng.randint(1980, 2040)
+        cases.append({y: rng.uniform(5_000, 40_000) for y in range(start, start + rng.randint(1, 50))})
+    return _measure(waloryzuj_rocznie, cases)
+
+def bench_endpoints(client, payloads: List[Dict], n: int, n_heavy: int,
+                    wanted: Callable[[str], bool] = lambda name: True) -> Dict[str, Dict]:
+    out = {}
+    for name, path in ENDPOINTS.items():
+        if not wanted(name):
+            continue
+        count = n_heavy if name == "report_pdf" else n
+        # Osobne payloady na benchmark: trafienia w cache (/simulate, PDF) nie zaniżają wyników.
+        offset = list(ENDPOINTS).index(name) * n
+        items = payloads[offset:offset + count]
+        out[name] = _measure(lambda p, path=path: client.post(path, json=p).status_code == 200, items)
+    return out
+
+def bench_export(client, db_path: Optional[Path], sizes: List[int], repeat: int, seed: int) -> Dict[str, Dict]:
+    """Eksport logów (xlsx, csv) przy różnych rozmiarach logu — baza zasiewana od zera dla każdego rozmiaru."""
+    out = {}
+    labels = sizes if db_path is not None else ["current"]
+    for size in labels:
+        if db_path is not None:
+            from api.app.usage_store import UsageStore
+            store = UsageStore(db_path)
+            store.clear()
+            store.insert_many(usage_rows(size, seed=seed))
+        for fmt in ("xlsx", "csv"):
+            call = lambda _, fmt=fmt: client.get("/admin/export-xls", params={"format": fmt}).status_code == 200
+            out[f"export_xls.{fmt}@{size}"] = _measure(call, range(repeat + 1), warmup=1)
+    return out
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[Dict]:
+    """Porównanie p50 z baseline; zwraca wiersze z flagą `regression` (wzrost > threshold i > NOISE_FLOOR_MS)."""
+    rows = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = cur["p50_ms"] / base["p50_ms"] if base["p50_ms"] else float("inf")
+        rows.append({
+            "name": name,
+            "baseline_p50_ms": base["p50_ms"],
+            "p50_ms": cur["p50_ms"],
+            "change_pct": round((ratio - 1.0) * 100, 1),
+            "regression": ratio > 1.0 + threshold and cur["p50_ms"] - base["p50_ms"] > NOISE_FLOOR_MS,
+        })
+    return rows
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m api.bench", description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--target", default="inproc", help="inproc | spawn | http://host:port")
+    ap.add_argument("--n", type=int, default=200, help="wywołania na benchmark obliczeń")
+    ap.add_argument("--n-heavy", type=int, default=20, help="wywołania /report/pdf")
+    ap.add_argument("--log-sizes", default="1000,10000", help="rozmiary logu dla eksportu (po przecinku)")
+    ap.add_argument("--export-repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=2024)
+    ap.add_argument("--only", default="", help="tylko benchmarki o nazwach zaczynających się od (po przecinku)")
+    ap.add_argument("--out", type=Path, default=RESULTS_DIR / "latest.json")
+    ap.add_argument("--baseline", type=Path, default=RESULTS_DIR / "baseline.json")
+    ap.add_argument("--threshold", type=float, default=0.15, help="próg regresji p50 (0.15 = +15%%)")
+    ap.add_argument("--save-baseline", action="store_true", help="zapisz wynik także jako baseline")
+    args = ap.parse_args(argv)
+    if args.target not in ("inproc", "spawn") and not args.target.startswith("http"):
+        ap.error("--target: inproc | spawn | http://host:port")
+
+    only = tuple(x for x in args.only.split(",") if x)
+    wanted = lambda name: not only or name.startswith(only)
+    sizes = [int(x) for x in args.log_sizes.split(",") if x]
+    payloads = sim_payloads(len(ENDPOINTS) * args.n, seed=args.seed)
+
+    results: Dict[str, Dict] = {}
+    with tempfile.TemporaryDirectory(prefix="e360_bench_") as tmp:
+        db_path = None if args.target.startswith("http") else Path(tmp) / "usage.sqlite3"
+        if args.target == "inproc" and wanted("waloryzuj_rocznie"):
+            results["waloryzuj_rocznie"] = bench_waloryzuj_rocznie(args.n * 10, args.seed)
+        with _client(args.target, db_path) as client:
+            results.update(bench_endpoints(client, payloads, args.n, args.n_heavy, wanted))
+            if wanted("export_xls"):
+                results.update(bench_export(client, db_path, sizes, args.export_repeat, args.seed))
+
+    report = {
+        "meta": {
+            "created_at": dt.datetime.now().isoformat(timespec="seconds"),
+            "git": _git_rev(),
+            "target": args.target,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "n": args.n,
+            "n_heavy": args.n_heavy,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("target") != args.target:
+            print(f"Uwaga: baseline mierzony na innym celu ({baseline.get('meta', {}).get('target')})")
+        report["comparison"] = {
+            "baseline_git": baseline.get("meta", {}).get("git"),
+            "threshold": args.threshold,
+            "rows": compare(results, baseline.get("results", {}), args.threshold),
+        }
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    rows = {r["name"]: r for r in report.get("comparison", {}).get("rows", [])}
+    print(f"{'benchmark':<28}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}{'vs base':>10}")
+    for name, st in results.items():
+        cmp = rows.get(name)
+        change = f"{cmp['change_pct']:+.1f}%" if cmp else "-"
+        flag = "  REGRESJA" if cmp and cmp["regression"] else ""
+        print(f"{name:<28}{st['p50_ms']:>10.3f}{st['p95_ms']:>10.3f}{st['mean_ms']:>10.3f}{change:>10}{flag}")
+    print(f"-> {args.out}")
+    return 1 if any(r["regression"] for r in rows.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Generator realistycznych payloadów SimInput i wierszy logu użycia (deterministyczny dla danego ziarna).
+
+Rozkład: wiek 16–80, obie płcie, start pracy w wieku 18–30 (nie później niż bieżący wiek), pensje
+log-normalne (mediana ~7 tys. zł), część rekordów z własnym rokiem przejścia, własną ścieżką płac,
+własnymi dniami L4, oczekiwaną emeryturą (goal-seek) i saldem konta/subkonta.
+"""
+import datetime as dt
+import random
+from typing import Dict, Iterator, List, Optional
+
+def _retire_age(sex: str) -> int:
+    return 60 if sex == "K" else 65
+
+def sim_payload(rng: random.Random, today: Optional[dt.date] = None) -> Dict:
+    today = today or dt.date.today()
+    age = rng.randint(16, 80)
+    sex = rng.choice("KM")
+    start_age = rng.randint(16, min(age, 30)) if age >= 18 else age
+    start_year = today.year - (age - start_age)
+    statutory = today.year + max(0, _retire_age(sex) - age)
+    retire_year = None
+    if rng.random() < 0.35:
+        retire_year = max(start_year + 1, statutory + rng.randint(-3, 5))
+    elif statutory <= start_year:
+        retire_year = start_year + 1
+    worked = max(0, today.year - start_year)
+    salary = round(min(80_000.0, max(3_000.0, rng.lognormvariate(8.85, 0.45))), 2)
+
+    payload = {
+        "age": age,
+        "sex": sex,
+        "gross_salary": salary,
+        "start_year": start_year,
+        "retire_year": retire_year,
+        "include_sick_leave": rng.random() < 0.7,
+        "quarter_award": rng.randint(1, 4),
+        "zus_balance": {
+            "konto": round(worked * salary * 12 * 0.12 * rng.uniform(0.6, 1.2), 2),
+            "subkonto": round(worked * salary * 12 * 0.03 * rng.uniform(0.6, 1.2), 2),
+        } if worked and rng.random() < 0.6 else None,
+        "expected_pension": round(rng.uniform(2_500, 12_000), -2) if rng.random() < 0.5 else None,
+        "postal_code": f"{rng.randint(0, 99):02d}-{rng.randint(0, 999):03d}" if rng.random() < 0.4 else None,
+    }
+    if rng.random() < 0.15:
+        end = retire_year or statutory
+        years = rng.sample(range(start_year, max(start_year + 1, end)), k=min(5, max(1, end - start_year)))
+        payload["custom_wage_timeline"] = {y: round(salary * rng.uniform(0.5, 1.5), 2) for y in years}
+    if rng.random() < 0.15:
+        years = range(today.year, today.year + rng.randint(1, 5))
+        payload["custom_sick_days"] = {y: rng.choice([0, 7, 14, 30, 60]) for y in years}
+    return payload
+
+def sim_payloads(n: int, seed: int = 2024, today: Optional[dt.date] = None) -> List[Dict]:
+    rng = random.Random(seed)
+    return [sim_payload(rng, today) for _ in range(n)]
+
+def usage_rows(n: int, seed: int = 2024, days: int = 365, today: Optional[dt.date] = None) -> Iterator[list]:
+    """Wiersze logu użycia (kolejność USAGE_COLUMNS) rozłożone na ostatnie `days` dni."""
+    rng = random.Random(seed)
+    today = today or dt.date.today()
+    for _ in range(n):
+        p = sim_payload(rng, today)
+        d = today - dt.timedelta(days=rng.randrange(days))
+        actual = round(p["gross_salary"] * rng.uniform(0.2, 0.6), 2)
+        yield [
+            d.isoformat(), f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}",
+            p["expected_pension"] or "", p["age"], p["sex"], p["gross_salary"],
+            "tak" if p["include_sick_leave"] else "nie",
+            (p["zus_balance"] or {}).get("konto", 0.0), (p["zus_balance"] or {}).get("subkonto", 0.0),
+            actual, round(actual * rng.uniform(0.4, 0.9), 2), p["postal_code"] or "",
+        ]
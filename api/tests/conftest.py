@@ -0,0 +1,47 @@
+"""Wspólne fixtures: aplikacja w procesie testów (TestClient), logi użycia w bazie tymczasowej, bez puli procesów."""
+import os
+
+import pytest
+
+PAYLOADS = [
+    dict(age=28, sex="K", gross_salary=8500, start_year=2020, retire_year=2065, include_sick_leave=True,
+         quarter_award=3, zus_balance={"konto": 0, "subkonto": 0}, expected_pension=5000, postal_code="30-001"),
+    dict(age=40, sex="M", gross_salary=30000, start_year=2005, include_sick_leave=False, quarter_award=1,
+         zus_balance={"konto": 120000, "subkonto": 30000}),
+    dict(age=55, sex="K", gross_salary=5000, start_year=1995, retire_year=2031, quarter_award=2,
+         expected_pension=9000, custom_sick_days={2026: 40, 2027: 0}),
+    dict(age=30, sex="M", gross_salary=9000, start_year=2018, retire_year=2060, quarter_award=4, expected_pension=3000),
+    dict(age=35, sex="M", gross_salary=12000, start_year=2012, retire_year=2056, quarter_award=2,
+         custom_wage_timeline={2015: 6000, 2020: 9000}),
+]
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    os.environ["USAGE_DB"] = str(tmp_path_factory.mktemp("usage") / "usage.sqlite3")
+    os.environ["CPU_POOL_SIZE"] = "0"
+    from fastapi.testclient import TestClient
+    from api.app.main import app
+    with TestClient(app) as c:
+        yield c
+
+@pytest.fixture(params=range(len(PAYLOADS)), ids=lambda i: f"payload{i}")
+def payload(request):
+    return PAYLOADS[request.param]
+
+@pytest.fixture
+def payloads():
+    return list(PAYLOADS)
+
+@pytest.fixture
+def avg_wage_until(client):
+    """Przycina pokrycie avg_wage w bieżącym snapshocie do podanego roku (lata dalej bez avg_wage); po teście przywraca."""
+    from api.app import data_snapshot
+    before = data_snapshot.current()
+
+    def trim(last_year: int):
+        params = {y: dict(row, avg_wage=None) if y > last_year else dict(row) for y, row in before.params.items()}
+        data_snapshot.install(data_snapshot.build_snapshot(params, dict(before.avg_table), before.assumptions,
+                                                           dict(before.tables_info)))
+
+    yield trim
+    data_snapshot.install(before)
@@ -0,0 +1,40 @@
+"""/simulate/batch: grupowanie, paczki, tryb bez numpy i błędy per rekord."""
+import pytest
+
+from api.app.calculations.batch import numpy_available
+
+def cohort(payloads):
+    """Rekordy z kilku grup (start_year, retire_year, sex), przemieszane, z błędnymi w środku."""
+    out = []
+    for k in range(3):
+        for p in payloads:
+            out.append(dict(p, gross_salary=p["gross_salary"] + 500 * k))
+        out.append({"age": "x"})
+        out.append(dict(payloads[3], start_year=2070))
+    return out
+
+def test_invalid_rows_stay_in_place(client, payloads):
+    rows = client.post("/simulate/batch", json=cohort(payloads)).json()["results"]
+    assert [r["index"] for r in rows] == list(range(len(rows)))
+    bad = [r for r in rows if not r["ok"]]
+    assert len(bad) == 6
+    assert isinstance(bad[0]["error"], list) and bad[0]["error"][0]["loc"] == ["age"]
+    assert "start_year" in bad[1]["error"]
+
+@pytest.mark.skipif(not numpy_available(), reason="wymaga numpy")
+def test_chunks_and_scalar_fallback_agree(client, payloads, monkeypatch):
+    from api.app import main as m
+    records = cohort(payloads)
+    expected = client.post("/simulate/batch", json=records).json()["results"]
+    monkeypatch.setattr(m, "BATCH_CHUNK", 2)
+    assert client.post("/simulate/batch", json=records).json()["results"] == expected
+    monkeypatch.setattr(m, "numpy_available", lambda: False)
+    assert client.post("/simulate/batch", json=records).json()["results"] == expected
+
+def test_python_call_with_siminput(client, payloads):
+    from api.app import main as m
+    models = [m.SimInput.model_validate(p) for p in payloads]
+    direct = m.simulate_batch(models)
+    assert direct["count"] == len(payloads)
+    assert [r["result"] for r in direct["results"]] == [r["result"] for r in
+                                                        client.post("/simulate/batch", json=payloads).json()["results"]]
@@ -0,0 +1,78 @@
+"""Raporty PDF hurtem: ZIP z PDF-em na rekord i manifest.csv — endpoint, CLI i kolejność przy paczkach."""
+import asyncio
+import csv
+import datetime as dt
+import io
+import json
+import zipfile
+
+from api.app.bulk_report import BulkRecord, read_payloads, render_bulk, zip_stream
+
+def manifest(zf: zipfile.ZipFile) -> list:
+    return list(csv.DictReader(io.StringIO(zf.read("manifest.csv").decode("utf-8"))))
+
+def test_bulk_endpoint_zip_and_manifest(client, payloads, monkeypatch):
+    from api.app import main as m
+    monkeypatch.setattr(m, "BULK_PDF_CHUNK", 2)
+    records = payloads[:3] + [{"age": "x"}, dict(payloads[3], start_year=2070)]
+    r = client.post("/report/pdf/bulk", json=records)
+    assert r.status_code == 200 and r.headers["content-type"] == "application/zip"
+    zf = zipfile.ZipFile(io.BytesIO(r.content))
+    assert zf.namelist() == ["raport_00000.pdf", "raport_00001.pdf", "raport_00002.pdf", "manifest.csv"]
+    assert all(zf.read(name).startswith(b"%PDF") for name in zf.namelist()[:-1])
+    rows = manifest(zf)
+    assert [(row["index"], row["status"]) for row in rows] == [
+        ("0", "ok"), ("1", "ok"), ("2", "ok"), ("3", "error"), ("4", "error")]
+    assert json.loads(rows[3]["error"])[0]["loc"] == ["age"]
+    assert "start_year" in rows[4]["error"]
+
+def test_bulk_endpoint_record_limit(client, payloads, monkeypatch):
+    from api.app import main as m
+    monkeypatch.setattr(m, "BULK_PDF_MAX_RECORDS", 2)
+    assert client.post("/report/pdf/bulk", json=payloads[:3]).status_code == 400
+
+def test_render_bulk_keeps_order_and_isolates_failed_chunk():
+    async def render(items):
+        await asyncio.sleep(0.01 if 0 in items else 0)  # pierwsza paczka kończy się ostatnia
+        if 4 in items:
+            raise RuntimeError("render padł")
+        return [b"%PDF-" + str(i).encode() for i in items]
+
+    def prepare(part):
+        return [(i, None, "zły rekord") if raw is None else (i, raw, None) for i, raw in part]
+
+    async def collect():
+        stream = render_bulk([0, 1, None, 3, 4, 5, 6], prepare, render, chunk=2, window=3)
+        return [record async for record in stream]
+
+    records = asyncio.run(collect())
+    assert [r.index for r in records] == list(range(7))
+    assert [r.error for r in records] == [None, None, "zły rekord", None, "RuntimeError: render padł",
+                                          "RuntimeError: render padł", None]
+    assert records[6].pdf == b"%PDF-6"
+
+def test_zip_stream_is_deterministic():
+    today = dt.date(2026, 1, 2)
+
+    async def build():
+        async def records():
+            yield BulkRecord(0, pdf=b"%PDF-a")
+            yield BulkRecord(1, error=[{"loc": ["age"]}])
+        return b"".join([chunk async for chunk in zip_stream(records(), today)])
+
+    first = asyncio.run(build())
+    assert asyncio.run(build()) == first
+    rows = manifest(zipfile.ZipFile(io.BytesIO(first)))
+    assert rows[1] == {"index": "1", "file": "", "status": "error", "error": '[{"loc": ["age"]}]'}
+
+def test_cli_writes_zip(client, payloads, tmp_path, monkeypatch, capsys):
+    from api.app import bulk_report, main as m
+    monkeypatch.setattr(m, "shutdown_pool", lambda: None)  # pula i log użycia należą do sesji testów
+    monkeypatch.setattr(m.USAGE_LOG, "close", lambda: None)
+    src = tmp_path / "kohorta.jsonl"
+    src.write_text("\n".join(json.dumps(p) for p in payloads[:2]) + "\n", encoding="utf-8")
+    assert read_payloads(str(src)) == payloads[:2]
+    out = tmp_path / "raporty.zip"
+    assert bulk_report.main([str(src), "-o", str(out)]) == 0
+    assert [row["status"] for row in manifest(zipfile.ZipFile(out))] == ["ok", "ok"]
+    assert "2/2" in capsys.readouterr().err
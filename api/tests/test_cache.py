@@ -0,0 +1,45 @@
+"""Cache w pamięci procesu (LRU z limitami) i cache wyrenderowanych raportów /report/pdf."""
+import time
+
+from api.app.cache import LRUCache, cache_key, data_version
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_lru_byte_budget_and_ttl():
+    cache = LRUCache(max_entries=10, max_bytes=10)
+    cache.put("big", b"x" * 11)  # większy niż cały budżet — nie trafia do cache
+    assert cache.get("big") is None
+    cache.put("a", b"x" * 6)
+    cache.put("b", b"x" * 6)
+    assert cache.get("a") is None and cache.stats()["bytes"] == 6
+    short = LRUCache(max_entries=10, ttl=0.01)
+    short.put("a", 1)
+    time.sleep(0.02)
+    assert short.get("a") is None
+
+def test_keys_ignore_dict_order():
+    assert cache_key("pdf", {"a": 1, "b": 2}) == cache_key("pdf", {"b": 2, "a": 1})
+    assert cache_key("pdf", {"a": 1}) != cache_key("simulate", {"a": 1})
+    assert data_version({1: {"x": 1}}) != data_version({1: {"x": 2}})
+
+def test_report_pdf_served_from_cache_and_cleared_on_reload(client, payloads):
+    from api.app import main as m
+    payload = dict(payloads[0], postal_code="99-986")
+    m.PDF_CACHE.clear()
+    first = client.post("/report/pdf", json=payload)
+    hits = m.PDF_CACHE.stats()["hits"]
+    second = client.post("/report/pdf", json=payload)
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert m.PDF_CACHE.stats()["hits"] == hits + 1
+    m.USAGE_LOG.flush()
+    assert m.USAGE_STORE.count(postal_code="99-986") == 2  # trafienie w cache też jest logowane
+    m.reload_data()
+    assert m.PDF_CACHE.stats()["entries"] == 0
@@ -0,0 +1,25 @@
+"""Walidacja osi /simulate/grid: błędne wartości mają dawać 400, nie 500."""
+import json
+
+import pytest
+
+BAD_AXES = [
+    {"retire_year": [float("inf")]},
+    {"retire_year": [float("nan")]},
+    {"gross_salary": [9000, float("inf")]},
+    {"sick_days": [float("-inf")]},
+    {"retire_year": [2050.5]},
+    {"quarter_award": [5]},
+    {},
+    {"wiek": [30]},
+]
+
+@pytest.mark.parametrize("axes", BAD_AXES, ids=lambda axes: json.dumps(axes))
+def test_grid_rejects_bad_axes(client, payloads, axes):
+    body = json.dumps({"base": payloads[3], "axes": axes})  # json.dumps zapisuje inf/nan jako Infinity/NaN
+    r = client.post("/simulate/grid", content=body, headers={"Content-Type": "application/json"})
+    assert r.status_code == 400, r.text
+
+def test_grid_rejects_retire_year_before_today(client, payloads):
+    r = client.post("/simulate/grid", json={"base": payloads[3], "axes": {"retire_year": [2000]}})
+    assert r.status_code == 400, r.text
@@ -0,0 +1,47 @@
+"""/simulate/montecarlo: powtarzalność z ziarnem, niezależność od podziału na paczki, walidacja parametrów."""
+import pytest
+
+from api.app.calculations.batch import numpy_available
+
+pytestmark = pytest.mark.skipif(not numpy_available(), reason="wymaga numpy")
+
+def run(client, payload, **params):
+    r = client.post("/simulate/montecarlo", params={"paths": 2000, **params}, json=payload)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+def test_seed_reproducible_and_returned(client, payloads):
+    a = run(client, payloads[0], seed=11)
+    assert run(client, payloads[0], seed=11) == a
+    assert run(client, payloads[0], seed=12)["benefit_real"] != a["benefit_real"]
+    unseeded = run(client, payloads[0])
+    assert run(client, payloads[0], seed=unseeded["seed"]) == unseeded
+
+def test_result_independent_of_pool(client, payloads, monkeypatch):
+    from api.app import main as m
+    monkeypatch.setattr(m, "MC_CHUNK_PATHS", 500)
+    serial = run(client, payloads[0], seed=3)
+
+    async def in_process(fn, *args):
+        return fn(*args)
+
+    # Paczki jako osobne zadania puli (tu wykonywane w procesie testu) — wynik jak przy liczeniu po kolei.
+    monkeypatch.setattr(m, "get_pool", lambda: object())
+    monkeypatch.setattr(m, "_run_heavy", in_process)
+    assert run(client, payloads[0], seed=3) == serial
+
+def test_bands_ordered_and_probability(client, payloads):
+    out = run(client, payloads[0], seed=5, distribution="t", percentiles=[5, 50, 95])
+    bands = list(out["benefit_real"]["percentiles"].values())
+    assert bands == sorted(bands) and bands[0] < bands[-1]
+    assert 0.0 <= out["probability_meets_expected"] <= 1.0
+
+@pytest.mark.parametrize("params", [
+    {"distribution": "cauchy"},
+    {"percentiles": [50, 101]},
+    {"corr_wage_cpi": 1.0, "corr_wage_waloryzacja": -1.0, "corr_cpi_waloryzacja": 1.0},
+    {"paths": 10 ** 9},
+])
+def test_rejects_bad_parameters(client, payloads, params):
+    r = client.post("/simulate/montecarlo", params={"paths": 200, **params}, json=payloads[0])
+    assert r.status_code == 400
@@ -0,0 +1,118 @@
+"""
+Spójność endpointów z /simulate: ten sam rok przejścia i te same dane wejściowe muszą dawać to samo
+świadczenie niezależnie od ścieżki liczenia (timeline, batch, siatka, Monte Carlo, goal-seek).
+"""
+import datetime as dt
+import json
+
+import pytest
+
+from api.app.calculations.batch import numpy_available
+
+needs_numpy = pytest.mark.skipif(not numpy_available(), reason="wymaga numpy")
+
+def simulate(client, payload) -> dict:
+    r = client.post("/simulate", json=payload)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+def test_timeline_last_row_equals_simulate(client, payload):
+    result = simulate(client, payload)
+    timeline = client.post("/simulate/timeline", json=payload).json()["timeline"]
+    last = timeline[-1]
+    assert last["year"] == result["retire_year"]
+    assert last["benefit_if_retire_in_year"] == {"nominal": result["benefit"]["actual"], "real": result["benefit"]["real"]}
+
+def test_timeline_streaming_equals_json(client, payload):
+    rows = client.post("/simulate/timeline", params={"horizon": 5}, json=payload).json()["timeline"]
+    r = client.post("/simulate/timeline", params={"horizon": 5, "format": "ndjson"}, json=payload)
+    assert [json.loads(line) for line in r.text.splitlines()] == rows
+
+def test_batch_equals_simulate(client, payloads):
+    batch = client.post("/simulate/batch", json=payloads + [{"age": "x"}]).json()
+    assert batch["count"] == len(payloads) + 1
+    for i, p in enumerate(payloads):
+        row = batch["results"][i]
+        assert row["index"] == i and row["ok"]
+        assert row["result"] == simulate(client, p)
+    assert batch["results"][-1]["ok"] is False
+
+# Pokrycie avg_wage kończy się w 2060: przejście w 2061 jeszcze ze ścieżką z arkusza, od 2062 — z zapasowej.
+BOUNDARY_PAYLOAD = dict(age=30, sex="M", gross_salary=9000, start_year=2018, retire_year=2058, quarter_award=2)
+
+def test_what_if_across_avg_wage_boundary(client, avg_wage_until):
+    avg_wage_until(2060)
+    delays = list(range(0, 7))
+    what_if = client.post("/simulate/what-if", params={"delays": delays}, json=BOUNDARY_PAYLOAD).json()
+    base = simulate(client, BOUNDARY_PAYLOAD)["benefit"]
+    assert what_if["baseline_benefit"] == base
+    for row in what_if["scenarios"]:
+        expected = simulate(client, dict(BOUNDARY_PAYLOAD, retire_year=2058 + row["delay_years"]))["benefit"]
+        assert row["benefit"] == expected
+        assert row["delta_vs_baseline"]["benefit_real"] == round(expected["real"] - base["real"], 2)
+
+def test_timeline_horizon_across_avg_wage_boundary(client, avg_wage_until):
+    avg_wage_until(2060)
+    rows = client.post("/simulate/timeline", params={"horizon": 6}, json=BOUNDARY_PAYLOAD).json()["timeline"]
+    for row in rows[-7:]:
+        expected = simulate(client, dict(BOUNDARY_PAYLOAD, retire_year=row["year"]))["benefit"]
+        assert row["benefit_if_retire_in_year"] == {"nominal": expected["actual"], "real": expected["real"]}
+
+def test_batch_goal_seek_across_avg_wage_boundary(client, avg_wage_until):
+    avg_wage_until(2060)
+    payloads = [dict(BOUNDARY_PAYLOAD, expected_pension=e) for e in (2600, 2700, 2800, 2900, 3000, 3100)]
+    batch = client.post("/simulate/batch", json=payloads).json()
+    for row, p in zip(batch["results"], payloads):
+        assert row["result"]["goal_seek"] == simulate(client, p)["goal_seek"]
+
+@needs_numpy
+def test_grid_cell_equals_simulate(client, payload):
+    retire = simulate(client, payload)["retire_year"]
+    axes = {"gross_salary": [payload["gross_salary"], payload["gross_salary"] * 1.5],
+            "retire_year": [retire, retire + 2], "quarter_award": [1, 4]}
+    grid = client.post("/simulate/grid", json={"base": payload, "axes": axes}).json()
+    metrics = grid["metrics"]
+    for i, salary in enumerate(axes["gross_salary"]):
+        for j, retire_year in enumerate(axes["retire_year"]):
+            for k, quarter in enumerate(axes["quarter_award"]):
+                expected = simulate(client, dict(payload, gross_salary=salary, retire_year=retire_year,
+                                                 quarter_award=quarter, expected_pension=None))
+                assert metrics["benefit_nominal"][i][j][k] == pytest.approx(expected["benefit"]["actual"], abs=0.01)
+                assert metrics["benefit_real"][i][j][k] == pytest.approx(expected["benefit"]["real"], abs=0.01)
+
+@needs_numpy
+def test_montecarlo_without_volatility_equals_deterministic(client, payload):
+    result = simulate(client, payload)
+    params = {"paths": 200, "seed": 7, "wage_growth_sd": 0, "cpi_sd": 0, "waloryzacja_sd": 0}
+    mc = client.post("/simulate/montecarlo", params=params, json=payload).json()
+    assert mc["deterministic"] == {"retire_year": result["retire_year"], "nominal": result["benefit"]["actual"],
+                                   "real": result["benefit"]["real"]}
+    for metric, expected in (("benefit_nominal", result["benefit"]["actual"]), ("benefit_real", result["benefit"]["real"])):
+        assert mc[metric]["mean"] == pytest.approx(expected, abs=0.01)
+        assert all(v == pytest.approx(expected, abs=0.01) for v in mc[metric]["percentiles"].values())
+
+def brute_force_extra_years(payload: dict, retire_year: int, max_extra: int, today: dt.date):
+    """Pierwotny goal-seek: dla każdego kolejnego roku przejścia osobna projekcja i pełna suma składek od nowa."""
+    from api.app import main as m
+    p = m.SimInput.model_validate(payload)
+    konto, subkonto = m._balances(p)
+    for add in range(max_extra + 1):
+        y = retire_year + add
+        real = m.benefit_from_capital(
+            m._projection(p, y, today).capital(), y, p.quarter_award, konto, subkonto,
+            m.expected_life_months(p.sex, y), m._cpi_for(today), today.year
+        )[2]
+        if real >= p.expected_pension:
+            return add
+    return None
+
+@pytest.mark.parametrize("avg_wage_last_year", [None, 2060])
+@pytest.mark.parametrize("expected_pension", [1500, 2700, 2800, 2900, 3000, 3100, 50000])
+def test_goal_seek_matches_brute_force(client, avg_wage_until, avg_wage_last_year, expected_pension):
+    if avg_wage_last_year is not None:
+        avg_wage_until(avg_wage_last_year)  # koniec pokrycia w środku zakresu goal-seek (2058..2068)
+    payload = dict(BOUNDARY_PAYLOAD, expected_pension=expected_pension)
+    goal_seek = simulate(client, payload)["goal_seek"]
+    assert goal_seek["enabled"]
+    expected = brute_force_extra_years(payload, 2058, goal_seek["max_extra_years"], dt.date.today())
+    assert goal_seek["extra_years_needed"] == expected
@@ -0,0 +1,48 @@
+"""
+Osadzone czcionki raportu PDF. pdf_report podmienia budowę podzbiorów TTF (pamięć procesu + gotowy strumień
+Flate — wewnętrzne API reportlab, dlatego wersja jest przypięta w requirements): strumienie czcionek
+muszą się dekompresować dokładnie raz do poprawnego pliku TrueType o długości z /Length1.
+"""
+import io
+import re
+import zlib
+
+import pytest
+
+FONT_FILE = re.compile(rb"(\d+) 0 obj\s*<<(.*?)>>\s*stream\r?\n", re.S)
+
+def font_streams(pdf: bytes) -> list[tuple[bytes, bytes]]:
+    """(słownik, zawartość) strumieni /FontFile2 — osadzone podzbiory TTF mają /Length1."""
+    out = []
+    for m in FONT_FILE.finditer(pdf):
+        head = m.group(2)
+        if b"/Length1" in head:
+            length = int(re.search(rb"/Length (\d+)", head).group(1))
+            out.append((head, pdf[m.end():m.end() + length]))
+    return out
+
+def render(client, payload) -> bytes:
+    r = client.post("/report/pdf", json=payload)
+    assert r.status_code == 200, r.text
+    assert r.content.startswith(b"%PDF")
+    return r.content
+
+def test_embedded_font_subsets_round_trip(client, payloads):
+    from reportlab.pdfbase.ttfonts import TTFontFile
+    from api.app import pdf_report
+
+    first, second = render(client, payloads[0]), render(client, payloads[1])
+    if pdf_report.FONT_MAIN == "Helvetica":
+        pytest.skip("brak czcionek TTF — raport bez osadzonych podzbiorów")
+
+    for pdf in (first, second):
+        streams = font_streams(pdf)
+        assert len(streams) == 2  # FONT_MAIN + FONT_BOLD
+        names = set()
+        for head, content in streams:
+            assert re.search(rb"/Filter\s*\[\s*/FlateDecode\s*\]", head)
+            data = zlib.decompress(content)
+            assert len(data) == int(re.search(rb"/Length1 (\d+)", head).group(1))
+            assert data[:4] == b"\x00\x01\x00\x00"  # TrueType, nie podwójnie skompresowane
+            names.add(TTFontFile(io.BytesIO(data), validate=0).name)
+        assert len(names) == 2
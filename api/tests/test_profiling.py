@@ -0,0 +1,68 @@
+"""Diagnostyka: Server-Timing i /admin/metrics, profilowanie na żądanie admina, lista najwolniejszych requestów."""
+import time
+
+import pytest
+
+from api.app import profiling
+from api.app.profiling import SlowestRequests, _describe
+
+ADMIN = {"X-Admin-Key": "test-key"}
+
+@pytest.fixture
+def admin_key(monkeypatch):
+    monkeypatch.setenv("ADMIN_KEY", ADMIN["X-Admin-Key"])
+
+def test_server_timing_and_metrics(client, payload, admin_key):
+    r = client.post("/simulate/timeline", json=payload)
+    timing = r.headers["server-timing"]
+    assert "wage_path;dur=" in timing and "total;dur=" in timing
+    assert client.get("/admin/metrics").status_code == 403
+    text = client.get("/admin/metrics", headers=ADMIN).text
+    assert 'e360_request_duration_seconds_count{endpoint="/simulate/timeline",method="POST"}' in text
+    assert 'e360_stage_duration_seconds_count{endpoint="/simulate/timeline",stage="wage_path"}' in text
+
+def test_profile_requires_admin_key(client, payload, admin_key):
+    assert client.post("/simulate", json=payload, headers={"X-Profile": "1"}).status_code == 403
+    r = client.post("/simulate", json=payload, headers={"X-Profile": "1", **ADMIN})
+    assert r.status_code == 200
+    profile_id = r.headers["x-profile-id"]
+    assert "_simulate_core" in client.get(f"/admin/profiles/{profile_id}", headers=ADMIN).text
+    assert client.get(f"/admin/profiles/{profile_id}").status_code == 403
+    assert client.get("/admin/profiles/nieistniejacy", headers=ADMIN).status_code == 404
+
+def test_slowest_keeps_only_argument_counts(client, payloads, monkeypatch):
+    slow = SlowestRequests(n=5, window_s=3600)
+    monkeypatch.setattr(profiling, "SLOWEST", slow)  # świeża lista — bez requestów z innych testów
+    client.post("/simulate/batch", json=payloads)
+    [entry] = slow.snapshot()
+    assert entry["endpoint"] == "/simulate/batch"
+    assert entry["args"]["payloads"] == {"count": len(payloads)}
+
+def test_describe_summarizes_collections():
+    out = _describe({"payloads": [{"age": 30}] * 3, "axes": {"gross_salary": [1, 2]}, "format": "x" * 500, "n": 5})
+    assert out == {"payloads": {"count": 3}, "axes": {"count": 1}, "format": "x" * 200, "n": 5}
+
+def test_slowest_top_n_and_window():
+    slow = SlowestRequests(n=3, window_s=3600)
+    for ms in (5, 1, 9, 3, 7):
+        slow.offer(ms / 1000, lambda ms=ms: {"endpoint": f"/e{ms}"})
+    assert [e["endpoint"] for e in slow.snapshot()] == ["/e9", "/e7", "/e5"]
+    slow.window_s = 0.0
+    time.sleep(0.01)
+    assert slow.snapshot() == []
+
+class _PrunedHeap(list):
+    """Pierwsze len() widzi pełny kopiec; zanim offer sięgnie po heap[0], równoległy _prune go opróżnił."""
+    def __init__(self, n: int):
+        super().__init__()
+        self.full_once = n
+
+    def __len__(self):
+        n, self.full_once = self.full_once, None
+        return n if n is not None else super().__len__()
+
+def test_slowest_offer_survives_concurrent_prune():
+    slow = SlowestRequests(n=2, window_s=3600)
+    slow._heap = _PrunedHeap(2)
+    slow.offer(0.5, lambda: {"endpoint": "/x"})
+    assert [e["endpoint"] for e in slow.snapshot()] == ["/x"]
@@ -0,0 +1,39 @@
+"""Odpowiedzi strumieniowe NDJSON/CSV dla timeline i /simulate/batch."""
+import csv
+import io
+import json
+
+from api.app.streaming import iter_csv_rows, iter_ndjson
+
+def test_first_row_flushed_then_chunks():
+    chunks = list(iter_ndjson(({"i": i} for i in range(7)), chunk_rows=3))
+    assert [c.count(b"\n") for c in chunks] == [1, 3, 3]
+    assert [json.loads(line) for line in b"".join(chunks).splitlines()] == [{"i": i} for i in range(7)]
+    chunks = list(iter_csv_rows(("a", "b"), iter([(1, 2), (3, 4), (5, 6)]), chunk_rows=2))
+    assert chunks == [b"a,b\r\n1,2\r\n", b"3,4\r\n5,6\r\n"]
+    assert list(iter_csv_rows(("a", "b"), iter([]))) == [b"a,b\r\n"]
+
+def test_batch_ndjson_and_csv_match_json(client, payloads, monkeypatch):
+    from api.app import main as m
+    monkeypatch.setattr(m, "BATCH_STREAM_CHUNK", 2)  # kilka okien liczenia
+    records = payloads + [{"age": "x"}]
+    results = client.post("/simulate/batch", json=records).json()["results"]
+    r = client.post("/simulate/batch", params={"format": "ndjson"}, json=records)
+    assert r.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in r.text.splitlines()] == results
+    rows = list(csv.DictReader(io.StringIO(client.post("/simulate/batch", params={"format": "csv"}, json=records).text)))
+    assert [int(row["index"]) for row in rows] == list(range(len(records)))
+    for row, res in zip(rows, results[:-1]):
+        assert row["ok"] == "1" and float(row["benefit_real"]) == res["result"]["benefit"]["real"]
+        extra = res["result"]["goal_seek"]["extra_years_needed"]
+        assert row["goal_seek_extra_years"] == ("" if extra is None else str(extra))
+    assert rows[-1]["ok"] == "0" and json.loads(rows[-1]["error"])[0]["loc"] == ["age"]
+
+def test_timeline_csv_matches_json(client, payload):
+    rows = client.post("/simulate/timeline", params={"horizon": 3}, json=payload).json()["timeline"]
+    r = client.post("/simulate/timeline", params={"horizon": 3, "format": "csv"}, json=payload)
+    assert r.headers["content-type"].startswith("text/csv")
+    parsed = list(csv.DictReader(io.StringIO(r.text)))
+    assert [(int(p["year"]), float(p["benefit_nominal"]), float(p["benefit_real"])) for p in parsed] == [
+        (row["year"], row["benefit_if_retire_in_year"]["nominal"], row["benefit_if_retire_in_year"]["real"])
+        for row in rows]
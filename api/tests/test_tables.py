@@ -0,0 +1,68 @@
+"""Skompilowany snapshot tabel i jego przeładowanie (reload, licznik generacji współdzielony przez workery)."""
+import pytest
+
+from api.app.tables import AVG_XLSX, PARAMS_XLSX, GenerationCounter, load_tables, read_snapshot
+
+@pytest.fixture
+def sources(tmp_path):
+    assumptions = tmp_path / "assumptions.json"
+    assumptions.write_text('{"waloryzacja_roczna": {"2030": 1.05}}', encoding="utf-8")
+    return {"params_path": PARAMS_XLSX, "avg_path": AVG_XLSX, "assumptions_path": assumptions,
+            "snapshot_path": tmp_path / "tables.snapshot"}
+
+def test_snapshot_round_trip(sources):
+    params, avg, assumptions, info = load_tables(**sources)
+    assert info["source"] == "xlsx" and info["generation"] == 1
+    again = load_tables(**sources)
+    assert again[3]["source"] == "snapshot" and again[3]["generation"] == 1
+    assert again[:3] == (params, avg, assumptions)
+    assert assumptions == {"waloryzacja_roczna": {"2030": 1.05}}
+
+def test_changed_source_bumps_generation(sources):
+    load_tables(**sources)
+    sources["assumptions_path"].write_text('{"waloryzacja_roczna": {"2030": 1.06}}', encoding="utf-8")
+    _, _, assumptions, info = load_tables(**sources)
+    assert info["source"] == "xlsx" and info["generation"] == 2
+    assert assumptions["waloryzacja_roczna"]["2030"] == 1.06
+    assert read_snapshot(sources["snapshot_path"])[0]["generation"] == 2
+
+def test_missing_assumptions_are_empty(sources):
+    sources["assumptions_path"].unlink()
+    assert load_tables(**sources)[2] == {}
+
+def test_malformed_assumptions_raise(sources):
+    load_tables(**sources)
+    sources["assumptions_path"].write_text('{"waloryzacja_roczna": ', encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_tables(**sources)
+    assert read_snapshot(sources["snapshot_path"])[0]["generation"] == 1
+
+def test_reload_keeps_snapshot_on_malformed_assumptions(client, sources, monkeypatch):
+    from api.app import main as m
+    monkeypatch.setattr(m, "TABLES_SNAPSHOT", sources["snapshot_path"])
+    monkeypatch.setattr(m, "A_PATH", sources["assumptions_path"])
+    before = m.current_snapshot()
+    sources["assumptions_path"].write_text("nie json", encoding="utf-8")
+    r = client.post("/admin/reload")
+    assert r.status_code == 500 and before.version in r.json()["detail"]
+    assert m.current_snapshot() is before
+
+def test_shared_generation_reloads_in_background(client, tmp_path, monkeypatch):
+    from api.app import main as m
+    counter = GenerationCounter(tmp_path / "tables.snapshot.gen")
+    reloads = []
+    monkeypatch.setattr(m, "TABLES_GEN", counter)
+    monkeypatch.setattr(m, "_SHARED_SEEN", 0)
+    monkeypatch.setattr(m, "reload_data", lambda: reloads.append(counter.get()))
+
+    def sync():
+        m.sync_shared_tables()
+        assert m._SHARED_SYNC_LOCK.acquire(timeout=5)  # czekamy, aż wątek w tle skończy
+        m._SHARED_SYNC_LOCK.release()
+
+    published = m._shared_generation_seen() + 1
+    counter.publish(published)
+    sync()
+    assert reloads == [published]
+    sync()  # ta sama generacja — bez ponownego wczytywania
+    assert reloads == [published]
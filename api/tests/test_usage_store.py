@@ -0,0 +1,83 @@
+"""Magazyn logów użycia (SQLite): import starego usage.csv, filtry i strumieniowy eksport CSV."""
+import csv
+import gzip
+import io
+import threading
+
+from api.app.usage_store import USAGE_COLUMNS, UsageStore, import_legacy_csv
+
+def write_legacy_csv(path, n: int):
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(USAGE_COLUMNS)
+        for i in range(n):
+            w.writerow(["2025-01-%02d" % (i % 28 + 1), "12:00:00", "5000", 30 + i % 20, "KM"[i % 2], "8 500,50",
+                        "tak", "0", "0", "3100", "2400", "30-001" if i % 3 else ""])
+
+def test_import_csv_once(tmp_path):
+    legacy = tmp_path / "usage.csv"
+    write_legacy_csv(legacy, 50)
+    store = UsageStore(tmp_path / "usage.sqlite3")
+    assert store.import_csv(legacy) == 50
+    assert store.import_csv(legacy) == 0
+    assert store.count() == 50
+    row = next(store.query("2025-01-01", "2025-01-01"))
+    assert row[USAGE_COLUMNS.index("salary")] == 8500.5 and row[USAGE_COLUMNS.index("postal_code")] is None
+
+def test_concurrent_import_from_workers(tmp_path):
+    legacy = tmp_path / "usage.csv"
+    write_legacy_csv(legacy, 2000)
+    db = tmp_path / "usage.sqlite3"
+    UsageStore(db)  # schemat gotowy przed startem "workerów"
+    start = threading.Barrier(4)
+    imported, errors = [], []
+
+    def worker():
+        store = UsageStore(db)  # osobny magazyn = osobne połączenie, jak w osobnych procesach uvicorna
+        start.wait()
+        try:
+            imported.append(store.import_csv(legacy))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert sorted(imported) == [0, 0, 0, 2000]
+    assert UsageStore(db).count() == 2000
+
+def test_import_legacy_rotated_oldest_first(tmp_path):
+    legacy = tmp_path / "usage.csv"
+    write_legacy_csv(legacy, 3)
+    write_legacy_csv(tmp_path / "usage.csv.1", 5)
+    write_legacy_csv(tmp_path / "usage.csv.2", 7)
+    store = UsageStore(tmp_path / "usage.sqlite3")
+    assert import_legacy_csv(store, legacy) == 15
+    assert import_legacy_csv(store, legacy) == 0
+
+def test_query_filters(tmp_path):
+    legacy = tmp_path / "usage.csv"
+    write_legacy_csv(legacy, 60)
+    store = UsageStore(tmp_path / "usage.sqlite3")
+    store.import_csv(legacy)
+    rows = list(store.query(sex="k", age_min=35, age_max=39, postal_code="30-001"))
+    assert rows and all(r[4] == "K" and 35 <= r[3] <= 39 and r[11] == "30-001" for r in rows)
+    assert len(rows) == store.count(sex="k", age_min=35, age_max=39, postal_code="30-001")
+    dates = [(r[0], r[1]) for r in store.query()]
+    assert dates == sorted(dates)
+
+def test_export_csv_and_gzip(client, payloads):
+    payload = dict(payloads[0], postal_code="99-987")
+    for _ in range(3):
+        assert client.post("/simulate", json=payload).status_code == 200
+    params = {"format": "csv", "postal_code": "99-987"}
+    text = client.get("/admin/export-xls", params=params).content.decode("utf-8-sig")
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0][0] == "Data użycia" and len(rows) == 4
+    assert all(r[-1] == "99-987" for r in rows[1:])
+    packed = client.get("/admin/export-xls", params=dict(params, format="csv.gz")).content
+    assert gzip.decompress(packed).decode("utf-8-sig") == text
+    assert client.get("/admin/export-xls", params={"format": "pdf"}).status_code == 400
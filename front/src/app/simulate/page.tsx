@@ -203,21 +203,10 @@ if (expNum !== undefined) scrubbed.expected = expNum;
 }
 
     try {
-      const sim = await api.simulate(payload);
-      const tl = await api.timeline(payload);
-
-     let wi: unknown = null;
-try {
-  wi = await api.whatIf(payload);
-} catch (e: unknown) {
-  const msg = (e && typeof e === 'object' && 'message' in e) ? String((e as { message?: unknown }).message) : String(e);
-  console.warn('what-if failed:', msg);
-        if (lang === 'pl') {
-          setSubmitError((prev) => (prev ? prev + ' | ' : '') + 'Nie udało się policzyć scenariuszy (what-if).');
-        } else {
-          setSubmitError((prev) => (prev ? prev + ' | ' : '') + 'Failed to compute what-if scenarios.');
-        }
-      }
+      const bundle = await api.bundle(payload);
+      const sim = bundle.result;
+      const tl = { timeline: bundle.timeline ?? [] };
+      const wi: unknown = bundle.what_if ?? null;
 
       // zapisz dla /result
       sessionStorage.setItem('sim:input', JSON.stringify(payload));
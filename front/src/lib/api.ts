@@ -74,6 +74,17 @@ export const api = {
   }).then((r) => j<any>(r));
 },
 
+  /** Wynik + timeline + what-if w jednym wywołaniu (jedna projekcja po stronie API). */
+  bundle: (body: SimPayload, delays: number[] = [0, 1, 2, 5]) => {
+    const qs = new URLSearchParams();
+    delays.forEach((d) => qs.append('delays', String(d)));
+    return fetch(`${BASE}/simulate/bundle?${qs.toString()}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body),
+    }).then((r) => j<any>(r));
+  },
+
   explain: (body: SimPayload) =>
     fetch(`${BASE}/simulate/explain`, {
       method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(body)